@@ -7,9 +7,21 @@ REPO_OWNER = "porfanid"
 REPO_NAME = "TurnIn"
 
 # Connection Information
-PROXY_HOST = "scylla.cs.uoi.gr"
+# Gateway hosts in preference order; they are tried ranked by their recent health.
+# Users can override the list with "proxy_hosts" in ~/.turnin/config.json
+PROXY_HOSTS = ["scylla.cs.uoi.gr"]
+PROXY_HOST = PROXY_HOSTS[0]
 TEMP_DIR = "turnin"
 LOCAL_TUNNEL_PORT = 10022
+# Command run on the submission host to list the open assignments (one per line). When unset,
+# "turnin --list" is tried for autocomplete and an unknown name only draws a warning; setting a
+# command here makes its list authoritative, so unknown names are rejected before uploading.
+# Users can set it with "assignment_list_command" in ~/.turnin/config.json
+ASSIGNMENT_LIST_COMMAND = None
+# Upload bandwidth limit in KiB/s shared by all submissions (0 = unlimited), so one large
+# upload does not saturate a shared lab uplink.
+# Users can override it with "upload_rate_limit" in ~/.turnin/config.json
+UPLOAD_RATE_LIMIT = 0
 
 # SSH Host Keys (DEPRECATED - no longer used, kept for backwards compatibility)
 # The application now uses the system's ~/.ssh/known_hosts file for secure host key management
@@ -0,0 +1,99 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch, MagicMock
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.assignment_catalog import (
+    AssignmentCatalog, LIST_TIMEOUT, DEFAULT_LIST_COMMAND, parse_assignment_list, unknown_assignment_message,
+    get_list_command, assignment_check_enforced
+)
+
+
+def mock_ssh(output, exit_status=0):
+    """SSH client whose exec_command prints output and exits with exit_status"""
+    ssh = MagicMock()
+    stdout = MagicMock()
+    stdout.read.return_value = output.encode()
+    stdout.channel.recv_exit_status.return_value = exit_status
+    stderr = MagicMock()
+    stderr.read.return_value = b"turnin: unknown option --list"
+    ssh.exec_command.return_value = (MagicMock(), stdout, stderr)
+    return ssh
+
+
+class TestAssignmentCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "assignments.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parse_assignment_list(self):
+        """Test that the first word of every line is a name and duplicates are dropped"""
+        output = "hw1   due 2026-11-01\n\nhw2\nhw1\n  project  open\n"
+
+        self.assertEqual(parse_assignment_list(output), ["hw1", "hw2", "project"])
+
+    def test_parse_rejects_output_that_is_not_a_list(self):
+        """Test that usage text, error messages and odd names are not taken for assignments"""
+        self.assertEqual(parse_assignment_list("Usage turnin assignment files...\n"), [])
+        self.assertEqual(parse_assignment_list("turnin: unknown option --list\n"), [])
+        self.assertEqual(parse_assignment_list("hw1\nhw2 closes 23:59\n"), [])
+        self.assertEqual(parse_assignment_list("hw1\n$HOME/hw2\n"), [])
+
+    @patch('utils.assignment_catalog.get_setting')
+    def test_check_enforced_only_with_configured_command(self, mock_get_setting):
+        """Test that the default list command is advisory and a configured one is trusted"""
+        mock_get_setting.return_value = None
+        self.assertEqual(get_list_command(), DEFAULT_LIST_COMMAND)
+        self.assertFalse(assignment_check_enforced())
+
+        mock_get_setting.return_value = "ls /course/open"
+        self.assertEqual(get_list_command(), "ls /course/open")
+        self.assertTrue(assignment_check_enforced())
+
+    def test_unknown_assignment_message(self):
+        """Test that unknown names are rejected with a suggestion and known or unchecked ones are not"""
+        message = unknown_assignment_message("hw01", ["hw1", "project"])
+
+        self.assertIn("Did you mean 'hw1'?", message)
+        self.assertIn("hw1, project", message)
+        self.assertIsNone(unknown_assignment_message("hw1", ["hw1", "project"]))
+        self.assertIsNone(unknown_assignment_message("hw01", None))
+
+    def test_refresh_persists(self):
+        """Test that a listing is cached and survives reloading"""
+        ssh = mock_ssh("hw1\nhw2\n")
+
+        self.assertEqual(AssignmentCatalog(self.path).refresh(ssh, command="turnin --list"), ["hw1", "hw2"])
+        ssh.exec_command.assert_called_once_with("turnin --list", timeout=LIST_TIMEOUT)
+        self.assertEqual(AssignmentCatalog(self.path).names(), ["hw1", "hw2"])
+
+    def test_failed_refresh_keeps_listing(self):
+        """Test that a server without a list command does not clear a good listing"""
+        catalog = AssignmentCatalog(self.path)
+        catalog.store(["hw1"])
+
+        self.assertIsNone(catalog.refresh(mock_ssh("", exit_status=1)))
+        self.assertEqual(catalog.names(), ["hw1"])
+
+    def test_fresh_names_expire(self):
+        """Test that a listing older than the TTL is not trusted"""
+        catalog = AssignmentCatalog(self.path, ttl=600)
+        with patch('utils.assignment_catalog.time.time', return_value=1000.0):
+            catalog.store(["hw1"])
+
+        with patch('utils.assignment_catalog.time.time', return_value=1500.0):
+            self.assertEqual(catalog.fresh_names(), ["hw1"])
+        with patch('utils.assignment_catalog.time.time', return_value=1700.0):
+            self.assertIsNone(catalog.fresh_names())
+            self.assertEqual(catalog.names(), ["hw1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
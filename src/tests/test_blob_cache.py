@@ -0,0 +1,188 @@
+import unittest
+import os
+import hashlib
+import json
+import tempfile
+from unittest.mock import patch, MagicMock
+
+import paramiko
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.blob_cache import LocalHashCache, list_blobs, find_cached_blobs, blobs_to_evict, build_link_command
+from utils.stub_ssh_server import StubSSHServer
+from utils.load_test import make_payload
+import utils.ssh
+
+
+class TestBlobCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "main.c")
+        with open(self.path, "wb") as f:
+            f.write(b"int main() { return 0; }\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_local_hash_cache(self):
+        """Test that a digest is reused until the file changes, and survives a reload"""
+        cache_path = os.path.join(self.temp_dir.name, "hashes.json")
+        cache = LocalHashCache(cache_path)
+        expected = hashlib.sha256(b"int main() { return 0; }\n").hexdigest()
+
+        self.assertEqual(cache.digest(self.path), expected)
+        cache.save()
+        with patch('utils.blob_cache.UploadSource') as mock_source:
+            self.assertEqual(LocalHashCache(cache_path).digest(self.path), expected)
+            mock_source.assert_not_called()
+
+        with open(self.path, "ab") as f:
+            f.write(b"// changed\n")
+        self.assertIsNone(cache.get(self.path))
+        self.assertNotEqual(cache.digest(self.path), expected)
+
+    def test_local_hash_cache_is_bounded(self):
+        """Test that the oldest entries are forgotten first"""
+        cache = LocalHashCache(os.path.join(self.temp_dir.name, "hashes.json"), max_entries=2)
+        for name in ("a", "b", "c"):
+            cache.put(os.path.join(self.temp_dir.name, name), name, (1, 1, 1))
+
+        self.assertEqual([os.path.basename(path) for path in cache._entries], ["b", "c"])
+
+    def test_list_blobs_skips_partial_uploads(self):
+        """Test that blobs are listed by name, size and ctime with one call, leaving out partial uploads"""
+        good = "a" * 64
+        stdout = MagicMock()
+        stdout.read.return_value = f"{good} 120 1760000000.5\n.0123abcd.part 40 1760000001.0\n".encode()
+        stdout.channel.recv_exit_status.return_value = 0
+        mock_ssh = MagicMock()
+        mock_ssh.exec_command.return_value = (MagicMock(), stdout, MagicMock())
+
+        self.assertEqual(list_blobs(mock_ssh, "/home/u/turnin/.blobs"), {good: (120, 1760000000.5)})
+        mock_ssh.exec_command.assert_called_once()
+
+    def test_find_cached_blobs_ignores_wrong_sizes(self):
+        """Test that only blobs of the expected size are reused"""
+        good, truncated = "a" * 64, "b" * 64
+        blobs = {good: (120, 1.0), truncated: (3, 2.0)}
+
+        self.assertEqual(find_cached_blobs(blobs, {good: 120, truncated: 50, "c" * 64: 10}), {good})
+
+    def test_blobs_to_evict(self):
+        """Test that the least recently used blobs outside the submission are removed first"""
+        blobs = {"old": (60, 1.0), "kept": (60, 2.0), "newer": (60, 3.0), "newest": (60, 4.0)}
+
+        self.assertEqual(blobs_to_evict(blobs, {"kept"}, 130), ["old", "newer"])
+        self.assertEqual(blobs_to_evict(blobs, set(), 240), [])
+
+    def test_build_link_command(self):
+        """Test that names are quoted and every file is linked in one command"""
+        cmd = build_link_command("/home/u/turnin/.blobs", "/home/u/turnin/sub-1/", {"my file.c": "ab", "b.h": "cd"})
+
+        self.assertEqual(cmd, "cd /home/u/turnin/sub-1/ && ln -f -- /home/u/turnin/.blobs/ab 'my file.c' && "
+                              "ln -f -- /home/u/turnin/.blobs/cd b.h")
+
+
+class TestBlobCacheUpload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.host_key = paramiko.RSAKey.generate(2048)
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = StubSSHServer("secret", host_key=self.host_key)
+        self.server.start()
+
+        home = os.path.join(self.temp_dir.name, "home")
+        os.makedirs(os.path.join(home, ".ssh"))
+        with open(os.path.join(home, ".ssh", "known_hosts"), 'w') as f:
+            f.write("\n".join(self.server.known_hosts()) + "\n")
+        # The blob cache is opt-in
+        os.makedirs(os.path.join(home, ".turnin"))
+        with open(os.path.join(home, ".turnin", "config.json"), 'w') as f:
+            json.dump({"blob_cache": True}, f)
+        self.patches = [
+            patch.dict(os.environ, {'HOME': home, 'USERPROFILE': home}),
+            patch('utils.assignment_catalog.get_catalog_path',
+                  return_value=os.path.join(home, "assignments.json")),
+            patch('utils.connection_pool._pool', None),
+        ]
+        for p in self.patches:
+            p.start()
+        self.files = make_payload(self.temp_dir.name, 3, 64)
+
+    def tearDown(self):
+        from utils.connection_pool import close_connection_pool
+        close_connection_pool()
+        for p in self.patches:
+            p.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def upload(self, files):
+        from utils.ssh import connect_to_proxy, upload_files
+
+        success, _, ssh, _ = connect_to_proxy("student000", "secret", self.server.gateway, notify=False)
+        self.assertTrue(success)
+        try:
+            with patch('utils.ssh.upload_blob', wraps=utils.ssh.upload_blob) as upload:
+                remote_dir, names = upload_files(files, "student000", "secret", ssh, self.server.gateway, "turnin")
+        finally:
+            ssh.close()
+        return remote_dir, names, upload.call_count
+
+    def test_unchanged_files_are_not_sent_again(self):
+        """Test that a resubmission only uploads the file that changed, and links the rest"""
+        _, names, uploads = self.upload(self.files)
+        self.assertEqual(uploads, 3)
+
+        with open(self.files[0], "ab") as f:
+            f.write(b"changed")
+        remote_dir, names, uploads = self.upload(self.files)
+
+        self.assertEqual(uploads, 1)
+        self.assertEqual(names, [os.path.basename(path) for path in self.files])
+        staged = os.path.join(self.server.local_path(remote_dir), names[1])
+        with open(self.files[1], "rb") as f:
+            blob = os.path.join(self.server.local_path("/home/student000/turnin/.blobs"),
+                                hashlib.sha256(f.read()).hexdigest())
+        # Hard linked, not copied
+        self.assertTrue(os.path.samefile(staged, blob))
+
+    def test_cache_kept_under_size_cap(self):
+        """Test that blobs of earlier submissions are removed once the cache outgrows its cap"""
+        self.upload(self.files[:2])
+        blob_dir = self.server.local_path("/home/student000/turnin/.blobs")
+        self.assertEqual(len(os.listdir(blob_dir)), 2)
+
+        # Room for two of the 64 KiB files
+        with patch('utils.ssh.get_blob_cache_limit', return_value=2 * 64 * 1024):
+            _, names, uploads = self.upload(self.files[1:])
+
+        self.assertEqual(uploads, 1)
+        self.assertEqual(len(names), 2)
+        with open(self.files[0], "rb") as f:
+            first = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(len(os.listdir(blob_dir)), 2)
+        self.assertNotIn(first, os.listdir(blob_dir))
+
+    def test_copies_when_links_fail(self):
+        """Test that blobs are copied where hard links are not supported"""
+        self.upload(self.files)
+
+        with patch('os.link', side_effect=PermissionError(1, "Operation not permitted")):
+            remote_dir, names, uploads = self.upload(self.files)
+
+        self.assertEqual(uploads, 0)
+        self.assertEqual(len(names), 3)
+        staged = os.path.join(self.server.local_path(remote_dir), names[0])
+        with open(staged, "rb") as remote, open(self.files[0], "rb") as local:
+            self.assertEqual(remote.read(), local.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
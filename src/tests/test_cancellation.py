@@ -0,0 +1,61 @@
+import unittest
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.cancellation import CancellationToken, CancelledError, cancellable
+
+
+class TestCancellation(unittest.TestCase):
+
+    def test_callbacks_run_once(self):
+        """Test that callbacks run on the first cancel only and can be unregistered"""
+        token = CancellationToken()
+        calls = []
+        token.on_cancel(lambda: calls.append("a"))
+        unregister = token.on_cancel(lambda: calls.append("b"))
+        unregister()
+
+        token.cancel()
+        token.cancel()
+
+        self.assertEqual(calls, ["a"])
+        self.assertTrue(token.cancelled)
+
+    def test_callback_after_cancel_runs_immediately(self):
+        """Test that registering on a cancelled token runs the callback right away"""
+        token = CancellationToken()
+        token.cancel()
+        calls = []
+
+        token.on_cancel(lambda: calls.append("late"))
+
+        self.assertEqual(calls, ["late"])
+
+    def test_failing_callback_does_not_stop_others(self):
+        """Test that an error in one callback does not skip the rest"""
+        token = CancellationToken()
+        calls = []
+        token.on_cancel(lambda: 1 / 0)
+        token.on_cancel(lambda: calls.append("closed"))
+
+        token.cancel()
+
+        self.assertEqual(calls, ["closed"])
+
+    def test_cancellable(self):
+        """Test that errors become CancelledError only once the token is cancelled"""
+        token = CancellationToken()
+        with self.assertRaises(OSError):
+            with cancellable(token):
+                raise OSError("socket closed")
+
+        token.cancel()
+        with self.assertRaises(CancelledError):
+            with cancellable(token):
+                raise OSError("socket closed")
+
+
+if __name__ == '__main__':
+    unittest.main()
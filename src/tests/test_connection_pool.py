@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import MagicMock
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.connection_pool import ConnectionPool, MAX_SESSIONS_PER_TRANSPORT, SESSIONS_PER_LEASE
+
+
+def make_client(alive=True):
+    client = MagicMock()
+    transport = client.get_transport.return_value
+    transport.is_active.return_value = alive
+    transport.is_authenticated.return_value = alive
+    return client
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = []
+
+        def connector(host, port, username, password, sock):
+            client = make_client()
+            client.connected_with = (host, port, username, password, sock)
+            self.clients.append(client)
+            return client
+
+        self.pool = ConnectionPool(connector, max_leases=2)
+
+    def test_reuses_connection_per_key(self):
+        """Test that leases for the same host and user share a connection"""
+        first = self.pool.acquire("gw", "user", "pass")
+        first.close()
+        second = self.pool.acquire("gw", "user", "pass")
+        other_user = self.pool.acquire("gw", "other", "pass")
+
+        self.assertIs(second.client, first.client)
+        self.assertIsNot(other_user.client, first.client)
+        self.assertEqual(len(self.clients), 2)
+        # Lease delegates to the client
+        second.exec_command("pwd")
+        self.clients[0].exec_command.assert_called_once_with("pwd")
+
+    def test_other_password_does_not_reuse_connection(self):
+        """Test that a lease with another password logs in again instead of reusing the transport"""
+        self.pool.acquire("gw", "user", "pass").close()
+        wrong = self.pool.acquire("gw", "user", "wrong")
+
+        self.assertIsNot(wrong.client, self.clients[0])
+        self.assertEqual(self.clients[1].connected_with, ("gw", 22, "user", "wrong", None))
+        self.assertNotIn("pass", repr(wrong.key))
+
+    def test_extra_sessions_within_budget(self):
+        """Test that extra sessions are granted only up to what the leases leave of MaxSessions"""
+        lease = self.pool.acquire("gw", "user", "pass")
+        transport = self.clients[0].get_transport.return_value
+        spare = MAX_SESSIONS_PER_TRANSPORT - SESSIONS_PER_LEASE * 2
+
+        self.assertEqual(self.pool.reserve_sessions(transport, 100), spare)
+        self.assertEqual(self.pool.reserve_sessions(transport, 1), 0)
+        self.pool.release_sessions(transport, spare)
+        self.assertEqual(self.pool.reserve_sessions(transport, 1), 1)
+        # Transports the pool does not own are not limited
+        self.assertEqual(self.pool.reserve_sessions(MagicMock(), 3), 3)
+        lease.close()
+
+    def test_caps_leases_per_connection(self):
+        """Test that a fully leased connection makes the pool open another one"""
+        leases = [self.pool.acquire("gw", "user", "pass") for _ in range(3)]
+
+        self.assertEqual(len(self.clients), 2)
+        self.assertEqual(sorted(self.pool.stats()[("gw", 22, "user", ())]), [1, 2])
+
+        leases[0].close()
+        leases[0].close()  # releasing twice has no effect
+        self.assertEqual(sorted(self.pool.stats()[("gw", 22, "user", ())]), [1, 1])
+
+    def test_dead_connection_is_replaced(self):
+        """Test that a connection whose transport died is closed and not handed out again"""
+        lease = self.pool.acquire("gw", "user", "pass")
+        self.clients[0].get_transport.return_value.is_active.return_value = False
+        lease.close()
+
+        self.pool.acquire("gw", "user", "pass")
+
+        self.clients[0].close.assert_called_once()
+        self.assertEqual(len(self.clients), 2)
+
+    def test_idle_connection_is_probed(self):
+        """Test that a connection idle past the health check interval is probed before reuse"""
+        self.pool.health_check_after = 0
+        self.pool.acquire("gw", "user", "pass").close()
+        self.clients[0].get_transport.return_value.open_session.side_effect = EOFError()
+
+        lease = self.pool.acquire("gw", "user", "pass")
+
+        self.assertIs(lease.client, self.clients[1])
+        self.clients[0].close.assert_called_once()
+
+    def test_evict_idle(self):
+        """Test that unused connections are closed after the idle timeout"""
+        busy = self.pool.acquire("gw", "user", "pass")
+        self.pool.acquire("other", "user", "pass").close()
+        self.pool.idle_timeout = 0
+
+        self.assertEqual(self.pool.evict_idle(), 1)
+        self.clients[1].close.assert_called_once()
+        self.clients[0].close.assert_not_called()
+        busy.close()
+
+    def test_connection_through_gateway(self):
+        """Test that hosts behind a gateway are reached over a channel of the pooled gateway connection"""
+        gateway = self.pool.acquire("gw", "user", "pass")
+        target = self.pool.acquire("target", "user", "pass", via=gateway)
+
+        channel = self.clients[0].get_transport.return_value.open_channel.return_value
+        self.assertEqual(self.clients[1].connected_with[:4], ("target", 22, "user", "pass"))
+        self.assertIs(self.clients[1].connected_with[4].channel, channel)
+        self.clients[0].get_transport.return_value.open_channel.assert_called_once_with(
+            'direct-tcpip', ("target", 22), ('127.0.0.1', 0), timeout=None
+        )
+        self.assertEqual(target.key[:4], ("target", 22, "user", (("gw", 22),)))
+        # The target connection holds its own lease on the gateway
+        self.assertEqual(self.pool.stats()[("gw", 22, "user", ())], [2])
+
+        self.pool.close_all()
+        self.clients[1].close.assert_called_once()
+        self.clients[0].close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
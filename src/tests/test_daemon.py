@@ -0,0 +1,156 @@
+import unittest
+import contextlib
+import io
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import paramiko
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.daemon import DaemonServer, DaemonClient, LoginRequired, daemon_supported, submit_main
+from utils.stub_ssh_server import StubSSHServer
+from utils.load_test import make_payload
+
+
+@unittest.skipUnless(daemon_supported(), "Unix sockets are not available")
+class TestDaemon(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.host_key = paramiko.RSAKey.generate(2048)
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = StubSSHServer("secret", host_key=self.host_key)
+        self.server.start()
+
+        home = os.path.join(self.temp_dir.name, "home")
+        os.makedirs(os.path.join(home, ".ssh"))
+        with open(os.path.join(home, ".ssh", "known_hosts"), 'w') as f:
+            f.write("\n".join(self.server.known_hosts()) + "\n")
+        self.patches = [
+            patch.dict(os.environ, {'HOME': home, 'USERPROFILE': home}),
+            patch('utils.assignment_catalog.get_catalog_path',
+                  return_value=os.path.join(home, "assignments.json")),
+            patch('utils.connection_pool._pool', None),
+        ]
+        for p in self.patches:
+            p.start()
+        self.files = make_payload(self.temp_dir.name, 2, 64)
+        self.socket_path = os.path.join(self.temp_dir.name, "daemon.sock")
+        self.daemon = None
+
+    def tearDown(self):
+        if self.daemon:
+            self.daemon.shutdown()
+            self.daemon_thread.join(timeout=10)
+        for p in self.patches:
+            p.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def start_daemon(self, idle_timeout=60, cache_credentials=False):
+        self.daemon = DaemonServer(self.socket_path, idle_timeout=idle_timeout, proxy_hosts=[self.server.gateway],
+                                   cache_credentials=cache_credentials)
+        self.daemon.bind()
+        self.daemon_thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+        self.daemon_thread.start()
+        return DaemonClient(self.socket_path)
+
+    def test_socket_is_private(self):
+        """Test that only the current user can use the socket"""
+        client = self.start_daemon()
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+        self.assertFalse(client.ping()['logged_in'])
+
+    def test_later_submissions_reuse_the_connection(self):
+        """Test that a daemon caching credentials keeps its login and connection for the next submission"""
+        client = self.start_daemon(cache_credentials=True)
+
+        with self.assertRaises(LoginRequired):
+            client.submit("loadtest", self.files)
+
+        progress = []
+        ok, output = client.submit("loadtest", self.files, "student000", "secret",
+                                   progress_callback=lambda percent, message: progress.append(percent))
+        self.assertTrue(ok, output)
+        self.assertEqual(progress[-1], 100)
+
+        ok, output = client.submit("loadtest", self.files)
+        self.assertTrue(ok, output)
+
+        stats = self.server.stats.snapshot()
+        self.assertEqual(stats['counts']['submissions'], 2)
+        # One gateway login and one rupt for both submissions
+        self.assertEqual(stats['connections']['total'], 1)
+        self.assertEqual(stats['counts']['rupt'], 1)
+
+    def test_credentials_not_kept_by_default(self):
+        """Test that without caching every submission brings credentials but still reuses the connection"""
+        client = self.start_daemon()
+
+        ok, output = client.submit("loadtest", self.files, "student000", "secret")
+        self.assertTrue(ok, output)
+        self.assertFalse(client.ping()['logged_in'])
+        with self.assertRaises(LoginRequired):
+            client.submit("loadtest", self.files)
+
+        ok, output = client.submit("loadtest", self.files, "student000", "secret")
+        self.assertTrue(ok, output)
+        self.assertEqual(self.server.stats.snapshot()['connections']['total'], 1)
+
+    def test_submit_starts_daemon_only_when_enabled(self):
+        """Test that turnin submit does not start a daemon unless asked to"""
+        with patch('utils.daemon.get_socket_path', return_value=self.socket_path), \
+                patch('utils.daemon.start_daemon', return_value=False) as start, \
+                patch('utils.daemon.submit_directly', return_value=(True, "done")), \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(submit_main(["loadtest"] + self.files), 0)
+            start.assert_not_called()
+
+            self.assertEqual(submit_main(["--daemon", "loadtest"] + self.files), 0)
+            start.assert_called_once()
+
+    def test_wrong_password(self):
+        """Test that a failed login is reported and not remembered"""
+        client = self.start_daemon()
+
+        ok, output = client.login("student000", "wrong")
+
+        self.assertFalse(ok)
+        self.assertIn("Authentication failed", output)
+        self.assertFalse(client.ping()['logged_in'])
+
+    def test_idle_shutdown(self):
+        """Test that the daemon exits and removes its socket when idle"""
+        self.start_daemon(idle_timeout=0.5)
+
+        self.daemon_thread.join(timeout=10)
+
+        self.assertFalse(self.daemon_thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket_path))
+        self.assertIsNone(DaemonClient(self.socket_path).ping())
+
+    def test_stale_socket_replaced(self):
+        """Test that a socket left by a crashed daemon does not block a new one"""
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socket_path)
+        stale.close()
+
+        client = self.start_daemon()
+
+        self.assertIsNotNone(client.ping())
+        with self.assertRaises(RuntimeError):
+            DaemonServer(self.socket_path).bind()
+
+
+if __name__ == '__main__':
+    unittest.main()
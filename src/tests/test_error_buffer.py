@@ -0,0 +1,146 @@
+import unittest
+import os
+import tempfile
+import time
+from unittest.mock import MagicMock
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.error_buffer import ErrorSpool, Deduplicator, SpoolingTransport
+
+
+def make_event(lineno=10, exc_type="TimeoutError"):
+    """Build a minimal Sentry exception event"""
+    return {
+        'exception': {'values': [{
+            'type': exc_type,
+            'value': "timed out",
+            'stacktrace': {'frames': [{'module': "utils.ssh", 'function': "connect", 'lineno': lineno}]},
+        }]}
+    }
+
+
+class TestErrorSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_reports_kept_in_order(self):
+        """Test that reports are listed oldest first"""
+        spool = ErrorSpool(self.temp_dir.name)
+        for data in (b"first", b"second", b"third"):
+            spool.put(data)
+
+        contents = []
+        for report in spool.pending():
+            with open(report, 'rb') as f:
+                contents.append(f.read())
+
+        self.assertEqual(contents, [b"first", b"second", b"third"])
+
+    def test_oldest_reports_dropped_when_full(self):
+        """Test that the spool stays within its report and byte limits"""
+        spool = ErrorSpool(self.temp_dir.name, max_reports=3, max_bytes=1000)
+        for i in range(5):
+            spool.put(f"report {i}".encode())
+
+        self.assertEqual(len(spool.pending()), 3)
+        with open(spool.pending()[0], 'rb') as f:
+            self.assertEqual(f.read(), b"report 2")
+
+        spool.put(b"x" * 995)
+
+        self.assertEqual(len(spool.pending()), 1)
+
+
+class TestDeduplicator(unittest.TestCase):
+
+    def test_repeats_suppressed_within_window(self):
+        """Test that identical errors are sent once per window with a count of repeats"""
+        dedup = Deduplicator(window=60)
+
+        self.assertIsNotNone(dedup.before_send(make_event()))
+        self.assertIsNone(dedup.before_send(make_event()))
+        self.assertIsNone(dedup.before_send(make_event()))
+        # A different location is a different error
+        self.assertIsNotNone(dedup.before_send(make_event(lineno=11)))
+
+        dedup.window = 0
+        time.sleep(0.01)
+        event = dedup.before_send(make_event())
+
+        self.assertEqual(event['extra']['duplicates_suppressed'], 2)
+
+    def test_log_events_deduplicated_by_message(self):
+        """Test that events captured from logging are identified by their message template"""
+        dedup = Deduplicator(window=60)
+        log_event = {'logger': "utils.ssh", 'logentry': {'message': "Connection failed: %s"}}
+
+        self.assertIsNotNone(dedup.before_send(dict(log_event)))
+        self.assertIsNone(dedup.before_send(dict(log_event)))
+
+
+class TestSpoolingTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.spool = ErrorSpool(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_transport(self, sender):
+        return SpoolingTransport({'dsn': None}, spool=self.spool, sender=sender, start=False)
+
+    def test_capture_spools_without_sending(self):
+        """Test that capturing only queues the envelope until the background thread runs"""
+        sender = MagicMock(return_value=True)
+        transport = self.make_transport(sender)
+        envelope = MagicMock()
+        envelope.serialize.return_value = b"envelope"
+
+        transport.capture_envelope(envelope)
+        sender.assert_not_called()
+
+        transport.flush(timeout=1)
+        self.assertEqual(len(self.spool.pending()), 1)
+
+    def test_failed_sends_stay_spooled(self):
+        """Test that envelopes are only removed from the spool once sent"""
+        sender = MagicMock(side_effect=[True, ConnectionError("offline")])
+        self.spool.put(b"one")
+        self.spool.put(b"two")
+        self.spool.put(b"three")
+        transport = self.make_transport(sender)
+
+        self.assertFalse(transport.send_pending())
+        self.assertEqual(len(self.spool.pending()), 2)
+
+        sender.side_effect = None
+        sender.return_value = True
+        self.assertTrue(transport.send_pending())
+        self.assertEqual(self.spool.pending(), [])
+        self.assertEqual(sender.call_args_list[-1][0][0], b"three")
+
+    def test_background_thread_sends_spooled_reports(self):
+        """Test that reports left from an earlier session are sent when the transport starts"""
+        self.spool.put(b"left over")
+        sender = MagicMock(return_value=True)
+        transport = self.make_transport(sender)
+
+        transport.start()
+        deadline = time.time() + 5
+        while self.spool.pending() and time.time() < deadline:
+            time.sleep(0.01)
+        transport.kill()
+
+        sender.assert_called_once_with(b"left over")
+        self.assertEqual(self.spool.pending(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
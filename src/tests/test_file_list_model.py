@@ -0,0 +1,119 @@
+import unittest
+import os
+import tempfile
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PyQt6.QtCore import QCoreApplication
+from ui.file_list_model import FileListModel, format_size
+
+
+class TestFileListModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        os.makedirs(os.path.join(self.root, "sub"))
+        self.files = []
+        for name, size in [("a.txt", 10), ("b.txt", 20), (os.path.join("sub", "c.txt"), 30)]:
+            path = os.path.join(self.root, name)
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+            self.files.append(path)
+        self.model = FileListModel()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def drain(self):
+        """Run the batching timers' work synchronously"""
+        while self.model.is_busy():
+            self.model._process_pending()
+        while self.model._stat_cursor < self.model.rowCount():
+            self.model._stat_next_batch()
+
+    def test_add_paths_ignores_duplicates(self):
+        """Test that duplicate paths are only added once"""
+        self.model.add_paths([self.files[0], self.files[1], self.files[0]])
+        self.model.add_paths([self.files[1]])
+        self.drain()
+
+        self.assertEqual(self.model.paths(), self.files[:2])
+        self.assertTrue(self.model.contains(self.files[0]))
+        self.assertEqual(self.model.total_size(), 30)
+
+    def test_add_directory_walks_files(self):
+        """Test that adding a directory adds every file inside it"""
+        self.model.add_directory(self.root)
+        self.drain()
+
+        self.assertEqual(sorted(self.model.paths()), sorted(self.files))
+        self.assertEqual(self.model.total_size(), 60)
+
+    def test_same_name_in_other_directory_is_reported(self):
+        """Test that a file whose name is already selected is left out and reported"""
+        other = os.path.join(self.root, "sub", "a.txt")
+        with open(other, "wb") as f:
+            f.write(b"y")
+        conflicts = []
+        self.model.name_conflicts.connect(conflicts.append)
+
+        self.model.add_paths([self.files[0], other, self.files[1]])
+        self.drain()
+
+        self.assertEqual(self.model.paths(), self.files[:2])
+        self.assertEqual(conflicts, [[other]])
+
+        # Once the first one is removed the other can be added
+        self.model.remove_rows([0])
+        self.model.add_paths([other])
+        self.drain()
+        self.assertIn(other, self.model.paths())
+
+    def test_add_paths_in_batches(self):
+        """Test that large selections are inserted in several batches"""
+        self.model.INSERT_BATCH_SIZE = 2
+        self.model.add_paths(self.files)
+        self.model._process_pending()
+
+        self.assertEqual(self.model.rowCount(), 2)
+        self.assertTrue(self.model.is_busy())
+
+        self.drain()
+        self.assertEqual(self.model.rowCount(), 3)
+
+    def test_remove_rows(self):
+        """Test removing rows keeps the index and totals consistent"""
+        self.model.add_paths(self.files)
+        self.drain()
+
+        self.model.remove_rows([0, 2])
+
+        self.assertEqual(self.model.paths(), [self.files[1]])
+        self.assertFalse(self.model.contains(self.files[0]))
+        self.assertTrue(self.model.contains(self.files[1]))
+        self.assertEqual(self.model.total_size(), 20)
+
+    def test_clear(self):
+        """Test clearing the model"""
+        self.model.add_paths(self.files)
+        self.drain()
+        self.model.clear()
+
+        self.assertEqual(self.model.rowCount(), 0)
+        self.assertEqual(self.model.total_size(), 0)
+
+    def test_format_size(self):
+        """Test human readable sizes"""
+        self.assertEqual(format_size(512), "512 B")
+        self.assertEqual(format_size(2048), "2.0 KB")
+        self.assertEqual(format_size(5 * 1024 * 1024), "5.0 MB")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.file_watcher import FileWatcher, fingerprint
+
+
+class TestFileWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.batches = []
+        self.batch_ready = threading.Event()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def on_change(self, paths):
+        self.batches.append(paths)
+        self.batch_ready.set()
+
+    def make_file(self, name, content="x"):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def wait_for_batch(self, timeout=5):
+        self.assertTrue(self.batch_ready.wait(timeout), "no batch reported")
+        self.batch_ready.clear()
+        return self.batches[-1]
+
+    def test_fingerprint(self):
+        """Test that the fingerprint changes with the content and is None for missing files"""
+        path = self.make_file("a.c", "one")
+        before = fingerprint(path)
+
+        self.make_file("a.c", "three")
+
+        self.assertNotEqual(fingerprint(path), before)
+        self.assertIsNone(fingerprint(os.path.join(self.temp_dir.name, "missing.c")))
+
+    def test_polling_debounces_changes_into_one_batch(self):
+        """Test that a burst of writes is reported once, after the files go quiet"""
+        first = self.make_file("a.c")
+        second = self.make_file("b.c")
+        watcher = FileWatcher(self.on_change, debounce=0.3, poll_interval=0.05, use_inotify=False)
+        watcher.set_paths([first, second])
+        watcher.start()
+        try:
+            # The initial content is reported once
+            self.assertEqual(self.wait_for_batch(), {first, second})
+            self.assertEqual(watcher.mode, 'polling')
+
+            for i in range(3):
+                self.make_file("a.c", "x" * (i + 2))
+                time.sleep(0.05)
+            self.make_file("b.c", "changed")
+
+            self.assertEqual(self.wait_for_batch(), {first, second})
+            time.sleep(0.5)
+            self.assertEqual(len(self.batches), 2)
+        finally:
+            watcher.stop()
+
+    def test_max_batch_delay(self):
+        """Test that a file written continuously is still reported"""
+        path = self.make_file("a.c")
+        watcher = FileWatcher(self.on_change, debounce=10, max_batch_delay=0.3, poll_interval=0.05,
+                              use_inotify=False)
+        watcher.set_paths([path])
+        watcher.start()
+        try:
+            self.assertEqual(self.wait_for_batch(), {path})
+        finally:
+            watcher.stop()
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux only")
+    def test_inotify_sees_rename_over_save(self):
+        """Test that saving by renaming a new copy over the file is detected, and other files are ignored"""
+        path = self.make_file("a.c")
+        watcher = FileWatcher(self.on_change, debounce=0.1)
+        watcher.set_paths([path])
+        watcher.start()
+        try:
+            self.wait_for_batch()
+            self.assertEqual(watcher.mode, 'inotify')
+
+            self.make_file("unrelated.swp")
+            replacement = self.make_file("a.c.tmp", "new content")
+            os.replace(replacement, path)
+
+            self.assertEqual(self.wait_for_batch(), {path})
+        finally:
+            watcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.host_cache import HostCache
+
+
+class TestHostCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "host_cache.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_record_persists(self):
+        """Test that the last good host survives reloading the cache"""
+        HostCache(self.path).record("gw1", "dl380ws03")
+
+        cache = HostCache(self.path)
+
+        self.assertEqual(cache.get("gw1"), "dl380ws03")
+        self.assertIsNone(cache.get("gw2"))
+
+    def test_old_entries_ignored(self):
+        """Test that a host not verified within max_age is not returned"""
+        cache = HostCache(self.path)
+        with patch('utils.host_cache.time.time', return_value=1000.0):
+            cache.record("gw1", "dl380ws03")
+
+        with patch('utils.host_cache.time.time', return_value=1100.0):
+            self.assertEqual(cache.get("gw1", max_age=200), "dl380ws03")
+            self.assertIsNone(cache.get("gw1", max_age=50))
+
+    def test_forget_only_matching_host(self):
+        """Test that forgetting a host keeps a newer replacement recorded meanwhile"""
+        cache = HostCache(self.path)
+        cache.record("gw1", "dl380ws04")
+
+        cache.forget("gw1", "dl380ws03")
+        self.assertEqual(cache.get("gw1"), "dl380ws04")
+
+        cache.forget("gw1", "dl380ws04")
+        self.assertIsNone(HostCache(self.path).get("gw1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import hashlib
+import io
+import unittest
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.integrity import parse_sha256sum, remote_hashes, find_mismatches, verify_staged_files
+
+
+class TestIntegrity(unittest.TestCase):
+
+    def test_parse_sha256sum(self):
+        """Test parsing sha256sum output, including binary markers and escaped names"""
+        output = (
+            "AAAA  file one.txt\n"
+            "bbbb *binary.bin\n"
+            "\\cccc  weird\\nname\n"
+            "garbage\n"
+        )
+
+        self.assertEqual(parse_sha256sum(output), {"file one.txt": "aaaa", "binary.bin": "bbbb"})
+
+    def test_remote_hashes_single_call(self):
+        """Test that all names are hashed with one quoted command"""
+        mock_ssh = MagicMock()
+        stdout = MagicMock()
+        stdout.read.return_value = b"aaaa  a.c\n"
+        stdout.channel.recv_exit_status.return_value = 1  # b c is missing
+        mock_ssh.exec_command.return_value = (None, stdout, MagicMock())
+
+        hashes = remote_hashes(mock_ssh, "/home/u/turnin/sub-1/", ["a.c", "b c"])
+
+        self.assertEqual(hashes, {"a.c": "aaaa"})
+        mock_ssh.exec_command.assert_called_once_with("cd /home/u/turnin/sub-1/ && sha256sum -- a.c 'b c'")
+
+    @patch('utils.integrity.HASH_ARGV_BYTES', 16)
+    def test_remote_hashes_batches_names(self):
+        """Test that a long selection is hashed in several bounded calls"""
+        mock_ssh = MagicMock()
+
+        def exec_command(cmd):
+            stdout = MagicMock()
+            names = cmd.split(" -- ", 1)[1].split()
+            stdout.read.return_value = "".join(f"{name}{name}  {name}\n" for name in names).encode()
+            stdout.channel.recv_exit_status.return_value = 0
+            return None, stdout, MagicMock()
+        mock_ssh.exec_command.side_effect = exec_command
+        names = [f"file{i}.c" for i in range(5)]
+
+        hashes = remote_hashes(mock_ssh, "/tmp/", names)
+
+        self.assertEqual(hashes, {name: name + name for name in names})
+        self.assertEqual(mock_ssh.exec_command.call_count, 3)
+
+    def test_remote_hashes_unavailable(self):
+        """Test that a server without sha256sum reports that it cannot hash"""
+        mock_ssh = MagicMock()
+        stdout = MagicMock()
+        stdout.read.return_value = b""
+        stdout.channel.recv_exit_status.return_value = 127
+        stderr = MagicMock()
+        stderr.read.return_value = b"sha256sum: command not found"
+        mock_ssh.exec_command.return_value = (None, stdout, stderr)
+
+        self.assertIsNone(remote_hashes(mock_ssh, "/tmp/", ["a.c"]))
+
+    @patch('utils.integrity.remote_hashes', return_value=None)
+    def test_unverifiable_files_fail_verification(self, mock_hashes):
+        """Test that files the server cannot hash are reported instead of passing"""
+        local_hashes = {"a.c": "aaaa", "b.c": "bbbb"}
+
+        mismatched = verify_staged_files(MagicMock(), MagicMock(), "/tmp/", {}, local_hashes)
+
+        self.assertEqual(mismatched, ["a.c", "b.c"])
+
+    def test_repair_keeps_linked_blob(self):
+        """Test that re-uploading a staged hard link replaces it instead of writing through to the blob"""
+        with tempfile.TemporaryDirectory() as root:
+            blob = os.path.join(root, "blob")
+            with open(blob, 'wb') as f:
+                f.write(b"cached")
+            staging = os.path.join(root, "sub-1") + "/"
+            os.mkdir(staging)
+            os.link(blob, staging + "a.c")
+            local = os.path.join(root, "a.c")
+            with open(local, 'wb') as f:
+                f.write(b"fresh")
+
+            class LocalFile(io.FileIO):
+                def set_pipelined(self, pipelined=True):
+                    pass
+
+            class LocalSFTP:
+                def open(self, path, mode='r', bufsize=-1):
+                    return LocalFile(path, mode)
+
+                def posix_rename(self, old, new):
+                    os.rename(old, new)
+
+            fresh = hashlib.sha256(b"fresh").hexdigest()
+            with patch('utils.integrity.remote_hashes', side_effect=[{"a.c": "cached"}, {"a.c": fresh}]):
+                mismatched = verify_staged_files(MagicMock(), LocalSFTP(), staging, {"a.c": local}, {"a.c": fresh})
+
+            self.assertEqual(mismatched, [])
+            with open(blob, 'rb') as f:
+                self.assertEqual(f.read(), b"cached")
+            with open(staging + "a.c", 'rb') as f:
+                self.assertEqual(f.read(), b"fresh")
+            self.assertEqual(os.listdir(staging), ["a.c"])
+
+    def test_find_mismatches(self):
+        """Test that missing and different files are reported"""
+        expected = {"a": "1", "b": "2", "c": "3"}
+        actual = {"a": "1", "b": "x"}
+
+        self.assertEqual(find_mismatches(expected, actual), ["b", "c"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import tempfile
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.latency import LatencyHistory, percentile, DEFAULT_TIMEOUTS, HISTORY_SIZE
+
+
+class TestLatencyHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "latency.json")
+        self.history = LatencyHistory(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile([7], 0.95), 7)
+
+    def test_default_without_history(self):
+        """Test that defaults are used until enough samples exist"""
+        self.history.record("host", 'connect', 0.1)
+        self.assertEqual(self.history.timeout("host", 'connect'), DEFAULT_TIMEOUTS['connect'])
+
+    def test_timeout_from_history(self):
+        """Test that the timeout follows the high percentile of the history"""
+        for seconds in [1.0] * 19 + [4.0]:
+            self.history.record("host", 'command', seconds)
+
+        # 95th percentile of 20 samples is the 19th value (1.0), times 3, raised to the floor
+        self.assertEqual(self.history.timeout("host", 'command'), 30)
+
+        for _ in range(5):
+            self.history.record("host", 'command', 40.0)
+        self.assertEqual(self.history.timeout("host", 'command'), 120.0)
+
+    def test_timeout_grows_after_timing_out(self):
+        """Test that a timed-out operation raises the timeout instead of being forgotten"""
+        for _ in range(10):
+            self.history.record("host", 'command', 1.0)
+        self.assertEqual(self.history.timeout("host", 'command'), 30)
+
+        self.history.record_timeout("host", 'command', 30)
+        self.assertEqual(self.history.timeout("host", 'command'), 90)
+        self.assertEqual(self.history.samples("host", 'command')[-1], 30)
+
+        # Survives reloading, and is capped at the ceiling
+        reloaded = LatencyHistory(self.path)
+        reloaded.record_timeout("host", 'command', 200)
+        self.assertEqual(reloaded.timeout("host", 'command'), 300)
+
+    def test_timeout_clamped(self):
+        """Test that timeouts never go below the floor or above the ceiling"""
+        for _ in range(10):
+            self.history.record("fast", 'connect', 0.01)
+            self.history.record("slow", 'connect', 60.0)
+
+        self.assertEqual(self.history.timeout("fast", 'connect'), 3)
+        self.assertEqual(self.history.timeout("slow", 'connect'), 30)
+
+    def test_history_bounded_and_persisted(self):
+        """Test that only the most recent samples are kept and they survive reloading"""
+        for i in range(HISTORY_SIZE + 10):
+            self.history.record("host", 'banner', float(i))
+
+        reloaded = LatencyHistory(self.path)
+        samples = reloaded.samples("host", 'banner')
+
+        self.assertEqual(len(samples), HISTORY_SIZE)
+        self.assertEqual(samples[-1], float(HISTORY_SIZE + 9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import os
+import json
+import tempfile
+from unittest.mock import patch
+
+import paramiko
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.load_test import percentile, summarize, run_client, run_level, make_payload
+from utils.stub_ssh_server import StubSSHServer
+
+# Generating a host key is slow, so the tests share one
+HOST_KEY = paramiko.RSAKey.generate(2048)
+
+
+class TestLoadTestReport(unittest.TestCase):
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        """Test that failures are counted and excluded from the latency percentiles"""
+        results = [
+            {'ok': True, 'total': 1.0, 'connect': 0.2, 'error': None},
+            {'ok': True, 'total': 3.0, 'connect': 0.4, 'error': None},
+            {'ok': False, 'total': 9.0, 'connect': None, 'error': "connect failed (timeout)"},
+        ]
+
+        summary = summarize(results)
+
+        self.assertEqual(summary['ok'], 2)
+        self.assertAlmostEqual(summary['failure_rate'], 1 / 3)
+        self.assertEqual(summary['p99'], 3.0)
+        self.assertEqual(summary['errors'], {"connect failed (timeout)": 1})
+
+
+class TestStubServerFlow(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = StubSSHServer("secret", host_key=HOST_KEY)
+        self.server.start()
+
+        # A client home that trusts the stub server
+        home = self.home = os.path.join(self.temp_dir.name, "home")
+        os.makedirs(os.path.join(home, ".ssh"))
+        with open(os.path.join(home, ".ssh", "known_hosts"), 'w') as f:
+            f.write("\n".join(self.server.known_hosts()) + "\n")
+        self.patches = [
+            patch.dict(os.environ, {'HOME': home, 'USERPROFILE': home}),
+            patch('utils.assignment_catalog.get_catalog_path',
+                  return_value=os.path.join(home, "assignments.json")),
+            patch('utils.connection_pool._pool', None),
+        ]
+        for p in self.patches:
+            p.start()
+        self.files = make_payload(self.temp_dir.name, 2, 64)
+
+    def tearDown(self):
+        from utils.connection_pool import close_connection_pool
+        close_connection_pool()
+        for p in self.patches:
+            p.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def test_submission_through_stub_server(self):
+        """Test that the real connect, upload and submit flow works against the stub server"""
+        result = run_client(0, self.server.gateway, "secret", self.files)
+
+        self.assertTrue(result['ok'], result['error'])
+        stats = self.server.stats.snapshot()
+        self.assertEqual(stats['counts']['submissions'], 1)
+        self.assertEqual(stats['counts']['rupt'], 1)
+        # The submission host was reached through the gateway
+        self.assertEqual(stats['tunnels']['total'], 1)
+
+    def test_unknown_assignment_rejected_before_upload(self):
+        """Test that a closed assignment fails without uploading or running turnin"""
+        from utils.ssh import connect_to_proxy, submit_files, ASSIGNMENT_NOT_OPEN
+        # Only a configured list command is trusted to reject names
+        os.makedirs(os.path.join(self.home, ".turnin"))
+        with open(os.path.join(self.home, ".turnin", "config.json"), 'w') as f:
+            json.dump({"assignment_list_command": "turnin --list"}, f)
+
+        success, host, ssh, _ = connect_to_proxy("student000", "secret", self.server.gateway, notify=False)
+        self.assertTrue(success)
+        try:
+            ok, output = submit_files(self.server.gateway, host, "student000", "secret", "lodtest",
+                                      self.files, "turnin", ssh_client=ssh)
+        finally:
+            ssh.close()
+
+        self.assertFalse(ok)
+        self.assertTrue(output.startswith(ASSIGNMENT_NOT_OPEN))
+        self.assertIn("Did you mean 'loadtest'?", output)
+        stats = self.server.stats.snapshot()
+        self.assertEqual(stats['counts'].get('submissions', 0), 0)
+        self.assertEqual(stats['sftp']['total'], 1)
+        # No file reached the staging directory
+        staging = os.path.join(self.server.root, "home", "student000", "turnin")
+        self.assertEqual([name for _, _, names in os.walk(staging) for name in names], [])
+
+    def test_unknown_assignment_warned_by_default(self):
+        """Test that without a configured list command an unknown name is submitted with a warning"""
+        from utils.ssh import connect_to_proxy, submit_files
+
+        success, host, ssh, _ = connect_to_proxy("student000", "secret", self.server.gateway, notify=False)
+        self.assertTrue(success)
+        try:
+            ok, output = submit_files(self.server.gateway, host, "student000", "secret", "lodtest",
+                                      self.files, "turnin", ssh_client=ssh)
+        finally:
+            ssh.close()
+
+        self.assertTrue(ok, output)
+        self.assertTrue(output.startswith("Warning: Assignment 'lodtest' is not open"))
+        self.assertEqual(self.server.stats.snapshot()['counts']['submissions'], 1)
+
+    def test_wrong_password(self):
+        """Test that a failed login is reported as a failure"""
+        result = run_client(0, self.server.gateway, "wrong", self.files)
+
+        self.assertFalse(result['ok'])
+        self.assertEqual(result['error'], "connect failed (auth)")
+
+    def test_concurrent_clients(self):
+        """Test that a level of client processes runs and is summarized"""
+        summary, stats = run_level(self.server, 2, self.files, self.temp_dir.name, timeout=120)
+
+        self.assertEqual(summary['ok'], 2, summary['errors'])
+        self.assertEqual(stats['connections']['total'], 2)
+        self.assertEqual(stats['counts']['submissions'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import tempfile
+import logging
+import gzip
+import time
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.logging_setup import CompressingRotatingFileHandler, RateLimitFilter, setup_logging, stop_logging
+
+
+def make_record(msg, lineno=1, level=logging.INFO):
+    return logging.LogRecord("test", level, "/src/utils/ssh.py", lineno, msg, None, None)
+
+
+class TestLoggingSetup(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.temp_dir.name, "turnin.log")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_size_rotation_compresses(self):
+        """Test that rotated files are gzipped and the backup count is respected"""
+        handler = CompressingRotatingFileHandler(self.log_path, max_bytes=100, backup_count=2)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        for i in range(10):
+            handler.emit(make_record(f"line {i} " + "x" * 60))
+        handler.close()
+
+        names = sorted(os.listdir(self.temp_dir.name))
+        self.assertEqual(names, ["turnin.log", "turnin.log.1.gz", "turnin.log.2.gz"])
+        with gzip.open(os.path.join(self.temp_dir.name, "turnin.log.1.gz"), "rt") as f:
+            self.assertIn("line 8", f.read())
+
+    def test_time_rotation(self):
+        """Test that a log older than the interval is rotated on the next record"""
+        with open(self.log_path, "w") as f:
+            f.write("old run\n")
+        stale = time.time() - 3600
+        os.utime(self.log_path, (stale, stale))
+
+        handler = CompressingRotatingFileHandler(self.log_path, interval=60)
+        handler.emit(make_record("new run"))
+        handler.close()
+
+        with open(self.log_path) as f:
+            self.assertNotIn("old run", f.read())
+        self.assertTrue(os.path.exists(self.log_path + ".1.gz"))
+
+    def test_rate_limit(self):
+        """Test that a chatty call site is limited and reports what was suppressed"""
+        rate_filter = RateLimitFilter(rate=2, period=0.2)
+
+        passed = [rate_filter.filter(make_record("chunk")) for _ in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        # Other call sites and warnings are unaffected
+        self.assertTrue(rate_filter.filter(make_record("other", lineno=2)))
+        self.assertTrue(rate_filter.filter(make_record("bad", level=logging.WARNING)))
+
+        time.sleep(0.25)
+        record = make_record("chunk")
+        self.assertTrue(rate_filter.filter(record))
+        self.assertIn("3 similar messages suppressed", record.getMessage())
+
+    def test_setup_logging_writes_through_queue(self):
+        """Test that records logged anywhere end up in the log file"""
+        root = logging.getLogger()
+        saved_handlers, saved_level = list(root.handlers), root.level
+        try:
+            setup_logging(log_path=self.log_path, console=False)
+            logging.getLogger("utils.ssh").info("queued message")
+            stop_logging()
+        finally:
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in saved_handlers:
+                root.addHandler(handler)
+            root.setLevel(saved_level)
+
+        with open(self.log_path) as f:
+            self.assertIn("utils.ssh - INFO - queued message", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
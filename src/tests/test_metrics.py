@@ -0,0 +1,125 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch, MagicMock
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import MetricsRegistry, LATENCY_BUCKETS, TEXTFILE_NAME, format_labels
+from utils.integrity import upload_and_hash
+from utils.connection_pool import CountingChannel
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, "metrics")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_textfile(self):
+        with open(os.path.join(self.directory, TEXTFILE_NAME), encoding='utf-8') as f:
+            return f.read()
+
+    def test_render_counters_and_histograms(self):
+        """Test the textfile content in the Prometheus text format"""
+        registry = MetricsRegistry(self.directory)
+        registry.inc('turnin_ssh_connects_total', host="dl380", result="ok")
+        registry.inc('turnin_ssh_connects_total', host="dl380", result="ok")
+        registry.inc('turnin_upload_bytes_total', 1500)
+        registry.observe('turnin_rupt_seconds', 0.02)
+        registry.observe('turnin_rupt_seconds', 400)
+
+        self.assertTrue(registry.write())
+        text = self.read_textfile()
+
+        self.assertIn("# TYPE turnin_ssh_connects_total counter", text)
+        self.assertIn('turnin_ssh_connects_total{host="dl380",result="ok"} 2', text)
+        self.assertIn("turnin_upload_bytes_total 1500", text)
+        self.assertIn("# TYPE turnin_rupt_seconds histogram", text)
+        self.assertIn('turnin_rupt_seconds_bucket{le="0.01"} 0', text)
+        self.assertIn('turnin_rupt_seconds_bucket{le="0.025"} 1', text)
+        self.assertIn(f'turnin_rupt_seconds_bucket{{le="{LATENCY_BUCKETS[-1]}"}} 1', text)
+        self.assertIn('turnin_rupt_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("turnin_rupt_seconds_sum 400.02", text)
+        self.assertIn("turnin_rupt_seconds_count 2", text)
+        # Nothing recorded, nothing to write
+        self.assertFalse(registry.write())
+
+    def test_totals_accumulate_across_sessions(self):
+        """Test that a later process adds to the totals written by an earlier one"""
+        first = MetricsRegistry(self.directory)
+        first.inc('turnin_ssh_auth_failures_total', host="gw")
+        first.observe('turnin_command_seconds', 3, host="dl380")
+        first.write()
+
+        second = MetricsRegistry(self.directory)
+        second.inc('turnin_ssh_auth_failures_total', host="gw")
+        second.observe('turnin_command_seconds', 4, host="dl380")
+        second.write()
+        text = self.read_textfile()
+
+        self.assertIn('turnin_ssh_auth_failures_total{host="gw"} 2', text)
+        self.assertIn('turnin_command_seconds_count{host="dl380"} 2', text)
+        self.assertIn('turnin_command_seconds_sum{host="dl380"} 7', text)
+
+    def test_failed_write_keeps_values(self):
+        """Test that values are written later if the directory cannot be written now"""
+        with open(self.directory, 'w') as f:
+            f.write("not a directory")
+        registry = MetricsRegistry(self.directory)
+        registry.inc('turnin_tunnel_bytes_total', 10, direction="up")
+
+        self.assertFalse(registry.write())
+
+        os.remove(self.directory)
+        registry.inc('turnin_tunnel_bytes_total', 5, direction="up")
+        self.assertTrue(registry.write())
+        self.assertIn('turnin_tunnel_bytes_total{direction="up"} 15', self.read_textfile())
+
+    def test_label_escaping(self):
+        """Test that label values cannot break the line format"""
+        self.assertEqual(format_labels({'b': 'x"y', 'a': 'c\\d\n'}), 'a="c\\\\d\\n",b="x\\"y"')
+
+    def test_upload_records_bytes_and_latency(self):
+        """Test that each SFTP put counts its bytes and its duration"""
+        local_path = os.path.join(self.temp_dir.name, "payload.bin")
+        with open(local_path, "wb") as f:
+            f.write(b"x" * 3000)
+        sftp = MagicMock()
+        registry = MetricsRegistry(self.directory)
+
+        with patch('utils.integrity.get_metrics', return_value=registry):
+            upload_and_hash(sftp, local_path, "/remote/payload.bin", chunk_size=1024)
+        registry.write()
+        text = self.read_textfile()
+
+        self.assertIn("turnin_upload_bytes_total 3000", text)
+        self.assertIn("turnin_upload_put_seconds_count 1", text)
+
+    def test_tunnel_channel_counts_bytes(self):
+        """Test that traffic through a channel to a host behind the gateway is counted by direction"""
+        channel = MagicMock()
+        channel.send.side_effect = len
+        channel.recv.side_effect = [b"x" * 300, b""]
+        registry = MetricsRegistry(self.directory)
+        counting = CountingChannel(channel, registry)
+
+        counting.send(b"a" * 100)
+        counting.sendall(b"b" * 20)
+        counting.recv(4096)
+        counting.recv(4096)
+        counting.settimeout(5)
+        registry.write()
+        text = self.read_textfile()
+
+        self.assertIn('turnin_tunnel_bytes_total{direction="up"} 120', text)
+        self.assertIn('turnin_tunnel_bytes_total{direction="down"} 300', text)
+        channel.settimeout.assert_called_once_with(5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import socket
+import tempfile
+from unittest.mock import patch
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.net import (
+    interleave_families, race_connect, open_connection,
+    load_cached_address, store_cached_address, split_host_port
+)
+
+
+class TestNet(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        cache_path = os.path.join(self.temp_dir.name, "dns_cache.json")
+        self.path_patch = patch('utils.net.get_dns_cache_path', return_value=cache_path)
+        self.path_patch.start()
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.open_addr = (socket.AF_INET, self.server.getsockname())
+
+        # A port nothing listens on: bind, read the port, close
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        self.closed_addr = (socket.AF_INET, closed.getsockname())
+        closed.close()
+
+    def tearDown(self):
+        self.server.close()
+        self.path_patch.stop()
+        self.temp_dir.cleanup()
+
+    def test_interleave_families(self):
+        """Test that IPv6 and IPv4 addresses alternate, IPv6 first"""
+        v4a = (socket.AF_INET, ('192.0.2.1', 22))
+        v4b = (socket.AF_INET, ('192.0.2.2', 22))
+        v6a = (socket.AF_INET6, ('2001:db8::1', 22, 0, 0))
+
+        self.assertEqual(interleave_families([v4a, v4b, v6a]), [v6a, v4a, v4b])
+
+    def test_split_host_port(self):
+        """Test that gateway specifications with and without ports are split"""
+        self.assertEqual(split_host_port("scylla.cs.uoi.gr"), ("scylla.cs.uoi.gr", 22))
+        self.assertEqual(split_host_port("127.0.0.1:2222"), ("127.0.0.1", 2222))
+        self.assertEqual(split_host_port("[2001:db8::1]:2222"), ("2001:db8::1", 2222))
+        self.assertEqual(split_host_port("2001:db8::1"), ("2001:db8::1", 22))
+
+    def test_race_connect_skips_failed_address(self):
+        """Test that a refused address moves the race on to the next one"""
+        sock, winner = race_connect([self.closed_addr, self.open_addr], timeout=5, attempt_delay=5)
+        try:
+            self.assertEqual(winner, self.open_addr)
+        finally:
+            sock.close()
+
+    def test_race_connect_all_fail(self):
+        """Test that an error is raised when no address answers"""
+        with self.assertRaises(OSError):
+            race_connect([self.closed_addr], timeout=5)
+
+    def test_cache_expiry(self):
+        """Test that cached addresses expire after their TTL"""
+        store_cached_address("host", 22, *self.open_addr, ttl=60)
+        self.assertEqual(load_cached_address("host", 22), self.open_addr)
+
+        store_cached_address("host", 22, *self.open_addr, ttl=-1)
+        self.assertIsNone(load_cached_address("host", 22))
+
+    @patch('utils.net.resolve')
+    def test_open_connection_caches_winner(self, mock_resolve):
+        """Test that the winning address is cached and used without resolving again"""
+        mock_resolve.return_value = [self.closed_addr, self.open_addr]
+
+        open_connection("host", 22, timeout=5).close()
+        self.assertEqual(load_cached_address("host", 22), self.open_addr)
+
+        mock_resolve.reset_mock()
+        open_connection("host", 22, timeout=5).close()
+        mock_resolve.assert_not_called()
+
+    @patch('utils.net.resolve')
+    def test_open_connection_stale_cache(self, mock_resolve):
+        """Test that a cached address that fails is dropped and DNS is used"""
+        store_cached_address("host", 22, *self.closed_addr)
+        mock_resolve.return_value = [self.open_addr]
+
+        open_connection("host", 22, timeout=5).close()
+
+        mock_resolve.assert_called_once_with("host", 22)
+        self.assertEqual(load_cached_address("host", 22), self.open_addr)
+
+
+if __name__ == '__main__':
+    unittest.main()
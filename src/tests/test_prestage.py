@@ -0,0 +1,129 @@
+import unittest
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+import paramiko
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.prestage import PreStager
+from utils.connection_pool import get_connection_pool, close_connection_pool
+from utils.net import split_host_port
+from utils.stub_ssh_server import StubSSHServer
+from utils.load_test import make_payload
+import utils.prestage
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class TestPreStager(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.host_key = paramiko.RSAKey.generate(2048)
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = StubSSHServer("secret", host_key=self.host_key)
+        self.server.start()
+
+        home = os.path.join(self.temp_dir.name, "home")
+        os.makedirs(os.path.join(home, ".ssh"))
+        with open(os.path.join(home, ".ssh", "known_hosts"), 'w') as f:
+            f.write("\n".join(self.server.known_hosts()) + "\n")
+        self.patches = [
+            patch.dict(os.environ, {'HOME': home, 'USERPROFILE': home}),
+            patch('utils.assignment_catalog.get_catalog_path',
+                  return_value=os.path.join(home, "assignments.json")),
+            patch('utils.connection_pool._pool', None),
+        ]
+        for p in self.patches:
+            p.start()
+        self.files = make_payload(self.temp_dir.name, 2, 64)
+        self.stager = PreStager(self.connect, "turnin", debounce=0.1)
+        self.batches = []
+        self.stager.add_listener(lambda staged, total: self.batches.append((staged, total)))
+
+    def tearDown(self):
+        self.stager.stop(remove=False)
+        close_connection_pool()
+        for p in self.patches:
+            p.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def connect(self):
+        host, port = split_host_port(self.server.gateway)
+        return get_connection_pool().acquire(host, "student000", "secret", port=port)
+
+    def wait_until_staged(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            staged, total = self.stager.status()
+            if total and staged == total:
+                return
+            time.sleep(0.05)
+        self.fail(f"files not staged: {self.stager.status()}")
+
+    def test_watched_files_are_staged_and_restaged_on_change(self):
+        """Test that the files are uploaded in the background, and again after an edit"""
+        self.stager.start(self.files)
+        self.wait_until_staged()
+
+        remote_dir = self.stager.remote_dir
+        self.assertIn("/watch-", remote_dir)
+        local_dir = self.server.local_path(remote_dir)
+        self.assertEqual(sorted(os.listdir(local_dir)), sorted(os.path.basename(f) for f in self.files))
+
+        with open(self.files[0], 'wb') as f:
+            f.write(b"edited")
+        remote_copy = os.path.join(local_dir, os.path.basename(self.files[0]))
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and read_file(remote_copy) != b"edited":
+            time.sleep(0.05)
+        self.assertEqual(read_file(remote_copy), b"edited")
+        self.wait_until_staged()
+        self.assertEqual(self.stager.remote_dir, remote_dir)
+        self.assertEqual(self.batches[-1], (2, 2))
+
+    def test_submit_only_runs_turnin(self):
+        """Test that a submission in watch mode uploads nothing already staged"""
+        from utils.ssh import connect_to_proxy, submit_files
+
+        self.stager.start(self.files)
+        self.wait_until_staged()
+        remote_dir = self.stager.remote_dir
+
+        success, host, ssh, _ = connect_to_proxy("student000", "secret", self.server.gateway, notify=False)
+        self.assertTrue(success)
+        try:
+            with patch('utils.prestage.upload_and_hash', wraps=utils.prestage.upload_and_hash) as upload:
+                ok, output = submit_files(self.server.gateway, host, "student000", "secret", "loadtest",
+                                          self.files, "turnin", ssh_client=ssh, prestager=self.stager)
+        finally:
+            ssh.close()
+
+        self.assertTrue(ok, output)
+        upload.assert_not_called()
+        self.assertEqual(self.server.stats.snapshot()['counts']['submissions'], 1)
+        # The directory is kept for the next submission
+        self.assertTrue(os.path.isdir(self.server.local_path(remote_dir)))
+
+    def test_stage_uploads_unstaged_files(self):
+        """Test that a submission uploads files the watcher has not staged yet"""
+        with self.connect() as ssh:
+            remote_dir, names = self.stager.stage(ssh, self.files)
+
+        self.assertEqual(names, [os.path.basename(f) for f in self.files])
+        self.assertTrue(all(self.stager.is_staged(f) for f in self.files))
+        self.assertEqual(sorted(os.listdir(self.server.local_path(remote_dir))), sorted(names))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.proxy_health import ProxyHealth, get_proxy_hosts, UNKNOWN_SUCCESS_RATE
+
+
+class TestProxyHealth(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "proxy_health.json")
+        self.health = ProxyHealth(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_unknown_host_score(self):
+        """Test that hosts without history get the default score"""
+        self.assertEqual(self.health.score("new.host"), UNKNOWN_SUCCESS_RATE)
+
+    def test_rank_keeps_configured_order_for_ties(self):
+        """Test that hosts with equal health stay in the configured order"""
+        self.assertEqual(self.health.rank(["a", "b", "c"]), ["a", "b", "c"])
+
+    def test_rank_prefers_healthy_hosts(self):
+        """Test that failing hosts drop below healthy and unknown ones"""
+        self.health.record("a", False)
+        self.health.record("b", True, 0.2)
+
+        self.assertEqual(self.health.rank(["a", "b", "c"]), ["b", "c", "a"])
+
+    def test_rank_prefers_fast_hosts(self):
+        """Test that slow connects lower the score"""
+        for _ in range(5):
+            self.health.record("slow", True, 8.0)
+            self.health.record("fast", True, 0.1)
+
+        self.assertEqual(self.health.rank(["slow", "fast"]), ["fast", "slow"])
+
+    def test_health_persisted(self):
+        """Test that health survives reloading"""
+        self.health.record("a", False)
+
+        reloaded = ProxyHealth(self.path)
+
+        self.assertEqual(reloaded.score("a"), self.health.score("a"))
+
+    @patch('utils.proxy_health.get_setting')
+    def test_get_proxy_hosts_from_user_config(self, mock_get_setting):
+        """Test that the user configuration overrides the built-in gateway list"""
+        mock_get_setting.return_value = ["gw1.example", "gw2.example"]
+        self.assertEqual(get_proxy_hosts(), ["gw1.example", "gw2.example"])
+
+        mock_get_setting.return_value = "not a list"
+        self.assertNotEqual(get_proxy_hosts(), "not a list")
+
+
+if __name__ == '__main__':
+    unittest.main()
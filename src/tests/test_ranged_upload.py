@@ -0,0 +1,121 @@
+import unittest
+import os
+import hashlib
+import tempfile
+import threading
+from unittest.mock import patch
+
+import paramiko
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.ranged_upload import split_ranges, RANGE_ALIGNMENT
+from utils.integrity import upload_and_hash
+from utils.rate_limit import TokenBucket, MIN_BURST
+from utils.cancellation import CancellationToken, CancelledError
+from utils.stub_ssh_server import StubSSHServer
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class TestSplitRanges(unittest.TestCase):
+
+    def test_ranges_cover_file(self):
+        """Test that the ranges are aligned, contiguous and cover the whole file"""
+        size = 10 * RANGE_ALIGNMENT + 123
+        ranges = split_ranges(size, 4, min_range=RANGE_ALIGNMENT)
+
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], size)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(start % RANGE_ALIGNMENT, 0)
+
+    def test_small_files_get_fewer_ranges(self):
+        """Test that no range is smaller than the minimum, except the last"""
+        self.assertEqual(split_ranges(3 * RANGE_ALIGNMENT, 8, min_range=2 * RANGE_ALIGNMENT),
+                         [(0, 3 * RANGE_ALIGNMENT)])
+        self.assertEqual(split_ranges(0, 4), [(0, 0)])
+
+
+class TestRangedUpload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.host_key = paramiko.RSAKey.generate(2048)
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = StubSSHServer("secret", host_key=self.host_key)
+        self.server.start()
+        self.ssh = paramiko.SSHClient()
+        self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.ssh.connect("127.0.0.1", port=self.server.port, username="student000", password="secret",
+                         allow_agent=False, look_for_keys=False)
+        self.sftp = self.ssh.open_sftp()
+        self.remote_dir = self.sftp.normalize(".")
+
+        # Large enough for four ranges with the thresholds lowered below
+        self.local_path = os.path.join(self.temp_dir.name, "archive.tar")
+        self.content = os.urandom(4 * RANGE_ALIGNMENT + 4321)
+        with open(self.local_path, 'wb') as f:
+            f.write(self.content)
+        self.patches = [
+            patch('utils.ranged_upload.RANGED_UPLOAD_THRESHOLD', RANGE_ALIGNMENT),
+            patch('utils.ranged_upload.MIN_RANGE_SIZE', RANGE_ALIGNMENT),
+            patch('utils.ranged_upload.get_stream_count', return_value=4),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.sftp.close()
+        self.ssh.close()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def test_large_file_uploaded_in_parallel_ranges(self):
+        """Test that the ranges land at the right offsets and the file appears only when complete"""
+        remote_path = f"{self.remote_dir}/archive.tar"
+
+        digest = upload_and_hash(self.sftp, self.local_path, remote_path)
+
+        self.assertEqual(digest, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(read_file(self.server.local_path(remote_path)), self.content)
+        self.assertEqual(os.listdir(self.server.local_path(self.remote_dir)), ["archive.tar"])
+        # The caller's session writes the first range, one more session per other range
+        self.assertGreaterEqual(self.server.stats.snapshot()['sftp']['total'], 4)
+
+    def test_falls_back_to_one_stream_without_sessions(self):
+        """Test that a server refusing more sessions gets the file sequentially instead of failing it"""
+        remote_path = f"{self.remote_dir}/archive.tar"
+
+        with patch('utils.ranged_upload.paramiko.SFTPClient.from_transport',
+                   side_effect=paramiko.ChannelException(1, "Administratively prohibited")):
+            digest = upload_and_hash(self.sftp, self.local_path, remote_path)
+
+        self.assertEqual(digest, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(read_file(self.server.local_path(remote_path)), self.content)
+
+    def test_cancel_removes_partial_file(self):
+        """Test that cancelling stops every range and leaves nothing behind"""
+        remote_path = f"{self.remote_dir}/archive.tar"
+        cancel_token = CancellationToken()
+        threading.Timer(0.2, cancel_token.cancel).start()
+
+        with self.assertRaises(CancelledError):
+            upload_and_hash(self.sftp, self.local_path, remote_path, cancel_token=cancel_token,
+                            rate_limiter=TokenBucket(MIN_BURST))
+
+        self.assertEqual(os.listdir(self.server.local_path(self.remote_dir)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
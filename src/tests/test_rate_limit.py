@@ -0,0 +1,99 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rate_limit import TokenBucket, MIN_BURST, get_configured_rate
+from utils.integrity import upload_and_hash
+from utils.cancellation import CancellationToken, CancelledError
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_unlimited(self):
+        """Test that a bucket without a rate never waits"""
+        bucket = TokenBucket()
+        start = time.monotonic()
+
+        bucket.consume(100 * 1024 * 1024)
+
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(bucket.chunk_size(1024 * 1024), 1024 * 1024)
+
+    def test_rate_is_enforced(self):
+        """Test that the average rate stays at the limit"""
+        rate = 4 * 1024 * 1024
+        bucket = TokenBucket(rate, burst=MIN_BURST)
+        start = time.monotonic()
+
+        for _ in range(32):
+            bucket.consume(MIN_BURST)
+
+        # 1 MiB at 4 MiB/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(bucket.chunk_size(1024 * 1024), MIN_BURST)
+
+    def test_rate_change_applies_while_waiting(self):
+        """Test that lifting the limit releases a caller that is already waiting"""
+        bucket = TokenBucket(MIN_BURST)
+        threading.Timer(0.1, bucket.set_rate, args=(None,)).start()
+        start = time.monotonic()
+
+        # Would take 10 seconds at the original rate
+        bucket.consume(10 * MIN_BURST)
+
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_parent_limit_applies(self):
+        """Test that a per-submission bucket cannot exceed the global limit"""
+        parent = TokenBucket(4 * 1024 * 1024, burst=MIN_BURST)
+        child = TokenBucket(1024 * 1024 * 1024, parent=parent)
+        start = time.monotonic()
+
+        child.consume(1024 * 1024)
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(child.chunk_size(1024 * 1024), MIN_BURST)
+
+    def test_cancel_while_waiting(self):
+        """Test that cancelling interrupts the wait"""
+        bucket = TokenBucket(MIN_BURST)
+        token = CancellationToken()
+        threading.Timer(0.1, token.cancel).start()
+
+        with self.assertRaises(CancelledError):
+            bucket.consume(10 * MIN_BURST, cancel_token=token)
+
+    def test_configured_rate(self):
+        """Test that the user setting is read in KiB/s and 0 means unlimited"""
+        with patch('utils.rate_limit.get_setting', return_value=512):
+            self.assertEqual(get_configured_rate(), 512 * 1024)
+        with patch('utils.rate_limit.get_setting', return_value=0):
+            self.assertIsNone(get_configured_rate())
+        with patch('utils.rate_limit.get_setting', return_value="fast"):
+            self.assertIsNone(get_configured_rate())
+
+    def test_upload_goes_through_limiter(self):
+        """Test that every uploaded byte is counted in chunks no larger than the burst"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "data.bin")
+            with open(path, "wb") as f:
+                f.write(os.urandom(3 * MIN_BURST + 10))
+            limiter = MagicMock()
+            limiter.chunk_size.return_value = MIN_BURST
+            mock_sftp = MagicMock()
+
+            upload_and_hash(mock_sftp, path, "/remote/data.bin", rate_limiter=limiter)
+
+        amounts = [c[0][0] for c in limiter.consume.call_args_list]
+        self.assertEqual(sum(amounts), 3 * MIN_BURST + 10)
+        self.assertLessEqual(max(amounts), MIN_BURST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import patch
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.retry import RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_should_retry(self):
+        """Test that only transient errors are retried, up to max_attempts"""
+        policy = RetryPolicy(max_attempts=3)
+
+        self.assertTrue(policy.should_retry(1, 'timeout'))
+        self.assertTrue(policy.should_retry(2, 'timeout'))
+        self.assertFalse(policy.should_retry(3, 'timeout'))
+        self.assertFalse(policy.should_retry(1, 'auth'))
+        self.assertFalse(policy.should_retry(1, 'other'))
+
+    @patch('utils.retry.random.uniform', side_effect=lambda low, high: high)
+    def test_delay_backoff_capped(self, mock_uniform):
+        """Test that the delay cap doubles every attempt up to max_delay"""
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+
+        self.assertEqual([policy.delay(n) for n in range(1, 6)], [1.0, 2.0, 4.0, 5.0, 5.0])
+
+    def test_delay_jitter_in_range(self):
+        """Test that jittered delays stay between zero and the cap"""
+        policy = RetryPolicy(base_delay=1.0, max_delay=8.0)
+
+        for _ in range(100):
+            self.assertTrue(0 <= policy.delay(3) <= 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import socket
+import threading
+import time
+import uuid
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PyQt6.QtCore import QCoreApplication, QDir
+from ui.single_instance import InstanceServer, forward_to_running_instance, start_instance_server
+
+
+class FakeWindow:
+    def __init__(self):
+        self.opened = []
+
+    def open_paths(self, paths, assignment=None):
+        self.opened.append((paths, assignment))
+
+
+class TestSingleInstance(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        self.name = f"turnin-test-{uuid.uuid4().hex[:12]}"
+        self.server = InstanceServer(self.name)
+
+    def tearDown(self):
+        self.server.close()
+
+    def forward(self, paths, assignment=None, forward=None):
+        """Forward from another thread while this one runs the server's event loop"""
+        result = []
+        forward = forward or (lambda: forward_to_running_instance(paths, assignment, name=self.name))
+        thread = threading.Thread(target=lambda: result.append(forward()))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while thread.is_alive() and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        thread.join()
+        return result[0]
+
+    def test_no_running_instance(self):
+        self.assertFalse(forward_to_running_instance(["a.c"], name=self.name, timeout_ms=200))
+
+    def test_forward_to_attached_window(self):
+        self.assertTrue(self.server.listen())
+        window = FakeWindow()
+        self.server.attach(window)
+
+        self.assertTrue(self.forward(["a.c", "lab1"], "lab1"))
+        self.assertEqual(window.opened, [([os.path.abspath("a.c"), os.path.abspath("lab1")], "lab1")])
+
+    def test_requests_kept_until_window_attached(self):
+        self.assertTrue(self.server.listen())
+        self.server.queue(["/tmp/first.c"])
+        self.assertTrue(self.forward(["/tmp/second.c"]))
+
+        window = FakeWindow()
+        self.server.attach(window)
+        self.assertEqual(window.opened, [(["/tmp/first.c"], None), (["/tmp/second.c"], None)])
+
+    def test_instance_started_meanwhile_gets_the_files(self):
+        """Test that a name in use is forwarded to again rather than taken over"""
+        self.assertTrue(self.server.listen())
+        window = FakeWindow()
+        self.server.attach(window)
+
+        second = self.forward(None, forward=lambda: start_instance_server(self.name, paths=["/tmp/late.c"]))
+
+        self.assertIsNone(second)
+        self.assertEqual(window.opened, [(["/tmp/late.c"], None)])
+        self.assertTrue(self.server.server.isListening())
+
+    @unittest.skipIf(sys.platform == 'win32', "named pipes are not left behind")
+    def test_stale_socket_taken_over(self):
+        """Test that the socket of an instance that crashed is removed once nobody answers on it"""
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(os.path.join(QDir.tempPath(), self.name))
+        stale.close()
+
+        server = start_instance_server(self.name, paths=["/tmp/a.c"])
+        try:
+            self.assertIsNotNone(server)
+            self.assertTrue(server.server.isListening())
+        finally:
+            server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
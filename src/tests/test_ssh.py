@@ -1,20 +1,56 @@
 import unittest
-from unittest.mock import patch, MagicMock, call, mock_open
+from unittest.mock import patch, MagicMock, call, mock_open, ANY
 import paramiko
+import socket
 import os
+import io
+import hashlib
+import json
+import tempfile
 
 # Import module to test
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.ssh import (
-    add_ssh_keys, get_available_server, connect_to_proxy,
-    upload_files, submit_files
+    add_ssh_keys, get_available_server, connect_to_proxy, connect_to_gateway,
+    upload_files, submit_files, check_assignment, error_type_for, submission_error_type
 )
+from utils.retry import RetryPolicy, NO_RETRY
+from utils.cancellation import CancellationToken, CancelledError
 
 
 class TestSSHUtils(unittest.TestCase):
 
+    def setUp(self):
+        # Keep latency samples recorded by the tests out of the real ~/.turnin
+        self.temp_dir = tempfile.TemporaryDirectory()
+        latency_path = os.path.join(self.temp_dir.name, "latency.json")
+        health_path = os.path.join(self.temp_dir.name, "proxy_health.json")
+        self.patches = [
+            patch('utils.latency.get_latency_path', return_value=latency_path),
+            patch('utils.proxy_health.get_health_path', return_value=health_path),
+            patch('utils.host_cache.get_host_cache_path',
+                  return_value=os.path.join(self.temp_dir.name, "host_cache.json")),
+            patch('utils.assignment_catalog.get_catalog_path',
+                  return_value=os.path.join(self.temp_dir.name, "assignments.json")),
+            patch('utils.user_config.get_user_config_path',
+                  return_value=os.path.join(self.temp_dir.name, "config.json")),
+            # Every test starts with an empty connection pool
+            patch('utils.connection_pool._pool', None),
+        ]
+        for p in self.patches:
+            p.start()
+        # Cached host checks are recorded instead of run in a background thread
+        self.host_check = patch('utils.ssh.start_host_check')
+        self.mock_host_check = self.host_check.start()
+        self.patches.append(self.host_check)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.temp_dir.cleanup()
+
     def test_add_ssh_keys(self):
         """Test adding SSH keys to client with host key verification and password-only user authentication"""
         # Create a mock SSH client
@@ -84,9 +120,10 @@ class TestSSHUtils(unittest.TestCase):
         # Verify no server was found
         self.assertIsNone(result)
 
+    @patch('utils.ssh.open_connection')
     @patch('utils.ssh.paramiko.SSHClient')
     @patch('utils.ssh.add_ssh_keys')
-    def test_connect_to_proxy_success(self, mock_add_keys, mock_ssh_client):
+    def test_connect_to_proxy_success(self, mock_add_keys, mock_ssh_client, mock_open_connection):
         """Test successful connection to proxy"""
         # Create mocks
         mock_ssh = MagicMock()
@@ -103,13 +140,39 @@ class TestSSHUtils(unittest.TestCase):
         # Verify results
         self.assertTrue(success)
         self.assertEqual(host, "dl-server")
-        self.assertEqual(ssh, mock_ssh)
+        self.assertEqual(ssh.client, mock_ssh)
         self.assertIsNone(error_type)
-        mock_ssh.connect.assert_called_once_with("proxy.host", username="user", password="pass", timeout=15, banner_timeout=10, allow_agent=False, look_for_keys=False)
+        mock_open_connection.assert_called_once_with("proxy.host", 22, timeout=15)
+        mock_ssh.connect.assert_called_once_with("proxy.host", port=22, username="user", password="pass", timeout=15, banner_timeout=10, allow_agent=False, look_for_keys=False, sock=mock_open_connection.return_value, transport_factory=ANY, compress=False)
+
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    @patch('utils.ssh.add_ssh_keys')
+    def test_connect_to_proxy_adaptive_timeouts(self, mock_add_keys, mock_ssh_client, mock_open_connection):
+        """Test that timeouts follow the recorded latency history"""
+        from utils.latency import record_latency
+        for _ in range(10):
+            record_latency("proxy.host", 'connect', 2.0)
+            record_latency("proxy.host", 'banner', 0.5)
+
+        mock_ssh = MagicMock()
+        mock_ssh_client.return_value = mock_ssh
+        mock_stdout = MagicMock()
+        mock_stdout.readlines.return_value = ["dl-server up\n"]
+        mock_ssh.exec_command.return_value = (None, mock_stdout, None)
+
+        connect_to_proxy("user", "pass", "proxy.host")
+
+        # 3x the 95th percentile, clamped to the 3 second floor for the banner
+        mock_open_connection.assert_called_once_with("proxy.host", 22, timeout=6.0)
+        kwargs = mock_ssh.connect.call_args[1]
+        self.assertEqual(kwargs['timeout'], 6.0)
+        self.assertEqual(kwargs['banner_timeout'], 3)
 
+    @patch('utils.ssh.open_connection')
     @patch('utils.ssh.paramiko.SSHClient')
     @patch('utils.ssh.PYQT_AVAILABLE', False)
-    def test_connect_to_proxy_no_hosts(self, mock_ssh_client):
+    def test_connect_to_proxy_no_hosts(self, mock_ssh_client, mock_open_connection):
         """Test connection when no hosts are available"""
         # Create mocks
         mock_ssh = MagicMock()
@@ -129,8 +192,9 @@ class TestSSHUtils(unittest.TestCase):
         self.assertIsNone(ssh)
         self.assertEqual(error_type, 'other')
 
+    @patch('utils.ssh.open_connection')
     @patch('utils.ssh.paramiko.SSHClient')
-    def test_connect_to_proxy_auth_error(self, mock_ssh_client):
+    def test_connect_to_proxy_auth_error(self, mock_ssh_client, mock_open_connection):
         """Test connection with authentication error"""
         # Create mocks
         mock_ssh = MagicMock()
@@ -146,22 +210,242 @@ class TestSSHUtils(unittest.TestCase):
         self.assertIsNone(ssh)
         self.assertEqual(error_type, 'auth')
 
-    def test_upload_files(self):
-        """Test uploading files to remote server using existing SSH connection"""
-        # Create mocks
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    @patch('utils.ssh.PYQT_AVAILABLE', False)
+    def test_connect_to_proxy_network_error(self, mock_ssh_client, mock_open_connection):
+        """Test that failing to reach the proxy is reported as a timeout"""
+        mock_open_connection.side_effect = OSError("Network is unreachable")
+
+        success, host, ssh, error_type = connect_to_proxy("user", "pass", "proxy.host", retry_policy=NO_RETRY)
+
+        self.assertFalse(success)
+        self.assertIsNone(ssh)
+        self.assertEqual(error_type, 'timeout')
+        mock_ssh_client.return_value.connect.assert_not_called()
+
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    @patch('utils.ssh.add_ssh_keys')
+    def test_connect_to_proxy_retries_transient_errors(self, mock_add_keys, mock_ssh_client, mock_open_connection):
+        """Test that network failures are retried with backoff until the connection works"""
+        mock_open_connection.side_effect = [OSError("timed out"), OSError("timed out"), MagicMock()]
         mock_ssh = MagicMock()
+        mock_ssh_client.return_value = mock_ssh
         mock_stdout = MagicMock()
-        mock_stdout.readlines.return_value = ["/home/user\n"]
+        mock_stdout.readlines.return_value = ["dl-server up\n"]
         mock_ssh.exec_command.return_value = (None, mock_stdout, None)
+        on_retry = MagicMock()
+
+        success, host, ssh, error_type = connect_to_proxy(
+            "user", "pass", "proxy.host",
+            retry_policy=RetryPolicy(max_attempts=4, base_delay=0), on_retry=on_retry
+        )
+
+        self.assertTrue(success)
+        self.assertEqual(host, "dl-server")
+        self.assertEqual(mock_open_connection.call_count, 3)
+        self.assertEqual(on_retry.call_count, 2)
+        self.assertEqual(on_retry.call_args[0][:2], (2, 4))
+
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    def test_connect_to_proxy_does_not_retry_auth(self, mock_ssh_client, mock_open_connection):
+        """Test that authentication failures are not retried"""
+        mock_ssh_client.return_value.connect.side_effect = paramiko.AuthenticationException()
+
+        success, _, _, error_type = connect_to_proxy(
+            "user", "pass", "proxy.host", retry_policy=RetryPolicy(max_attempts=4, base_delay=0)
+        )
+
+        self.assertFalse(success)
+        self.assertEqual(error_type, 'auth')
+        mock_ssh_client.return_value.connect.assert_called_once()
+
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    def test_connect_to_proxy_cancelled(self, mock_ssh_client, mock_open_connection):
+        """Test that cancelling stops the retries"""
+        token = CancellationToken()
+        mock_open_connection.side_effect = OSError("timed out")
+
+        success, _, _, error_type = connect_to_proxy(
+            "user", "pass", "proxy.host", retry_policy=RetryPolicy(max_attempts=4, base_delay=60),
+            cancel_token=token, on_retry=lambda *args: token.cancel()
+        )
+
+        self.assertFalse(success)
+        self.assertEqual(error_type, 'cancelled')
+        mock_open_connection.assert_called_once()
+
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    @patch('utils.ssh.add_ssh_keys')
+    def test_connect_to_gateway_failover(self, mock_add_keys, mock_ssh_client, mock_open_connection):
+        """Test that a failing gateway is skipped and ranked lower next time"""
+        def open_connection(host, port, timeout):
+            if host == "gw1":
+                raise OSError("Connection refused")
+            return MagicMock()
+        mock_open_connection.side_effect = open_connection
+
+        mock_ssh = MagicMock()
+        mock_ssh_client.return_value = mock_ssh
+        mock_stdout = MagicMock()
+        mock_stdout.readlines.return_value = ["dl-server up\n"]
+        mock_ssh.exec_command.return_value = (None, mock_stdout, None)
+
+        success, proxy_host, host, ssh, error_type = connect_to_gateway(
+            "user", "pass", ["gw1", "gw2"], retry_policy=NO_RETRY
+        )
+
+        self.assertTrue(success)
+        self.assertEqual(proxy_host, "gw2")
+        self.assertEqual(host, "dl-server")
+        self.assertEqual([c[0][0] for c in mock_open_connection.call_args_list], ["gw1", "gw2"])
+
+        # The healthy gateway is tried first from now on, reusing its pooled connection
+        mock_open_connection.reset_mock()
+        success, proxy_host, _, _, _ = connect_to_gateway("user", "pass", ["gw1", "gw2"], retry_policy=NO_RETRY)
+        self.assertEqual(proxy_host, "gw2")
+        mock_open_connection.assert_not_called()
+
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    @patch('utils.ssh.add_ssh_keys')
+    def test_connect_uses_cached_host(self, mock_add_keys, mock_ssh_client, mock_open_connection):
+        """Test that a login reuses the last good host and checks it in the background instead of running rupt"""
+        mock_ssh = MagicMock()
+        mock_ssh_client.return_value = mock_ssh
+        mock_stdout = MagicMock()
+        mock_stdout.readlines.return_value = ["dl380ws01 up\n"]
+        mock_ssh.exec_command.return_value = (None, mock_stdout, None)
+
+        success, host, ssh, _ = connect_to_proxy("user", "pass", "proxy.host")
+        self.assertEqual(host, "dl380ws01")
+        self.assertEqual(mock_ssh.exec_command.call_count, 1)
+        self.mock_host_check.assert_not_called()
+
+        success, host, ssh, _ = connect_to_proxy("user", "pass", "proxy.host")
+
+        self.assertTrue(success)
+        self.assertEqual(host, "dl380ws01")
+        # No second rupt; the cached host is checked instead
+        self.assertEqual(mock_ssh.exec_command.call_count, 1)
+        self.mock_host_check.assert_called_once()
+
+    @patch('utils.ssh.get_connection_pool')
+    def test_cached_host_check_falls_back_to_rupt(self, mock_get_pool):
+        """Test that a cached host that does not answer is replaced with one found by rupt"""
+        from utils.host_cache import get_host_cache
+        from utils.ssh import check_cached_host
+        get_host_cache().record("proxy.host", "dl380ws01")
+        mock_get_pool.return_value.acquire.side_effect = OSError("No route to host")
+        gateway = MagicMock()
+        mock_stdout = MagicMock()
+        mock_stdout.readlines.return_value = ["dl380ws01 down\n", "dl380ws02 up\n"]
+        gateway.share.return_value.exec_command.return_value = (None, mock_stdout, None)
+
+        check_cached_host(gateway, "proxy.host", "dl380ws01", "user", "pass")
+        self.mock_host_check.call_args[0][0]()
+
+        self.assertEqual(get_host_cache().get("proxy.host"), "dl380ws02")
+        gateway.share.return_value.close.assert_called_once()
+
+    @patch('utils.ssh.fetch_assignments')
+    def test_check_assignment(self, mock_fetch):
+        """Test that cached names are trusted and unknown names are checked against a fresh list"""
+        from utils.assignment_catalog import get_assignment_catalog
+        get_assignment_catalog().store(["hw1", "hw2"])
+        mock_fetch.return_value = ["hw1", "hw2"]
+
+        self.assertIsNone(check_assignment("hw1", MagicMock(), "gw1", "dl380ws01", "user", "pass"))
+        mock_fetch.assert_not_called()
+
+        message = check_assignment("hw3", MagicMock(), "gw1", "dl380ws01", "user", "pass")
+        self.assertIn("'hw3' is not open", message)
+        mock_fetch.assert_called_once()
+
+        # Without a list from the server nothing is rejected
+        mock_fetch.side_effect = paramiko.SSHException("channel closed")
+        self.assertIsNone(check_assignment("hw3", MagicMock(), "gw1", "dl380ws01", "user", "pass"))
+
+    @patch('utils.ssh.open_connection')
+    @patch('utils.ssh.paramiko.SSHClient')
+    def test_connect_to_gateway_auth_stops_failover(self, mock_ssh_client, mock_open_connection):
+        """Test that an authentication failure is not retried on other gateways"""
+        mock_ssh_client.return_value.connect.side_effect = paramiko.AuthenticationException()
+
+        success, _, _, _, error_type = connect_to_gateway("user", "pass", ["gw1", "gw2"])
+
+        self.assertFalse(success)
+        self.assertEqual(error_type, 'auth')
+        mock_open_connection.assert_called_once()
+
+    def make_upload_mocks(self, corrupt=None):
+        """Create an SSH client mock whose SFTP writes are kept in memory and hashed by sha256sum"""
+        # These tests cover uploading straight into the staging directory
+        with open(os.path.join(self.temp_dir.name, "config.json"), "w") as f:
+            json.dump({"blob_cache": False}, f)
+        remote_files = {}
+        corrupt = set(corrupt or [])
+
+        class FakeRemoteFile(io.BytesIO):
+            def __init__(self, path):
+                super().__init__()
+                self.path = path
+
+            def set_pipelined(self, pipelined=True):
+                pass
+
+            def close(self):
+                data = self.getvalue()
+                if self.path.rsplit("/", 1)[-1] in corrupt:
+                    # Corrupt the first copy only, like a transient transfer error
+                    corrupt.discard(self.path.rsplit("/", 1)[-1])
+                    data = b"corrupted" + data
+                remote_files[self.path] = data
+                super().close()
 
         mock_sftp = MagicMock()
+        mock_sftp.open.side_effect = lambda path, mode='r', bufsize=-1: FakeRemoteFile(path)
+        mock_sftp.posix_rename.side_effect = lambda old, new: remote_files.__setitem__(new, remote_files.pop(old))
+
+        def exec_command(cmd, **kwargs):
+            stdout = MagicMock()
+            stdout.channel.recv_exit_status.return_value = 0
+            if cmd == "pwd":
+                stdout.readlines.return_value = ["/home/user\n"]
+            elif "sha256sum" in cmd:
+                remote_dir = cmd.split()[1]
+                lines = [f"{hashlib.sha256(data).hexdigest()}  {path.rsplit('/', 1)[-1]}\n"
+                         for path, data in remote_files.items()
+                         if path.startswith(remote_dir) and path.rsplit("/", 1)[-1] in cmd.split()]
+                stdout.read.return_value = "".join(lines).encode()
+            return MagicMock(), stdout, MagicMock()
+
+        mock_ssh = MagicMock()
+        mock_ssh.exec_command.side_effect = exec_command
         mock_ssh.open_sftp.return_value = mock_sftp
+        return mock_ssh, mock_sftp, remote_files
+
+    def make_local_files(self):
+        """Create two local files to upload"""
+        paths = []
+        for name, content in [("file1.txt", b"hello"), ("file2.py", b"print('hi')\n")]:
+            path = os.path.join(self.temp_dir.name, name)
+            with open(path, "wb") as f:
+                f.write(content)
+            paths.append(path)
+        return paths
+
+    def test_upload_files(self):
+        """Test uploading files to remote server using existing SSH connection"""
+        # Create mocks
+        mock_ssh, mock_sftp, remote_files = self.make_upload_mocks()
 
         # Create test files
-        test_files = [
-            "/path/to/file1.txt",
-            "/path/to/file2.py"
-        ]
+        test_files = self.make_local_files()
 
         # Create progress callback mock
         mock_callback = MagicMock()
@@ -171,29 +455,106 @@ class TestSSHUtils(unittest.TestCase):
             test_files, "user", "pass", mock_ssh, "host", "tempdir", mock_callback
         )
 
-        # Verify results
-        self.assertEqual(remote_dir, "/home/user/tempdir/")
+        # Verify results - files are staged in a per-submission directory
+        self.assertTrue(remote_dir.startswith("/home/user/tempdir/sub-"))
+        self.assertTrue(remote_dir.endswith("/"))
         self.assertEqual(remote_paths, ["file1.txt", "file2.py"])
 
         # Verify SFTP usage - should use existing SSH connection
         mock_ssh.open_sftp.assert_called_once()
 
-        # Verify mkdir called
-        mock_sftp.mkdir.assert_called_once_with("/home/user/tempdir/")
-
-        # Verify SFTP puts
-        self.assertEqual(mock_sftp.put.call_count, 2)
-        mock_sftp.put.assert_has_calls([
-            call("/path/to/file1.txt", "/home/user/tempdir/file1.txt"),
-            call("/path/to/file2.py", "/home/user/tempdir/file2.py")
+        # Verify the parent and the unique staging directory were created
+        mock_sftp.mkdir.assert_has_calls([
+            call("/home/user/tempdir"),
+            call(remote_dir.rstrip("/"), mode=0o700)
         ])
 
+        # Verify the uploaded content
+        self.assertEqual(remote_files, {
+            f"{remote_dir}file1.txt": b"hello",
+            f"{remote_dir}file2.py": b"print('hi')\n",
+        })
+
+        # Verify all files were checked with a single remote sha256sum call
+        hash_calls = [c for c in mock_ssh.exec_command.call_args_list if "sha256sum" in c[0][0]]
+        self.assertEqual(len(hash_calls), 1)
+
         # Verify SFTP cleanup
         mock_sftp.close.assert_called_once()
 
         # Verify progress callback
         self.assertTrue(mock_callback.call_count >= 3)  # At least start, middle, end
 
+    def test_upload_files_reuploads_corrupted(self):
+        """Test that only files failing verification are uploaded again"""
+        mock_ssh, mock_sftp, remote_files = self.make_upload_mocks(corrupt=["file2.py"])
+        test_files = self.make_local_files()
+
+        remote_dir, remote_paths = upload_files(test_files, "user", "pass", mock_ssh, "host", "tempdir")
+
+        self.assertEqual(remote_paths, ["file1.txt", "file2.py"])
+        self.assertEqual(remote_files[f"{remote_dir}file2.py"], b"print('hi')\n")
+        opened = [c[0][0] for c in mock_sftp.open.call_args_list]
+        self.assertEqual(opened.count(f"{remote_dir}file1.txt"), 1)
+        # The repair goes to a temporary name that replaces the staged file
+        self.assertEqual(opened.count(f"{remote_dir}file2.py"), 1)
+        self.assertEqual(len(opened), 3)
+        self.assertTrue(opened[2].startswith(f"{remote_dir}.file2.py."))
+        self.assertEqual(sorted(remote_files), [f"{remote_dir}file1.txt", f"{remote_dir}file2.py"])
+
+    @patch('utils.ssh.verify_staged_files')
+    def test_upload_files_verification_failure(self, mock_verify):
+        """Test that files which never verify are not handed to turnin"""
+        mock_verify.return_value = ["file1.txt"]
+        mock_ssh, _, _ = self.make_upload_mocks()
+
+        remote_dir, remote_paths = upload_files(self.make_local_files(), "user", "pass", mock_ssh, "host", "tempdir")
+
+        self.assertEqual(remote_paths, [])
+
+    @patch('utils.ssh.start_staging_collector')
+    def test_upload_files_cancelled(self, mock_collector):
+        """Test that cancelling stops the upload, closes the SFTP channel and removes the staging directory"""
+        mock_ssh, mock_sftp, remote_files = self.make_upload_mocks()
+        token = CancellationToken()
+
+        def progress(percent, message):
+            if message.startswith("Uploaded 1/"):
+                token.cancel()
+
+        with self.assertRaises(CancelledError):
+            upload_files(self.make_local_files(), "user", "pass", mock_ssh, "host", "tempdir",
+                         progress, cancel_token=token)
+
+        self.assertEqual(len(remote_files), 1)
+        self.assertTrue(mock_sftp.close.called)
+        mock_collector.assert_called_once()
+        self.assertTrue(mock_collector.call_args[0][2].startswith("/home/user/tempdir/sub-"))
+
+    @patch('utils.ssh.connect_to_proxy')
+    def test_submit_files_rejects_duplicate_names(self, mock_connect):
+        """Test that files sharing a name are rejected before connecting"""
+        ok, message = submit_files("proxy", "host", "user", "pass", "lab1",
+                                   ["/tmp/a/Makefile", "/tmp/b/Makefile", "/tmp/a/main.c"], "tempdir")
+
+        self.assertFalse(ok)
+        self.assertIn("Makefile", message)
+        mock_connect.assert_not_called()
+
+    @patch('utils.ssh.connect_to_proxy')
+    def test_submission_error_types(self, mock_connect):
+        """Test that failed submissions are classified like connection errors, so only network failures are retried"""
+        for error_type, expected in [('timeout', 'timeout'), ('auth', 'auth'), ('other', 'other')]:
+            mock_connect.return_value = (False, None, None, error_type)
+            ok, message = submit_files("proxy", "host", "user", "pass", "lab1", ["/tmp/a/main.c"], "tempdir")
+
+            self.assertFalse(ok)
+            self.assertEqual(submission_error_type(message), expected)
+        self.assertEqual(submission_error_type("Failed to upload files"), 'other')
+        self.assertEqual(error_type_for(socket.timeout("timed out")), 'timeout')
+        self.assertEqual(error_type_for(paramiko.AuthenticationException()), 'auth')
+        self.assertEqual(error_type_for(ValueError("bad")), 'other')
+        self.assertFalse(RetryPolicy().is_transient('auth'))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,78 @@
+import unittest
+import time
+from unittest.mock import MagicMock
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.staging import create_staging_dir, build_collect_command, collect_staging_dirs, StagingHeartbeat
+
+
+class TestStaging(unittest.TestCase):
+
+    def test_create_staging_dir_unique(self):
+        """Test that each call creates a different staging directory"""
+        mock_sftp = MagicMock()
+
+        first = create_staging_dir(mock_sftp, "/home/user/turnin")
+        second = create_staging_dir(mock_sftp, "/home/user/turnin")
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.startswith("/home/user/turnin/sub-"))
+        mock_sftp.mkdir.assert_any_call(first.rstrip("/"), mode=0o700)
+
+    def test_create_staging_dir_retries_on_collision(self):
+        """Test that a name collision makes it try another name"""
+        mock_sftp = MagicMock()
+        # Parent mkdir fails (already exists), first staging name collides, second works
+        mock_sftp.mkdir.side_effect = [IOError("exists"), IOError("exists"), None]
+
+        staging_dir = create_staging_dir(mock_sftp, "/home/user/turnin")
+
+        self.assertTrue(staging_dir.startswith("/home/user/turnin/sub-"))
+        self.assertEqual(mock_sftp.mkdir.call_count, 3)
+
+    def test_create_staging_dir_gives_up(self):
+        """Test that it raises after running out of attempts"""
+        mock_sftp = MagicMock()
+        mock_sftp.mkdir.side_effect = IOError("permission denied")
+
+        with self.assertRaises(IOError):
+            create_staging_dir(mock_sftp, "/home/user/turnin", attempts=2)
+
+    def test_build_collect_command(self):
+        """Test that the collector removes the current and stale directories in one command"""
+        cmd = build_collect_command("/home/user/turnin", "/home/user/turnin/sub-1/", 30)
+
+        self.assertIn("rm -rf -- /home/user/turnin/sub-1;", cmd)
+        self.assertIn("find /home/user/turnin -mindepth 1 -maxdepth 1 -type d -name 'sub-*' -mmin +30", cmd)
+        # Watch mode directories live for a day
+        self.assertIn("-name 'watch-*' -mmin +1440", cmd)
+
+    def test_collect_staging_dirs_ignores_errors(self):
+        """Test that cleanup failures never propagate"""
+        mock_ssh = MagicMock()
+        mock_ssh.exec_command.side_effect = Exception("connection lost")
+
+        collect_staging_dirs(mock_ssh, "/home/user/turnin")
+
+        mock_ssh.exec_command.assert_called_once()
+
+    def test_heartbeat_touches_directory_until_stopped(self):
+        """Test that a directory in use keeps getting touched, and no longer once the submission ends"""
+        mock_ssh = MagicMock()
+
+        with StagingHeartbeat(mock_ssh, "/home/user/turnin/sub-1/", interval=0.02):
+            time.sleep(0.15)
+        time.sleep(0.05)
+        calls = mock_ssh.exec_command.call_count
+        time.sleep(0.1)
+
+        self.assertGreaterEqual(calls, 2)
+        self.assertEqual(mock_ssh.exec_command.call_count, calls)
+        mock_ssh.exec_command.assert_called_with("touch -c -- /home/user/turnin/sub-1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import subprocess
+import tempfile
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.startup_bench import DEFERRED_MODULES, parse_importtime, run_startup
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestStartupBench(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        """Test that only top-level imports are collected"""
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   _io\n"
+            "import time:       200 |        300 | site\n"
+            "import time:      1500 |       2500 | src.turnin\n"
+            "some other stderr line\n"
+        )
+
+        self.assertEqual(parse_importtime(output), {"site": 300, "src.turnin": 2500})
+
+    def test_startup_imports_are_deferred(self):
+        """Test that importing the application does not load the modules deferred until after the first window"""
+        with tempfile.TemporaryDirectory() as home:
+            env = dict(os.environ, HOME=home, QT_QPA_PLATFORM="offscreen")
+            result = subprocess.run(
+                [sys.executable, "-c",
+                 "import sys, src.turnin; "
+                 f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"],
+                cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60
+            )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_first_window_probe(self):
+        """Test that the first window is reported before any deferred module is loaded"""
+        probe, imports = run_startup(REPO_ROOT)
+
+        self.assertEqual(probe['deferred_loaded'], [])
+        self.assertGreater(probe['first_window_ms'], 0)
+        self.assertIn("src.ui.login_window", imports)
+
+
+if __name__ == '__main__':
+    unittest.main()
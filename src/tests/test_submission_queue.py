@@ -0,0 +1,122 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import MagicMock
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.submission_queue import (
+    SubmissionQueue, QueueScheduler,
+    STATE_QUEUED, STATE_RUNNING, STATE_DONE, STATE_FAILED
+)
+
+
+class TestSubmissionQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.temp_dir.name, "queue.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_enqueue_persists(self):
+        """Test that queued submissions survive reloading the journal"""
+        queue = SubmissionQueue(self.journal)
+        entry_id = queue.enqueue("hw1", ["/tmp/a.c"])
+
+        reloaded = SubmissionQueue(self.journal)
+        entries = reloaded.entries()
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['id'], entry_id)
+        self.assertEqual(entries[0]['state'], STATE_QUEUED)
+        self.assertEqual(entries[0]['files'], ["/tmp/a.c"])
+
+    def test_running_entries_requeued_on_load(self):
+        """Test that entries interrupted mid-send are queued again on restart"""
+        queue = SubmissionQueue(self.journal)
+        entry_id = queue.enqueue("hw1", ["/tmp/a.c"])
+        queue.update(entry_id, state=STATE_RUNNING)
+
+        reloaded = SubmissionQueue(self.journal)
+
+        self.assertEqual(reloaded.entries()[0]['state'], STATE_QUEUED)
+
+    def test_pending_order(self):
+        """Test that pending entries are ordered by priority, then attempts, then age"""
+        queue = SubmissionQueue(self.journal)
+        low = queue.enqueue("low", [])
+        retried = queue.enqueue("retried", [], priority=1)
+        high = queue.enqueue("high", [], priority=1)
+        queue.update(retried, attempts=2)
+
+        order = [entry['id'] for entry in queue.pending()]
+
+        self.assertEqual(order, [high, retried, low])
+
+    def test_listener_notified(self):
+        """Test that listeners receive a snapshot after changes"""
+        queue = SubmissionQueue(self.journal)
+        listener = MagicMock()
+        queue.add_listener(listener)
+
+        queue.enqueue("hw1", [])
+
+        listener.assert_called_once()
+        self.assertEqual(listener.call_args[0][0][0]['assignment'], "hw1")
+
+
+class TestQueueScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue = SubmissionQueue(os.path.join(self.temp_dir.name, "queue.json"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_flush_offline(self):
+        """Test that nothing is sent while the proxy is unreachable"""
+        self.queue.enqueue("hw1", [])
+        submit = MagicMock()
+        scheduler = QueueScheduler(self.queue, connect=lambda: (None, None), submit=submit)
+
+        self.assertFalse(scheduler.flush())
+        submit.assert_not_called()
+        self.assertEqual(self.queue.entries()[0]['state'], STATE_QUEUED)
+
+    def test_flush_sends_pending(self):
+        """Test that pending entries are sent and marked done"""
+        self.queue.enqueue("hw1", [])
+        self.queue.enqueue("hw2", [])
+        mock_ssh = MagicMock()
+        submit = MagicMock(return_value=(True, "ok"))
+        scheduler = QueueScheduler(self.queue, connect=lambda: (mock_ssh, "dl-server"), submit=submit)
+
+        self.assertTrue(scheduler.flush())
+
+        self.assertEqual(submit.call_count, 2)
+        self.assertTrue(all(entry['state'] == STATE_DONE for entry in self.queue.entries()))
+        mock_ssh.close.assert_called_once()
+
+    def test_flush_failure_retries_then_fails(self):
+        """Test that failed sends are retried up to max_attempts"""
+        self.queue.enqueue("hw1", [])
+        submit = MagicMock(return_value=(False, "Network connection failed"))
+        scheduler = QueueScheduler(self.queue, connect=lambda: (MagicMock(), "dl-server"),
+                                   submit=submit, max_attempts=2)
+
+        scheduler.flush()
+        self.assertEqual(self.queue.entries()[0]['state'], STATE_QUEUED)
+
+        scheduler.flush()
+        entry = self.queue.entries()[0]
+        self.assertEqual(entry['state'], STATE_FAILED)
+        self.assertEqual(entry['attempts'], 2)
+        self.assertEqual(entry['last_error'], "Network connection failed")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import socket
+from unittest.mock import patch, MagicMock
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.transport_profile import (
+    get_transport_profile, apply_socket_options, make_transport_factory, connect_options,
+    DEFAULT_PROFILE, BULK_CIPHERS
+)
+
+
+class TestTransportProfile(unittest.TestCase):
+
+    @patch('utils.transport_profile.get_setting')
+    def test_default_profile(self, mock_get_setting):
+        """Test that the default profile is used when nothing is configured"""
+        mock_get_setting.side_effect = lambda key, default=None: default
+
+        profile = get_transport_profile()
+
+        self.assertEqual(profile['name'], DEFAULT_PROFILE)
+        self.assertTrue(profile['tcp_nodelay'])
+
+    @patch('utils.transport_profile.get_setting')
+    def test_configured_profile_with_overrides(self, mock_get_setting):
+        """Test that the config file selects the profile and overrides settings"""
+        settings = {
+            "transport_profile": "compressed",
+            "transport": {"window_size": 1024, "unknown": 1},
+        }
+        mock_get_setting.side_effect = lambda key, default=None: settings.get(key, default)
+
+        profile = get_transport_profile()
+
+        self.assertEqual(profile['name'], "compressed")
+        self.assertTrue(profile['compress'])
+        self.assertEqual(profile['window_size'], 1024)
+        self.assertNotIn('unknown', profile)
+
+    @patch('utils.transport_profile.get_setting')
+    def test_unknown_profile(self, mock_get_setting):
+        """Test that an unknown profile name falls back to the default"""
+        mock_get_setting.side_effect = lambda key, default=None: default
+
+        self.assertEqual(get_transport_profile("nope")['name'], DEFAULT_PROFILE)
+
+    def test_apply_socket_options(self):
+        """Test that TCP_NODELAY and keepalive are set on real sockets only"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            apply_socket_options(sock, {'tcp_nodelay': True, 'keepalive': 30})
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), 1)
+            self.assertEqual(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE), 1)
+        finally:
+            sock.close()
+
+        # SSH channels used as sockets are left untouched
+        channel = MagicMock()
+        apply_socket_options(channel, {'tcp_nodelay': True, 'keepalive': 30})
+        channel.setsockopt.assert_not_called()
+
+    def test_transport_factory(self):
+        """Test that the factory applies window sizes and cipher preference"""
+        local, remote = socket.socketpair()
+        try:
+            profile = {'window_size': 8 * 1024 * 1024, 'max_packet_size': 65536, 'ciphers': BULK_CIPHERS}
+            transport = make_transport_factory(profile)(local)
+
+            self.assertEqual(transport.default_window_size, 8 * 1024 * 1024)
+            self.assertEqual(transport.default_max_packet_size, 65536)
+            ciphers = transport.get_security_options().ciphers
+            self.assertEqual(ciphers[0], BULK_CIPHERS[0])
+            # Ciphers outside the preferred list remain available as a fallback
+            self.assertIn('aes256-cbc', ciphers)
+        finally:
+            local.close()
+            remote.close()
+
+    def test_connect_options(self):
+        """Test the keyword arguments handed to SSHClient.connect"""
+        options = connect_options({'compress': True, 'window_size': 1, 'max_packet_size': 1, 'ciphers': None})
+
+        self.assertTrue(options['compress'])
+        self.assertTrue(callable(options['transport_factory']))
+
+
+if __name__ == '__main__':
+    unittest.main()
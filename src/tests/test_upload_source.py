@@ -0,0 +1,69 @@
+import unittest
+import tempfile
+import hashlib
+
+# Import module to test
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.upload_source import UploadSource
+
+
+class TestUploadSource(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data = os.urandom(10000)
+        self.path = os.path.join(self.temp_dir.name, "data.bin")
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_all(self, source, **kwargs):
+        chunks = []
+        for chunk in source.chunks(**kwargs):
+            self.assertIsInstance(chunk, memoryview)
+            chunks.append(bytes(chunk))
+        return chunks
+
+    def test_small_file_is_read(self):
+        """Test that files below the threshold are read without a mapping"""
+        with UploadSource(self.path, mmap_threshold=len(self.data) + 1) as source:
+            self.assertFalse(source.is_mapped)
+            chunks = self.read_all(source, chunk_size=4096)
+
+        self.assertEqual([len(c) for c in chunks], [4096, 4096, 1808])
+        self.assertEqual(b"".join(chunks), self.data)
+
+    def test_large_file_is_mapped(self):
+        """Test that files at the threshold are memory-mapped and closed cleanly"""
+        with UploadSource(self.path, mmap_threshold=len(self.data)) as source:
+            self.assertTrue(source.is_mapped)
+            digest = hashlib.sha256()
+            for chunk in source.chunks(chunk_size=4096):
+                digest.update(chunk)
+
+        self.assertEqual(digest.hexdigest(), hashlib.sha256(self.data).hexdigest())
+        self.assertFalse(source.is_mapped)
+
+    def test_range(self):
+        """Test reading a byte range from both paths"""
+        for threshold in (1, len(self.data) + 1):
+            with UploadSource(self.path, mmap_threshold=threshold) as source:
+                chunks = self.read_all(source, chunk_size=1000, start=2500, end=5000)
+            self.assertEqual(b"".join(chunks), self.data[2500:5000])
+
+    def test_empty_file(self):
+        """Test that empty files yield nothing and are never mapped"""
+        empty = os.path.join(self.temp_dir.name, "empty")
+        open(empty, "wb").close()
+
+        with UploadSource(empty, mmap_threshold=0) as source:
+            self.assertFalse(source.is_mapped)
+            self.assertEqual(self.read_all(source), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
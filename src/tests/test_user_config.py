@@ -0,0 +1,47 @@
+import unittest
+import os
+import json
+import tempfile
+from unittest.mock import patch
+
+# Import module to test
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.user_config import get_setting, set_setting
+
+
+class TestUserConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "config.json")
+        self.patch = patch('utils.user_config.get_user_config_path', return_value=self.path)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.temp_dir.cleanup()
+
+    def test_set_setting_keeps_other_settings(self):
+        """Test that a stored setting is read back and the rest of the file is kept"""
+        with open(self.path, 'w') as f:
+            json.dump({"proxy_hosts": ["gw1"]}, f)
+
+        self.assertTrue(set_setting("upload_rate_limit", 512))
+
+        self.assertEqual(get_setting("upload_rate_limit"), 512)
+        self.assertEqual(get_setting("proxy_hosts"), ["gw1"])
+
+    def test_set_setting_leaves_invalid_file_alone(self):
+        """Test that a file that cannot be parsed is not replaced"""
+        with open(self.path, 'w') as f:
+            f.write('{"proxy_hosts": ["gw1",]}')
+
+        self.assertFalse(set_setting("upload_rate_limit", 512))
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), '{"proxy_hosts": ["gw1",]}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,55 +5,106 @@ This application allows students to submit assignments through an SSH proxy.
 """
 import sys
 import os
+import argparse
 import logging
+import threading
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QIcon
-import sentry_sdk
-from pathlib import Path
-
-log_dir = Path.home() / ".turnin"
-log_dir.mkdir(exist_ok=True)
-log_file = log_dir / "turnin.log"
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+from PyQt6.QtCore import QTimer
+
+from .utils.logging_setup import setup_logging
+
+# Log to ~/.turnin/turnin.log through a background thread so the GUI never waits on disk writes
+setup_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Add src to path for imports
+# Only what the login window needs is imported here; sentry_sdk, requests and the
+# SSH stack (paramiko) load in the background or on first use, see start_background_init
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
 from .ui.login_window import LoginWindow
 from .utils.version_check import check_version
-from .config import APP_NAME, APP_VERSION, SENTRY_DSN
+from .utils.startup_bench import STARTUP_PROBE_ENV
+from .config import APP_NAME, APP_VERSION
 
 
 def initialize_sentry():
-    """Initialize Sentry error reporting"""
+    """Initialize Sentry error reporting (reports are spooled to disk and sent in the background)"""
     try:
-        sentry_sdk.init(SENTRY_DSN)
+        from .utils.error_reporter import init_error_reporting
+        init_error_reporting()
         logger.info("Sentry initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize Sentry: {e}")
 
 
+def preload_ssh():
+    """Import the SSH stack so it is ready by the time the user logs in"""
+    try:
+        from .utils import ssh  # noqa: F401
+    except Exception as e:
+        logger.error(f"Failed to load the SSH stack: {e}")
+
+
+def start_background_init():
+    """Initialize error reporting, load the SSH stack and check for updates without delaying the first window"""
+    for name, target in (("sentry-init", initialize_sentry), ("ssh-preload", preload_ssh)):
+        threading.Thread(target=target, name=name, daemon=True).start()
+    check_version()
+    # Aggregate counters and latencies for the lab's metrics collector
+    from .utils.metrics import start_metrics_writer
+    start_metrics_writer()
+
+
 def main():
     """Main entry point for the application"""
-    logger.info(f"Starting {APP_NAME} v{APP_VERSION}")
-
-    # Initialize error reporting
-    initialize_sentry()
+    # Command line tools that do not need the GUI
+    if len(sys.argv) > 1 and sys.argv[1] == "bench-transport":
+        from .utils.transport_bench import main as bench_transport
+        sys.exit(bench_transport(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "bench-startup":
+        from .utils.startup_bench import main as bench_startup
+        sys.exit(bench_startup(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "load-test":
+        from .utils.load_test import main as load_test
+        sys.exit(load_test(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "daemon":
+        from .utils.daemon import daemon_main
+        sys.exit(daemon_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "submit":
+        from .utils.daemon import submit_main
+        sys.exit(submit_main(sys.argv[2:]))
+
+    # Files to submit (e.g. from a file manager's "Open with") and an optional assignment name
+    parser = argparse.ArgumentParser(prog="turnin", description="Submit assignments through the SSH gateway")
+    parser.add_argument("paths", nargs="*", help="Files or directories to add to the list")
+    parser.add_argument("--assignment", help="Assignment name to fill in")
+    args, qt_args = parser.parse_known_args(sys.argv[1:])
 
     # Create application instance
-    app = QApplication(sys.argv)
+    app = QApplication([sys.argv[0]] + qt_args)
+
+    # QtNetwork is only needed by the GUI, not by the command line tools above
+    from .ui.single_instance import forward_to_running_instance, start_instance_server
+
+    probe_startup = STARTUP_PROBE_ENV in os.environ
+    # A second launch hands its files to the running window and exits before any startup work
+    # (startup measurements always run a full instance)
+    if not probe_startup and forward_to_running_instance(args.paths, args.assignment):
+        logger.info("Handed over to the running instance")
+        sys.exit(0)
+    instance_server = start_instance_server(listen=not probe_startup, paths=args.paths,
+                                            assignment=args.assignment)
+    if instance_server is None:
+        logger.info("Handed over to the instance that started meanwhile")
+        sys.exit(0)
+    if args.paths or args.assignment:
+        instance_server.queue(args.paths, args.assignment)
+
+    logger.info(f"Starting {APP_NAME} v{APP_VERSION}")
     app.setApplicationName(APP_NAME)
     app.setApplicationVersion(APP_VERSION)
 
@@ -65,27 +116,32 @@ def main():
     else:
         logger.warning(f"Icon file not found at {icon_path}")
 
-    # Check for updates
-    check_version()
+    if not probe_startup:
+        # Runs as soon as the event loop starts (also inside the saved credentials prompt)
+        QTimer.singleShot(0, start_background_init)
 
     # Show login window
     login_window = LoginWindow()
     login_status = login_window.check_saved_credentials()
     
     # Handle different login statuses
-    if login_status == 'timeout':
-        # Exit immediately on timeout
-        logger.info("Application exiting due to SSH connection timeout")
-        return
-    elif login_status == 'show_login':
+    if login_status == 'show_login':
         # Show login window for manual credentials entry
         login_window.show()
+    elif login_status == 'timeout':
+        # Connection retries were exhausted; the login window is shown so the user can try again
+        logger.info("SSH connection timed out after retries, showing login window")
     # If login_status == 'success', the main window is already shown and login window is hidden
     
     logger.info("Application UI initialized and displayed")
+    if probe_startup:
+        # Measured by turnin bench-startup: report the first window and quit
+        from .utils.startup_bench import report_first_window
+        report_first_window(app)
 
     # Start application event loop
     return_code = app.exec()
+    instance_server.close()
     logger.info(f"Application exiting with code {return_code}")
     sys.exit(return_code)
 
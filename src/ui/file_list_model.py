@@ -0,0 +1,254 @@
+"""
+List model for the files selected for submission
+"""
+import os
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, pyqtSignal
+
+
+def format_size(num_bytes):
+    """
+    Format a byte count for display
+
+    Args:
+        num_bytes (int): Size in bytes
+
+    Returns:
+        str: Human readable size (e.g. "12.3 KB")
+    """
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class FileListModel(QAbstractListModel):
+    """
+    Model holding the selected file paths.
+
+    Paths are kept in a list for row order plus a dict mapping each path to its
+    row, so membership checks are O(1) and removals rebuild the index once per
+    call instead of once per item. Files are submitted by name alone, so a
+    path whose file name is already in the list (e.g. a second Makefile from
+    another subdirectory) is left out and reported through name_conflicts
+    once the additions finish. File sizes are read lazily: a row is stat'ed
+    the first time it is displayed, and a timer fills in the rest in small
+    batches so the running total converges without blocking the GUI thread.
+    """
+    totals_changed = pyqtSignal(int, int, bool)  # file count, total bytes, totals complete
+    name_conflicts = pyqtSignal(list)  # paths left out because their file name is already selected
+
+    INSERT_BATCH_SIZE = 500
+    STAT_BATCH_SIZE = 256
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths = []
+        self._rows = {}
+        self._names = {}
+        self._sizes = {}
+        self._total_size = 0
+        self._conflicts = []
+
+        # Paths waiting to be inserted and directories waiting to be walked
+        self._pending_paths = []
+        self._pending_dirs = []
+        self._stat_cursor = 0
+
+        self._insert_timer = QTimer(self)
+        self._insert_timer.setInterval(0)
+        self._insert_timer.timeout.connect(self._process_pending)
+
+        self._stat_timer = QTimer(self)
+        self._stat_timer.setInterval(0)
+        self._stat_timer.timeout.connect(self._stat_next_batch)
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._paths):
+            return None
+
+        path = self._paths[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            size = self._size_of(path)
+            if size is None:
+                return f"{path}  (unreadable)"
+            return f"{path}  ({format_size(size)})"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        if role == Qt.ItemDataRole.UserRole:
+            return path
+        return None
+
+    # Public API
+
+    def paths(self):
+        """Return a copy of the selected paths in display order"""
+        return list(self._paths)
+
+    def contains(self, path):
+        """Return True if the path is already selected"""
+        return path in self._rows
+
+    def is_busy(self):
+        """Return True while paths are still being added in the background"""
+        return bool(self._pending_paths or self._pending_dirs)
+
+    def total_size(self):
+        """Return the total size in bytes of the files stat'ed so far"""
+        return self._total_size
+
+    def add_paths(self, paths):
+        """
+        Queue file paths to be added to the model in batches
+
+        Args:
+            paths (iterable): File paths to add; duplicates are ignored
+        """
+        self._pending_paths.extend(paths)
+        self._insert_timer.start()
+
+    def add_directory(self, directory):
+        """
+        Queue a directory whose regular files should be added recursively
+
+        Args:
+            directory (str): Directory to walk
+        """
+        self._pending_dirs.append(directory)
+        self._insert_timer.start()
+
+    def remove_rows(self, rows):
+        """
+        Remove the given rows from the model
+
+        Args:
+            rows (iterable): Row numbers to remove
+        """
+        rows = sorted(set(rows), reverse=True)
+        if not rows:
+            return
+
+        # Remove contiguous ranges from the bottom up so the remaining row numbers stay valid
+        start = end = rows[0]
+        for row in rows[1:] + [None]:
+            if row is not None and row == start - 1:
+                start = row
+                continue
+            self.beginRemoveRows(QModelIndex(), start, end)
+            for path in self._paths[start:end + 1]:
+                size = self._sizes.pop(path, None)
+                if size:
+                    self._total_size -= size
+            del self._paths[start:end + 1]
+            self.endRemoveRows()
+            if row is not None:
+                start = end = row
+
+        self._rebuild_index()
+        self._stat_cursor = 0
+        self._stat_timer.start()
+        self._emit_totals()
+
+    def clear(self):
+        """Remove all paths and cancel any pending additions"""
+        self._insert_timer.stop()
+        self._stat_timer.stop()
+        self._pending_paths = []
+        self._pending_dirs = []
+        self._conflicts = []
+
+        self.beginResetModel()
+        self._paths = []
+        self._rows = {}
+        self._names = {}
+        self._sizes = {}
+        self._total_size = 0
+        self._stat_cursor = 0
+        self.endResetModel()
+        self._emit_totals()
+
+    # Internal helpers
+
+    def _rebuild_index(self):
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+        self._names = {os.path.basename(path): path for path in self._paths}
+
+    def _size_of(self, path):
+        if path not in self._sizes:
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                size = None
+            self._sizes[path] = size
+            if size:
+                self._total_size += size
+        return self._sizes[path]
+
+    def _process_pending(self):
+        """Insert the next batch of pending paths, walking directories as needed"""
+        while len(self._pending_paths) < self.INSERT_BATCH_SIZE and self._pending_dirs:
+            directory = self._pending_dirs.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            self._pending_dirs.append(entry.path)
+                        elif entry.is_file():
+                            self._pending_paths.append(entry.path)
+            except OSError:
+                continue
+
+        batch = self._pending_paths[:self.INSERT_BATCH_SIZE]
+        del self._pending_paths[:self.INSERT_BATCH_SIZE]
+
+        new_paths = []
+        for path in batch:
+            if path in self._rows:
+                continue
+            name = os.path.basename(path)
+            if name in self._names:
+                if self._names[name] != path:
+                    self._conflicts.append(path)
+                continue
+            self._names[name] = path
+            new_paths.append(path)
+
+        if new_paths:
+            first = len(self._paths)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_paths) - 1)
+            for offset, path in enumerate(new_paths):
+                self._rows[path] = first + offset
+            self._paths.extend(new_paths)
+            self.endInsertRows()
+
+        if not self.is_busy():
+            self._insert_timer.stop()
+            if self._conflicts:
+                conflicts, self._conflicts = self._conflicts, []
+                self.name_conflicts.emit(conflicts)
+
+        self._stat_timer.start()
+        self._emit_totals()
+
+    def _stat_next_batch(self):
+        """Stat the next batch of files so the totals fill in progressively"""
+        end = min(self._stat_cursor + self.STAT_BATCH_SIZE, len(self._paths))
+        for row in range(self._stat_cursor, end):
+            self._size_of(self._paths[row])
+        self._stat_cursor = end
+
+        if self._stat_cursor >= len(self._paths):
+            self._stat_timer.stop()
+        self._emit_totals()
+
+    def _emit_totals(self):
+        complete = not self.is_busy() and self._stat_cursor >= len(self._paths)
+        self.totals_changed.emit(len(self._paths), self._total_size, complete)
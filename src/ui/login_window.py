@@ -1,14 +1,58 @@
 """
 Login window for the TurnIn application
 """
+import logging
 import os
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QGridLayout,
-                            QLabel, QLineEdit, QPushButton, QMessageBox, QApplication)
+                            QLabel, QLineEdit, QPushButton, QMessageBox, QProgressDialog)
+from PyQt6.QtCore import Qt, QObject, QThread, QEventLoop, pyqtSignal
 
 
+from ..utils.cancellation import CancellationToken
 from ..utils.credential_manager import save_credentials, load_credentials
-from ..utils.ssh import connect_to_proxy
-from ..config import PROXY_HOST, TEMP_DIR
+from ..utils.proxy_health import get_proxy_hosts
+from ..config import TEMP_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class LoginWorker(QObject):
+    """Worker that connects through one of the gateways in a background thread"""
+    retrying = pyqtSignal(int, int, float, str)
+    finished = pyqtSignal(tuple, str)
+
+    def __init__(self, username, password, cancel_token):
+        super().__init__()
+        self.username = username
+        self.password = password
+        self.cancel_token = cancel_token
+        self.error_message = ""
+
+    def run(self):
+        """Connect, failing over between gateways and retrying transient failures, and report the result"""
+        try:
+            # The SSH stack is heavy to import, so it is loaded off the GUI thread on first use
+            from ..utils.ssh import connect_to_gateway
+            result = connect_to_gateway(
+                self.username,
+                self.password,
+                get_proxy_hosts(),
+                notify=False,
+                cancel_token=self.cancel_token,
+                on_retry=self.retrying.emit,
+                on_error=self.set_error
+            )
+        except Exception as e:
+            # The window waits for finished, so an unexpected error is reported instead of raised
+            logger.exception("Login failed")
+            result = (False, None, None, None, 'other')
+            self.error_message = f"Connection failed: {str(e)}"
+        self.finished.emit(result, self.error_message)
+
+    def set_error(self, title, message):
+        """Keep the final error message to show it on the GUI thread"""
+        self.error_message = message
+
 
 class LoginWindow(QMainWindow):
     """
@@ -94,7 +138,8 @@ class LoginWindow(QMainWindow):
         """Check for saved credentials and offer to use them
         
         Returns:
-            str: 'success' if login succeeded, 'timeout' if connection timeout, 'show_login' if need to show login window
+            str: 'success' if login succeeded, 'show_login' if need to show login window,
+            otherwise the failure status from perform_login (the login window is already shown)
         """
         credentials = load_credentials()
         if credentials:
@@ -116,7 +161,7 @@ class LoginWindow(QMainWindow):
         """Use saved credentials to login
         
         Returns:
-            str: 'success' if login succeeded, 'timeout' if connection timeout, 'auth_failed' if auth failed
+            str: 'success' if login succeeded, otherwise the failure status from perform_login
         """
         username, password = credentials
         return self.perform_login(username, password, from_saved=True)
@@ -132,24 +177,81 @@ class LoginWindow(QMainWindow):
 
         self.perform_login(username, password)
 
+    def connect_with_progress(self, username, password):
+        """Connect to the proxy in a background thread while showing a cancellable progress dialog
+
+        Returns:
+            tuple: (connect_to_gateway result tuple, final error message)
+        """
+        cancel_token = CancellationToken()
+
+        progress = QProgressDialog("Connecting to the server...", "Cancel", 0, 0, self)
+        progress.setWindowTitle("TurnIn - Connecting")
+        progress.setWindowModality(Qt.WindowModality.ApplicationModal)
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(cancel_token.cancel)
+
+        thread = QThread()
+        worker = LoginWorker(username, password, cancel_token)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+
+        outcome = {}
+        loop = QEventLoop()
+
+        def on_retry(attempt, max_attempts, delay, error_message):
+            progress.setLabelText(
+                f"Connection attempt {attempt} of {max_attempts} failed.\n"
+                f"Retrying in {delay:.1f} seconds..."
+            )
+
+        def on_finished(result, error_message):
+            outcome['result'] = result
+            outcome['error'] = error_message
+            loop.quit()
+
+        worker.retrying.connect(on_retry, Qt.ConnectionType.QueuedConnection)
+        worker.finished.connect(on_finished, Qt.ConnectionType.QueuedConnection)
+
+        progress.show()
+        thread.start()
+        # Keep the UI responsive (and the Cancel button working) until the worker is done
+        loop.exec()
+
+        thread.quit()
+        thread.wait()
+        progress.close()
+        return outcome['result'], outcome['error']
+
     def perform_login(self, username, password, from_saved=False):
         """Perform the actual login process
         
         Returns:
-            str: 'success' if login succeeded, 'timeout' if connection timeout, 'auth_failed' if auth failed (only for saved credentials)
+            str: 'success' if login succeeded, 'timeout' if the server could not be reached,
+            'cancelled' if the user cancelled, 'auth_failed' if auth failed
         """
-        result, host_to_connect, ssh, error_type = connect_to_proxy(username, password, PROXY_HOST)
+        (result, proxy_host, host_to_connect, ssh, error_type), error_message = \
+            self.connect_with_progress(username, password)
 
         if not result:
             # Handle different types of errors
-            if error_type == 'timeout':
-                # For timeout errors, exit the application immediately
-                QApplication.instance().quit()
+            if error_type == 'cancelled':
+                self.show()
+                return 'cancelled'
+            elif error_type == 'timeout':
+                # Transient failures were already retried; let the user try again without restarting
+                QMessageBox.warning(
+                    self,
+                    "Connection Error",
+                    "Could not reach the server after several attempts.\n"
+                    "Please check your network connection and try again."
+                )
+                self.show()
                 return 'timeout'
             elif error_type == 'auth':
                 QMessageBox.warning(self, "Login Error", "Authentication failed. Please check your credentials.")
             else:
-                QMessageBox.warning(self, "Login Error", "Connection failed. Please try again.")
+                QMessageBox.warning(self, "Login Error", error_message or "Connection failed. Please try again.")
             
             # If we're using saved credentials and authentication failed, show the login window again
             if from_saved:
@@ -174,7 +276,7 @@ class LoginWindow(QMainWindow):
         self.main_window = MainWindow(
             username=username,
             password=password,
-            proxy_host=PROXY_HOST,
+            proxy_host=proxy_host,
             host_to_connect=host_to_connect,
             temp_dir=TEMP_DIR,
             ssh=ssh
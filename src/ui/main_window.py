@@ -1,22 +1,40 @@
 """
 Main window for the TurnIn application
 """
+import logging
 import os
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QComboBox, QFileDialog,
-                             QListWidget, QMessageBox, QSplitter, QGroupBox, QScrollArea, QLineEdit, QProgressBar)
-from PyQt6.QtCore import Qt, QObject, pyqtSignal, QThread
-from ..utils.ssh import submit_files, connect_to_proxy
+                             QListView, QListWidget, QAbstractItemView, QMessageBox, QSplitter, QGroupBox,
+                             QScrollArea, QLineEdit, QProgressBar, QCompleter, QCheckBox, QSpinBox)
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, QThread, QStringListModel
+from ..utils.ssh import (submit_files, connect_to_gateway, fetch_assignments, error_type_for,
+                         submission_error_type, SUBMISSION_CANCELLED, ASSIGNMENT_NOT_OPEN)
+from ..utils.assignment_catalog import get_assignment_catalog, unknown_assignment_message
+from ..utils.cancellation import CancellationToken
+from ..utils.connection_pool import close_connection_pool, get_connection_pool
+from ..utils.net import split_host_port
+from ..utils.prestage import PreStager
+from ..utils.rate_limit import get_upload_limiter
+from ..utils.user_config import set_setting
+from ..utils.proxy_health import get_proxy_hosts
+from ..utils.submission_queue import SubmissionQueue, QueueScheduler
+from ..utils.retry import DEFAULT_RETRY_POLICY, NO_RETRY
 from .about_window import AboutWindow
+from .file_list_model import FileListModel, format_size
+from .single_instance import get_instance_server
+
+logger = logging.getLogger(__name__)
 
 class UploadWorker(QObject):
     """Worker to handle file uploads in a background thread"""
     progress_updated = pyqtSignal(float, str)
-    upload_finished = pyqtSignal(bool, str)
+    # (success, message, error type as classified by utils.ssh.submission_error_type)
+    upload_finished = pyqtSignal(bool, str, str)
     command_output = pyqtSignal(str)
 
     def __init__(self, proxy_host, host_to_connect, username, password,
-                 assignment, files, temp_dir, ssh=None):
+                 assignment, files, temp_dir, ssh=None, cancel_token=None, prestager=None):
         super().__init__()
         self.proxy_host = proxy_host
         self.host_to_connect = host_to_connect
@@ -26,6 +44,8 @@ class UploadWorker(QObject):
         self.files = files
         self.temp_dir = temp_dir
         self.ssh = ssh
+        self.cancel_token = cancel_token or CancellationToken()
+        self.prestager = prestager
 
     def run(self):
         """Run the upload process"""
@@ -39,28 +59,58 @@ class UploadWorker(QObject):
                 self.files,
                 self.temp_dir,
                 self.ssh,
-                progress_callback=self.update_progress
+                progress_callback=self.update_progress,
+                cancel_token=self.cancel_token,
+                prestager=self.prestager
             )
 
             # Emit the command output
             self.command_output.emit(output)
 
             if success:
-                self.upload_finished.emit(True, "Please check the output message of the turnin for any errors")
+                self.upload_finished.emit(True, "Please check the output message of the turnin for any errors", "")
+            elif self.cancel_token.cancelled:
+                self.upload_finished.emit(False, SUBMISSION_CANCELLED, 'cancelled')
+            elif output.startswith(ASSIGNMENT_NOT_OPEN):
+                self.upload_finished.emit(False, output, 'other')
             else:
-                self.upload_finished.emit(False, f"Error during submission: {output}")
+                self.upload_finished.emit(False, f"Error during submission: {output}", submission_error_type(output))
         except Exception as e:
-            self.upload_finished.emit(False, f"Error submitting files: {str(e)}")
+            self.upload_finished.emit(False, f"Error submitting files: {str(e)}", error_type_for(e))
 
     def update_progress(self, percent, message):
         """Update progress display"""
         self.progress_updated.emit(percent, message)
 
 
+class AssignmentListWorker(QObject):
+    """Worker to fetch the open assignments in a background thread"""
+    finished = pyqtSignal(list)
+
+    def __init__(self, proxy_host, host_to_connect, username, password, ssh):
+        super().__init__()
+        self.proxy_host = proxy_host
+        self.host_to_connect = host_to_connect
+        self.username = username
+        self.password = password
+        self.ssh = ssh
+
+    def run(self):
+        """Fetch the list; an empty list means it is unavailable"""
+        try:
+            names = fetch_assignments(self.ssh, self.proxy_host, self.host_to_connect,
+                                      self.username, self.password)
+        except Exception:
+            names = None
+        self.finished.emit(names or [])
+
+
 class MainWindow(QMainWindow):
     """
     Main window for file selection and assignment submission
     """
+    queue_changed = pyqtSignal(list)
+    watch_status_changed = pyqtSignal(int, int)
 
     def __init__(self, username, password, proxy_host, host_to_connect, temp_dir, ssh=None):
         super().__init__()
@@ -70,12 +120,23 @@ class MainWindow(QMainWindow):
         self.host_to_connect = host_to_connect
         self.temp_dir = temp_dir
         self.ssh = ssh
-        self.selected_files = []
+        self.file_model = FileListModel(self)
+        # Token of the submission in progress, if any
+        self.cancel_token = None
+        # Uploads changed files in the background while watch mode is on
+        self.prestager = None
 
         self.setWindowTitle("TurnIn - Assignment Submission")
         self.resize(800, 600)
 
         self.init_ui()
+        self.setup_submission_queue()
+        self.fetch_assignment_list()
+
+        # Files from the command line and from later launches come in through the instance server
+        instance_server = get_instance_server()
+        if instance_server:
+            instance_server.attach(self)
 
     def init_ui(self):
         """Initialize the user interface"""
@@ -102,9 +163,24 @@ class MainWindow(QMainWindow):
         self.assignment_input = QLineEdit()
         self.assignment_input.setPlaceholderText("Enter assignment name (e.g., hw1)")
 
+        # Autocomplete from the cached list of open assignments, refreshed after login
+        self.assignment_model = QStringListModel(get_assignment_catalog().names() or [], self)
+        completer = QCompleter(self.assignment_model, self)
+        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.assignment_input.setCompleter(completer)
+
         left_layout.addWidget(assignment_label)
         left_layout.addWidget(self.assignment_input)
-        left_layout.addStretch(1)
+
+        # Submissions waiting to be sent when the connection comes back
+        queue_label = QLabel("Queued Submissions:")
+        self.queue_list = QListWidget()
+        clear_queue_btn = QPushButton("Clear Finished")
+        clear_queue_btn.clicked.connect(self.clear_finished_submissions)
+
+        left_layout.addWidget(queue_label)
+        left_layout.addWidget(self.queue_list)
+        left_layout.addWidget(clear_queue_btn)
 
         # Right panel - File selection and submission
         right_panel = QGroupBox("File Submission")
@@ -130,16 +206,50 @@ class MainWindow(QMainWindow):
 
         # Selected files list
         files_label = QLabel("Selected Files:")
-        self.file_list = QListWidget()
-        self.file_list.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        self.file_list = QListView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.file_list.setUniformItemSizes(True)  # Lets the view skip measuring every row
+
+        self.totals_label = QLabel("No files selected")
+        self.file_model.totals_changed.connect(self.update_totals)
+        self.file_model.name_conflicts.connect(self.report_name_conflicts)
 
         remove_btn = QPushButton("Remove Selected")
         remove_btn.clicked.connect(self.remove_selected_files)
 
         right_layout.addWidget(files_label)
         right_layout.addWidget(self.file_list)
+        right_layout.addWidget(self.totals_label)
         right_layout.addWidget(remove_btn)
 
+        # Watch mode keeps the selected files uploaded while the student works
+        self.watch_checkbox = QCheckBox("Watch files and upload changes in the background")
+        self.watch_checkbox.toggled.connect(self.toggle_watch_mode)
+        self.watch_label = QLabel("")
+        self.watch_status_changed.connect(self.update_watch_status, Qt.ConnectionType.QueuedConnection)
+
+        right_layout.addWidget(self.watch_checkbox)
+        right_layout.addWidget(self.watch_label)
+
+        # Bandwidth limit shared by all uploads; changes apply to a transfer in progress
+        # and are saved as "upload_rate_limit" for later sessions
+        rate_layout = QHBoxLayout()
+        self.rate_limit_spin = QSpinBox()
+        self.rate_limit_spin.setRange(0, 1024 * 1024)
+        self.rate_limit_spin.setSingleStep(128)
+        self.rate_limit_spin.setSuffix(" KiB/s")
+        self.rate_limit_spin.setSpecialValueText("Unlimited")
+        self.rate_limit_spin.setToolTip("Limit the upload speed so others sharing the network are not slowed down; "
+                                        "the limit is remembered for later sessions")
+        limiter = get_upload_limiter()
+        self.rate_limit_spin.setValue(int(limiter.rate / 1024) if limiter.rate else 0)
+        self.rate_limit_spin.valueChanged.connect(self.update_rate_limit)
+        rate_layout.addWidget(QLabel("Upload limit:"))
+        rate_layout.addWidget(self.rate_limit_spin)
+        rate_layout.addStretch()
+        right_layout.addLayout(rate_layout)
+
         # Add panels to splitter
         splitter.addWidget(left_panel)
         splitter.addWidget(right_panel)
@@ -178,10 +288,31 @@ class MainWindow(QMainWindow):
         )
 
         if files:
-            for file_path in files:
-                if file_path not in self.selected_files:
-                    self.selected_files.append(file_path)
-                    self.file_list.addItem(file_path)
+            self.file_model.add_paths(files)
+
+    def open_paths(self, paths, assignment=None):
+        """
+        Add files handed over on the command line or by another launch, and bring the window to the front
+
+        Args:
+            paths (list): Files and directories
+            assignment (str): Assignment name to fill in, if any
+        """
+        files = [path for path in paths if os.path.isfile(path)]
+        if files:
+            self.file_model.add_paths(files)
+        for path in paths:
+            if os.path.isdir(path):
+                self.file_model.add_directory(path)
+            elif not os.path.isfile(path):
+                logger.warning(f"Ignoring {path}: not a file or directory")
+        if assignment:
+            self.assignment_input.setText(assignment)
+
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
 
     def add_directory(self):
         """Open a directory dialog to select a folder"""
@@ -190,31 +321,78 @@ class MainWindow(QMainWindow):
         )
 
         if directory:
-            # Add directory itself
-            if directory not in self.selected_files:
-                self.selected_files.append(directory)
-                self.file_list.addItem(directory)
+            # Add the files inside the directory; the walk happens in batches
+            self.file_model.add_directory(directory)
 
     def remove_selected_files(self):
         """Remove selected files from the list"""
-        selected_items = self.file_list.selectedItems()
-        if not selected_items:
+        selected_rows = [index.row() for index in self.file_list.selectionModel().selectedRows()]
+        if not selected_rows:
             return
 
-        for item in selected_items:
-            row = self.file_list.row(item)
-            file_path = item.text()
-            self.file_list.takeItem(row)
-            self.selected_files.remove(file_path)
+        self.file_model.remove_rows(selected_rows)
 
     def clear_files(self):
         """Clear all selected files"""
-        self.file_list.clear()
-        self.selected_files = []
+        self.file_model.clear()
+
+    def report_name_conflicts(self, paths):
+        """Tell the user which files were left out because another selected file has the same name"""
+        shown = "\n".join(paths[:10]) + (f"\n... and {len(paths) - 10} more" if len(paths) > 10 else "")
+        QMessageBox.warning(
+            self, "Duplicate File Names",
+            "Files are submitted by name only, so these files were not added because a selected "
+            f"file already has the same name:\n\n{shown}\n\nRename them or remove the other file first."
+        )
+
+    def update_totals(self, count, total_bytes, complete):
+        """Update the label showing the number and total size of the selected files"""
+        if count == 0:
+            self.totals_label.setText("No files selected")
+            return
+
+        size_text = format_size(total_bytes)
+        if not complete:
+            size_text = f"{size_text} so far..."
+        self.totals_label.setText(f"{count} file(s), {size_text}")
+        if self.prestager and complete:
+            self.prestager.set_files(self.file_model.paths())
+
+    def toggle_watch_mode(self, enabled):
+        """Start or stop uploading the selected files as they change"""
+        if enabled and not self.prestager:
+            self.prestager = PreStager(self.connect_for_watch, self.temp_dir)
+            self.prestager.add_listener(self.watch_status_changed.emit)
+            self.prestager.start(self.file_model.paths())
+            self.watch_label.setText("Watching for changes...")
+        elif not enabled and self.prestager:
+            self.prestager.stop()
+            self.prestager = None
+            self.watch_label.setText("")
+
+    def update_rate_limit(self, kib_per_second):
+        """Apply the upload limit from the spin box to all uploads, including the one running, and save it"""
+        get_upload_limiter().set_rate(kib_per_second * 1024)
+        set_setting("upload_rate_limit", kib_per_second)
+
+    def connect_for_watch(self):
+        """Lease the pooled gateway connection for a watch mode upload"""
+        gateway_host, gateway_port = split_host_port(self.proxy_host)
+        return get_connection_pool().acquire(gateway_host, self.username, self.password, port=gateway_port)
+
+    def update_watch_status(self, staged, total):
+        """Show how many of the selected files are already uploaded"""
+        self.watch_label.setText(f"{staged}/{total} file(s) pre-staged; submitting only runs turnin"
+                                 if total and staged == total else f"{staged}/{total} file(s) pre-staged")
 
     def submit_assignment(self):
         """Submit the selected files for the chosen assignment"""
-        if not self.selected_files:
+        if self.file_model.is_busy():
+            QMessageBox.warning(self, "Submission Error", "Files are still being added. Please wait a moment.")
+            return
+
+        selected_files = self.file_model.paths()
+        if not selected_files:
             QMessageBox.warning(self, "Submission Error", "No files selected for submission.")
             return
 
@@ -223,11 +401,16 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Submission Error", "Please enter an assignment name.")
             return
 
-        # Confirmation dialog
+        # Confirmation dialog, warning about a name missing from the last known list
+        question = (f"Are you sure you want to submit {len(selected_files)} file(s) "
+                    f"({format_size(self.file_model.total_size())}) for assignment '{assignment}'?")
+        unknown = unknown_assignment_message(assignment, get_assignment_catalog().names())
+        if unknown:
+            question = f"{unknown}\n\n{question}"
         reply = QMessageBox.question(
             self,
             "Confirm Submission",
-            f"Are you sure you want to submit {len(self.selected_files)} file(s) for assignment '{assignment}'?",
+            question,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
 
@@ -247,6 +430,11 @@ class MainWindow(QMainWindow):
                 main_layout.insertWidget(main_layout.count() - 1, self.output_area)
                 self.output_area.hide()
 
+            # Remember what is being sent so a failed submission can be queued
+            self.current_submission = (assignment, selected_files)
+            self.cancel_token = CancellationToken()
+            self.cancel_btn.setEnabled(True)
+
             # Create worker and thread
             self.thread = QThread()
             self.worker = UploadWorker(
@@ -255,9 +443,11 @@ class MainWindow(QMainWindow):
                 self.username,
                 self.password,
                 assignment,
-                self.selected_files,
+                selected_files,
                 self.temp_dir,
-                self.ssh
+                self.ssh,
+                self.cancel_token,
+                self.prestager
             )
 
             # Set up connections
@@ -276,6 +466,108 @@ class MainWindow(QMainWindow):
             # Start the thread
             self.thread.start()
 
+    def fetch_assignment_list(self):
+        """Refresh the open assignments in the background for autocomplete"""
+        if self.ssh is None:
+            return
+        self.assignment_thread = QThread()
+        self.assignment_worker = AssignmentListWorker(
+            self.proxy_host, self.host_to_connect, self.username, self.password, self.ssh
+        )
+        self.assignment_worker.moveToThread(self.assignment_thread)
+        self.assignment_thread.started.connect(self.assignment_worker.run)
+        self.assignment_worker.finished.connect(self.update_assignment_list, Qt.ConnectionType.QueuedConnection)
+        self.assignment_worker.finished.connect(self.assignment_thread.quit)
+        self.assignment_worker.finished.connect(self.assignment_worker.deleteLater)
+        self.assignment_thread.finished.connect(self.assignment_thread.deleteLater)
+        self.assignment_thread.start()
+
+    def update_assignment_list(self, names):
+        """Offer the fetched assignments for autocomplete"""
+        if names:
+            self.assignment_model.setStringList(names)
+
+    def setup_submission_queue(self):
+        """Load the offline submission queue and start flushing it in the background"""
+        self.submission_queue = SubmissionQueue()
+        self.queue_scheduler = QueueScheduler(
+            self.submission_queue,
+            connect=self.connect_for_queue,
+            submit=self.submit_queued
+        )
+
+        # The queue notifies from worker threads; the signal hands updates to the GUI thread
+        self.queue_changed.connect(self.update_queue_list, Qt.ConnectionType.QueuedConnection)
+        self.submission_queue.add_listener(self.queue_changed.emit)
+        self.update_queue_list(self.submission_queue.entries())
+
+        self.queue_scheduler.start()
+
+    def connect_for_queue(self):
+        """Open a fresh gateway connection for the queue scheduler without showing dialogs"""
+        # The scheduler polls on its own, so a single round over the gateways per poll is enough
+        result, proxy_host, host_to_connect, ssh, _ = connect_to_gateway(
+            self.username, self.password, get_proxy_hosts(), notify=False, retry_policy=NO_RETRY
+        )
+        if not result:
+            return None, None
+        return ssh, (proxy_host, host_to_connect)
+
+    def submit_queued(self, entry, ssh, target):
+        """Send one queued submission over the scheduler's connection"""
+        proxy_host, host_to_connect = target
+        return submit_files(
+            proxy_host,
+            host_to_connect,
+            self.username,
+            self.password,
+            entry['assignment'],
+            entry['files'],
+            self.temp_dir,
+            ssh
+        )
+
+    def update_queue_list(self, entries):
+        """Show the state of every queued submission"""
+        self.queue_list.clear()
+        for entry in entries:
+            text = f"{entry['assignment']} - {len(entry['files'])} file(s) - {entry['state']}"
+            if entry['attempts']:
+                text += f" (attempt {entry['attempts']})"
+            self.queue_list.addItem(text)
+            if entry['last_error']:
+                self.queue_list.item(self.queue_list.count() - 1).setToolTip(entry['last_error'])
+            elif entry['output']:
+                self.queue_list.item(self.queue_list.count() - 1).setToolTip(entry['output'])
+
+    def clear_finished_submissions(self):
+        """Remove sent and failed submissions from the queue"""
+        self.submission_queue.clear_finished()
+
+    def offer_to_queue(self, assignment, files):
+        """Offer to queue a submission that failed so it is retried automatically"""
+        reply = QMessageBox.question(
+            self,
+            "Queue Submission",
+            "The submission could not be completed.\n\n"
+            "Do you want to queue it and send it automatically as soon as the connection is back?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.submission_queue.enqueue(assignment, files)
+            self.queue_scheduler.wake()
+
+    def closeEvent(self, event):
+        """Stop the queue scheduler and any running submission and disconnect when the window closes"""
+        if self.cancel_token:
+            self.cancel_token.cancel()
+        if self.prestager:
+            # The pool is closing; the staging collector removes the directory once it is a day old
+            self.prestager.stop(remove=False)
+        self.queue_scheduler.stop()
+        close_connection_pool()
+        super().closeEvent(event)
+
     def display_command_output(self, text):
         """Display command output in the output area"""
         self.output_text.setText(text)
@@ -296,9 +588,14 @@ class MainWindow(QMainWindow):
             # Status label
             self.status_label = QLabel("Preparing to upload...")
 
+            # Cancel button
+            self.cancel_btn = QPushButton("Cancel")
+            self.cancel_btn.clicked.connect(self.cancel_submission)
+
             # Add to layout
             progress_layout.addWidget(self.status_label)
             progress_layout.addWidget(self.progress_bar)
+            progress_layout.addWidget(self.cancel_btn, alignment=Qt.AlignmentFlag.AlignRight)
 
             # Add to main layout - place before the submit button
             main_layout = self.centralWidget().layout()
@@ -312,12 +609,29 @@ class MainWindow(QMainWindow):
         self.progress_bar.setValue(int(percent))
         self.status_label.setText(message)
 
-    def handle_upload_finished(self, success, message):
+    def cancel_submission(self):
+        """Stop the running submission; its channels are closed right away"""
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText("Cancelling submission...")
+        self.cancel_token.cancel()
+
+    def handle_upload_finished(self, success, message, error_type):
         """Handle upload completion"""
         # Re-enable submit button
         self.submit_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
 
         if success:
             QMessageBox.information(self, "Success", message)
+        elif self.cancel_token.cancelled:
+            self.status_label.setText(SUBMISSION_CANCELLED)
+            QMessageBox.information(self, "Submission Cancelled", "The submission was cancelled before it finished.")
+        elif message.startswith(ASSIGNMENT_NOT_OPEN):
+            # Nothing was uploaded, and queueing would only fail the same way
+            self.status_label.setText(ASSIGNMENT_NOT_OPEN)
+            QMessageBox.warning(self, "Submission Error", message[len(ASSIGNMENT_NOT_OPEN) + 2:])
         else:
             QMessageBox.critical(self, "Submission Error", message)
+            # Only network failures may go through later; anything else would fail the same way again
+            if DEFAULT_RETRY_POLICY.is_transient(error_type):
+                self.offer_to_queue(*self.current_submission)
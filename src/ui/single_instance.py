@@ -0,0 +1,214 @@
+"""
+Single-instance support: a second launch hands its files to the running window and exits
+"""
+import getpass
+import json
+import logging
+import os
+
+from PyQt6.QtCore import QDir, QObject, pyqtSignal
+from PyQt6.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds a second launch waits for the running instance to answer
+FORWARD_TIMEOUT_MS = 2000
+# Longest request accepted from another launch
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+def get_server_name():
+    """Get the local server name, one per user"""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    return f"turnin-{user}"
+
+
+def forward_to_running_instance(paths, assignment=None, name=None, timeout_ms=FORWARD_TIMEOUT_MS):
+    """
+    Hand files to an instance that is already running
+
+    Args:
+        paths (list): Files and directories to add to its list
+        assignment (str): Assignment name to fill in, if any
+        name (str): Local server name (default: get_server_name())
+        timeout_ms (int): Milliseconds to wait for each step
+
+    Returns:
+        bool: True if a running instance took the request; the caller should exit
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(name or get_server_name())
+    if not socket.waitForConnected(timeout_ms):
+        return False
+
+    request = {'paths': [os.path.abspath(path) for path in paths], 'assignment': assignment}
+    socket.write((json.dumps(request) + "\n").encode('utf-8'))
+    if not socket.waitForBytesWritten(timeout_ms):
+        socket.abort()
+        return False
+
+    # The running instance answers once it has queued the files
+    reply = b""
+    while not reply.endswith(b"\n") and socket.waitForReadyRead(timeout_ms):
+        reply += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    return reply.strip() == b"ok"
+
+
+class InstanceServer(QObject):
+    """
+    Local server receiving files from later launches
+
+    Requests that arrive before the main window exists (during login) are kept
+    and delivered once a window is attached.
+
+    Args:
+        name (str): Local server name (default: get_server_name())
+    """
+
+    # (paths, assignment or "")
+    files_received = pyqtSignal(list, str)
+
+    def __init__(self, name=None, parent=None):
+        super().__init__(parent)
+        self.name = name or get_server_name()
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self._accept)
+        self._pending = []
+        self._window = None
+        self._address_in_use = False
+
+    def listen(self):
+        """
+        Start listening; call only after forward_to_running_instance found no running instance
+
+        The name of a running instance is never taken over, see take_over().
+
+        Returns:
+            bool: True if listening
+        """
+        # With socket options set, Qt renames its socket over an existing one, which would cut
+        # a running instance off; a socket file that exists is reported as in use instead
+        self._address_in_use = os.name != 'nt' and os.path.exists(self._socket_path())
+        if self._address_in_use:
+            logger.info(f"Single-instance socket {self._socket_path()} is in use")
+            return False
+        if not self.server.listen(self.name):
+            self._address_in_use = self.server.serverError() == QAbstractSocket.SocketError.AddressInUseError
+            logger.warning(f"Single-instance server unavailable: {self.server.errorString()}")
+            return False
+        return True
+
+    def address_in_use(self):
+        """True if the last listen() failed because the name exists, live or left over from a crash"""
+        return self._address_in_use
+
+    def _socket_path(self):
+        """Path of the Unix socket Qt creates for the name"""
+        return self.name if os.path.isabs(self.name) else os.path.join(QDir.tempPath(), self.name)
+
+    def take_over(self):
+        """
+        Remove a socket left behind by an instance that crashed and listen on its name
+
+        Only call this once forwarding to the name failed again after listen()
+        reported it in use, so a live instance is never cut off.
+
+        Returns:
+            bool: True if listening
+        """
+        QLocalServer.removeServer(self.name)
+        return self.listen()
+
+    def close(self):
+        self.server.close()
+
+    def queue(self, paths, assignment=None):
+        """Deliver files to the window, or keep them until one is attached"""
+        if self._window is not None:
+            self._window.open_paths(paths, assignment)
+        else:
+            self._pending.append((list(paths), assignment))
+        self.files_received.emit(list(paths), assignment or "")
+
+    def attach(self, window):
+        """
+        Send requests to a window from now on
+
+        Args:
+            window: Object with open_paths(paths, assignment), usually the MainWindow
+        """
+        self._window = window
+        pending, self._pending = self._pending, []
+        for paths, assignment in pending:
+            window.open_paths(paths, assignment)
+
+    def _accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self._read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def _read(self, socket):
+        if not socket.canReadLine():
+            if socket.bytesAvailable() > MAX_REQUEST_SIZE:
+                socket.abort()
+            return
+        line = bytes(socket.readLine(MAX_REQUEST_SIZE))
+        try:
+            request = json.loads(line)
+            paths = [path for path in request.get('paths', []) if isinstance(path, str)]
+            assignment = request.get('assignment')
+            assignment = assignment if isinstance(assignment, str) else None
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring bad request from another launch: {e}")
+            socket.abort()
+            return
+
+        logger.info(f"Another launch handed over {len(paths)} path(s)")
+        self.queue(paths, assignment)
+        socket.write(b"ok\n")
+        socket.flush()
+        socket.disconnectFromServer()
+
+
+_instance_server = None
+
+
+def start_instance_server(name=None, listen=True, paths=(), assignment=None):
+    """
+    Create and start the shared InstanceServer
+
+    Another launch may start listening between this one's forwarding attempt
+    and its own listen(). When the name turns out to be in use, the files are
+    therefore forwarded once more, and the socket is only treated as left
+    over from a crash if that fails too.
+
+    Args:
+        name (str): Local server name (default: get_server_name())
+        listen (bool): Accept later launches (False only queues this launch's own files)
+        paths (list): This launch's files, forwarded if another instance turns out to be running
+        assignment (str): This launch's assignment name
+
+    Returns:
+        InstanceServer or None: The server (also when it could not listen, so files can still be
+            queued), or None if a running instance took the files and this launch should exit
+    """
+    global _instance_server
+    server = InstanceServer(name)
+    if listen and not server.listen() and server.address_in_use():
+        if forward_to_running_instance(paths, assignment, name=server.name):
+            return None
+        logger.info("Removing the single-instance socket left by an instance that is gone")
+        server.take_over()
+    _instance_server = server
+    return server
+
+
+def get_instance_server():
+    """Get the InstanceServer started by this process, if any"""
+    return _instance_server
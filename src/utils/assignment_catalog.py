@@ -0,0 +1,212 @@
+"""
+Cached list of open assignments, used for autocomplete and to check names before uploading
+"""
+import difflib
+import logging
+import re
+import threading
+import time
+
+from .local_store import get_state_path, load_json, save_json
+from .user_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "assignments.json"
+# Tried for autocomplete when no list command is configured; its list only draws warnings
+DEFAULT_LIST_COMMAND = "turnin --list"
+# What an assignment name in the list may look like
+ASSIGNMENT_NAME = re.compile(r'[A-Za-z0-9_][A-Za-z0-9_.-]*')
+# A list fetched longer ago than this is refreshed before it is trusted to reject a name
+CATALOG_TTL = 15 * 60
+# Seconds to wait for the list command
+LIST_TIMEOUT = 15
+# Seconds an upload waits for the name check before going ahead without it
+ASSIGNMENT_CHECK_TIMEOUT = 10
+
+
+class UnknownAssignmentError(Exception):
+    """Raised before uploading when the assignment is not in the server's list of open assignments"""
+
+
+def get_catalog_path():
+    """Get path to the assignment catalog cache"""
+    return get_state_path(CATALOG_FILE)
+
+
+def get_configured_list_command():
+    """
+    Get the list command set by the user or the deployment, if any
+
+    The command comes from "assignment_list_command" in ~/.turnin/config.json
+    when present, otherwise from ASSIGNMENT_LIST_COMMAND in config.py.
+
+    Returns:
+        str or None: Shell command printing one assignment name per line, or None if not configured
+    """
+    command = get_setting("assignment_list_command")
+    if isinstance(command, str) and command.strip():
+        return command
+    try:
+        from config import ASSIGNMENT_LIST_COMMAND
+    except ImportError:
+        return None
+    if isinstance(ASSIGNMENT_LIST_COMMAND, str) and ASSIGNMENT_LIST_COMMAND.strip():
+        return ASSIGNMENT_LIST_COMMAND
+    return None
+
+
+def get_list_command():
+    """
+    Get the command that lists the open assignments on the submission host
+
+    Returns:
+        str: The configured command, or DEFAULT_LIST_COMMAND
+    """
+    return get_configured_list_command() or DEFAULT_LIST_COMMAND
+
+
+def assignment_check_enforced():
+    """
+    Check whether unknown assignment names are rejected rather than only warned about
+
+    Only a list command that was explicitly configured is trusted to reject
+    names; the default one may not exist on the server or may print something
+    else entirely.
+
+    Returns:
+        bool: True if a list command is configured
+    """
+    return get_configured_list_command() is not None
+
+
+def parse_assignment_list(output):
+    """
+    Parse the output of the list command
+
+    Output that does not look like a list of names (a usage message, an error
+    such as "turnin: unknown option", a name with odd characters) is rejected
+    as a whole, so a server without the command cannot make up assignments.
+
+    Args:
+        output (str): One assignment per line; anything after the name is ignored
+
+    Returns:
+        list: Assignment names in the order listed, without duplicates, or an empty list if
+            the output is not a list of names
+    """
+    names = []
+    for line in output.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if "usage" in line.lower() or ":" in line or not ASSIGNMENT_NAME.fullmatch(parts[0]):
+            logger.info(f"Ignoring assignment list, unexpected line: {line.strip()!r}")
+            return []
+        if parts[0] not in names:
+            names.append(parts[0])
+    return names
+
+
+def unknown_assignment_message(assignment, names):
+    """
+    Describe why an assignment name is rejected
+
+    Args:
+        assignment (str): Name entered by the user
+        names (list): Open assignments, or None if unknown
+
+    Returns:
+        str or None: Error message, or None if the name is fine or the list is unknown
+    """
+    if not names or assignment in names:
+        return None
+    message = f"Assignment '{assignment}' is not open for submission."
+    close = difflib.get_close_matches(assignment, names, n=1)
+    if close:
+        message += f" Did you mean '{close[0]}'?"
+    return message + f"\n\nOpen assignments: {', '.join(names)}"
+
+
+class AssignmentCatalog:
+    """
+    The open assignments as last listed by the server, persisted with the time they were fetched
+
+    An empty or failed listing never replaces a good one, and is never used to
+    reject names, so a server without a list command submits as before.
+    """
+
+    def __init__(self, path=None, ttl=CATALOG_TTL):
+        self.path = path or get_catalog_path()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        data = load_json(self.path, default={})
+        self._data = data if isinstance(data, dict) else {}
+
+    def names(self, max_age=None):
+        """
+        Get the cached assignment names
+
+        Args:
+            max_age (float): Only return a list fetched within this many seconds (default: any age)
+
+        Returns:
+            list or None: Names, or None if nothing (recent enough) is cached
+        """
+        with self._lock:
+            names = self._data.get('assignments')
+            fetched = self._data.get('fetched', 0)
+        if not isinstance(names, list) or not names:
+            return None
+        if max_age is not None and time.time() - fetched > max_age:
+            return None
+        return list(names)
+
+    def fresh_names(self):
+        """Get the cached names if they are younger than the TTL, else None"""
+        return self.names(max_age=self.ttl)
+
+    def store(self, names):
+        """Remember a new listing"""
+        with self._lock:
+            self._data = {'assignments': list(names), 'fetched': time.time()}
+            try:
+                save_json(self.path, self._data)
+            except OSError as e:
+                logger.warning(f"Could not write assignment catalog: {e}")
+
+    def refresh(self, ssh, command=None):
+        """
+        List the open assignments on the server and cache them
+
+        Args:
+            ssh (paramiko.SSHClient): Connection to the submission host
+            command (str): List command (defaults to get_list_command())
+
+        Returns:
+            list or None: Names, or None if the server could not list them
+        """
+        command = command or get_list_command()
+        _, stdout, stderr = ssh.exec_command(command, timeout=LIST_TIMEOUT)
+        output = stdout.read().decode('utf-8', errors='replace')
+        exit_status = stdout.channel.recv_exit_status()
+        names = parse_assignment_list(output) if exit_status == 0 else []
+        if not names:
+            error = stderr.read().decode('utf-8', errors='replace').strip()
+            logger.info(f"Assignment list unavailable: {error or f'exit status {exit_status}'}")
+            return None
+        self.store(names)
+        return names
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_assignment_catalog():
+    """Get the shared AssignmentCatalog instance, loading it on first use"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.path != get_catalog_path():
+            _catalog = AssignmentCatalog()
+        return _catalog
@@ -0,0 +1,314 @@
+"""
+Content-addressed cache of uploaded files on the remote home
+
+Every file is uploaded once into <temp_dir>/.blobs/<sha256>; staging
+directories are filled with hard links to the cached copies, so shared
+headers, skeleton code and resubmissions are not sent again. The cache costs
+quota, so it is opt-in and kept under a size cap.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import secrets
+import shlex
+import threading
+
+from .file_watcher import fingerprint
+from .integrity import UPLOAD_CHUNK_SIZE, upload_and_hash
+from .local_store import get_state_path, load_json, save_json
+from .upload_source import UploadSource
+from .user_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = ".blobs"
+# Cached blobs unused for this many days are removed by the staging collector.
+# Linking a blob changes its ctime, so ctime tells when it was last used
+BLOB_MAX_AGE_DAYS = 30
+# Most space the cache may take, in MiB, when "blob_cache_max_mb" is not set
+BLOB_CACHE_MAX_MB = 100
+# Blobs are named by their digest; anything else in the directory is a partial upload
+BLOB_NAME = re.compile(r'[0-9a-f]{64}')
+HASH_CACHE_FILE = "hashes.json"
+# Local hashes remembered; the least recently stored are forgotten first
+MAX_HASH_CACHE_ENTRIES = 5000
+
+
+def blob_cache_enabled():
+    """
+    Check whether uploads go through the remote blob cache
+
+    Controlled by "blob_cache" in ~/.turnin/config.json (default: off, the
+    cached copies count against the remote quota).
+    """
+    return get_setting("blob_cache", False) is True
+
+
+def get_blob_cache_limit():
+    """
+    Get the most bytes the blob cache may take on the server
+
+    Controlled by "blob_cache_max_mb" in ~/.turnin/config.json.
+
+    Returns:
+        int: Size cap in bytes
+    """
+    limit = get_setting("blob_cache_max_mb", BLOB_CACHE_MAX_MB)
+    if not isinstance(limit, (int, float)) or isinstance(limit, bool) or limit < 0:
+        limit = BLOB_CACHE_MAX_MB
+    return int(limit * 1024 * 1024)
+
+
+def get_blob_dir(base_dir):
+    """Get the blob cache directory inside the directory holding the staging directories"""
+    return posixpath.join(base_dir, BLOB_DIR)
+
+
+def get_hash_cache_path():
+    """Get path to the cache of local file hashes"""
+    return get_state_path(HASH_CACHE_FILE)
+
+
+class LocalHashCache:
+    """
+    SHA-256 digests of local files, reused while their size, mtime and inode are unchanged
+
+    Saves hashing a large file again on every submission just to find out that
+    the server already has it.
+    """
+
+    def __init__(self, path=None, max_entries=MAX_HASH_CACHE_ENTRIES):
+        self.path = path or get_hash_cache_path()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        data = load_json(self.path, default={})
+        self._entries = data if isinstance(data, dict) else {}
+
+    def get(self, path):
+        """
+        Get the cached digest of a file
+
+        Returns:
+            str or None: Hex digest, or None if the file changed or was never hashed
+        """
+        path = os.path.abspath(path)
+        current = fingerprint(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if current is None or not isinstance(entry, list) or len(entry) != 2:
+            return None
+        return entry[1] if tuple(entry[0]) == current else None
+
+    def put(self, path, digest, file_fingerprint):
+        """Remember the digest of a file as it was when file_fingerprint was taken"""
+        if file_fingerprint is None:
+            return
+        with self._lock:
+            path = os.path.abspath(path)
+            self._entries.pop(path, None)
+            self._entries[path] = [list(file_fingerprint), digest]
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+
+    def save(self):
+        """Write the cache to disk"""
+        with self._lock:
+            try:
+                save_json(self.path, self._entries)
+            except OSError as e:
+                logger.warning(f"Could not write hash cache: {e}")
+
+    def digest(self, path, cancel_token=None):
+        """
+        Get the digest of a file, hashing it only if it changed since the last time
+
+        Raises:
+            OSError: If the file cannot be read
+            CancelledError: If cancel_token is cancelled while hashing
+        """
+        cached = self.get(path)
+        if cached:
+            return cached
+        before = fingerprint(path)
+        digest = hashlib.sha256()
+        with UploadSource(path) as source:
+            for chunk in source.chunks(UPLOAD_CHUNK_SIZE):
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        if fingerprint(path) == before:
+            self.put(path, digest, before)
+        return digest
+
+
+_hash_cache = None
+_hash_cache_lock = threading.Lock()
+
+
+def get_local_hash_cache():
+    """Get the shared LocalHashCache instance, loading it on first use"""
+    global _hash_cache
+    with _hash_cache_lock:
+        if _hash_cache is None or _hash_cache.path != get_hash_cache_path():
+            _hash_cache = LocalHashCache()
+        return _hash_cache
+
+
+def list_blobs(ssh, blob_dir):
+    """
+    List the cached blobs with a single exec call, without reading their content
+
+    Args:
+        ssh (paramiko.SSHClient): Connected SSH client
+        blob_dir (str): Blob cache directory
+
+    Returns:
+        dict or None: Digest -> (size in bytes, ctime), or None if the server could not list them
+    """
+    _, stdout, stderr = ssh.exec_command(
+        f"find {shlex.quote(blob_dir)} -mindepth 1 -maxdepth 1 -type f -printf '%f %s %C@\\n'"
+    )
+    output = stdout.read().decode('utf-8', errors='replace')
+    exit_status = stdout.channel.recv_exit_status()
+    if exit_status != 0:
+        error = stderr.read().decode('utf-8', errors='replace').strip()
+        logger.warning(f"Could not list the blob cache: {error or f'exit status {exit_status}'}")
+        return None
+
+    blobs = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) != 3 or not BLOB_NAME.fullmatch(parts[0]):
+            continue
+        try:
+            blobs[parts[0]] = (int(parts[1]), float(parts[2]))
+        except ValueError:
+            continue
+    return blobs
+
+
+def find_cached_blobs(blobs, sizes):
+    """
+    Find the files whose content the server already has
+
+    A blob only appears under its digest once it is completely written, so a
+    blob of the right size is reused as is; the hash check of the staging
+    directory that follows every upload catches a damaged one.
+
+    Args:
+        blobs (dict): Digest -> (size, ctime), as returned by list_blobs()
+        sizes (dict): Digest -> size of the local file
+
+    Returns:
+        set: Digests whose blob is present with the expected size
+    """
+    return {digest for digest, size in sizes.items() if digest in blobs and blobs[digest][0] == size}
+
+
+def blobs_to_evict(blobs, keep, max_bytes):
+    """
+    Choose the blobs to remove to bring the cache under its size cap
+
+    Linking a blob changes its ctime, so the least recently used go first.
+
+    Args:
+        blobs (dict): Digest -> (size, ctime)
+        keep (set): Digests of the submission in progress, never removed
+        max_bytes (int): Size cap
+
+    Returns:
+        list: Digests to remove
+    """
+    total = sum(size for size, _ in blobs.values())
+    evict = []
+    for digest, (size, _) in sorted(blobs.items(), key=lambda item: item[1][1]):
+        if total <= max_bytes:
+            break
+        if digest in keep:
+            continue
+        evict.append(digest)
+        total -= size
+    return evict
+
+
+def remove_blobs(ssh, blob_dir, digests):
+    """Remove blobs from the cache with a single exec call"""
+    if not digests:
+        return
+    paths = ' '.join(shlex.quote(posixpath.join(blob_dir, digest)) for digest in digests)
+    _, stdout, _ = ssh.exec_command(f"rm -f -- {paths}")
+    stdout.channel.recv_exit_status()
+
+
+def upload_blob(sftp, local_path, blob_dir, cancel_token=None, rate_limiter=None):
+    """
+    Upload a file into the blob cache
+
+    The file goes to a temporary name and is renamed to its digest, so a blob
+    is never seen half written.
+
+    Returns:
+        str: Hex digest of the uploaded content
+    """
+    partial = posixpath.join(blob_dir, f".{secrets.token_hex(8)}.part")
+    try:
+        digest = upload_and_hash(sftp, local_path, partial, cancel_token=cancel_token, rate_limiter=rate_limiter)
+        sftp.posix_rename(partial, posixpath.join(blob_dir, digest))
+    except BaseException:
+        try:
+            sftp.remove(partial)
+        except Exception:
+            pass
+        raise
+    return digest
+
+
+def build_link_command(blob_dir, staging_dir, digests, tool="ln -f"):
+    """
+    Build the shell command that puts cached blobs into a staging directory
+
+    Args:
+        blob_dir (str): Blob cache directory
+        staging_dir (str): Staging directory
+        digests (dict): File name in the staging directory -> digest
+        tool (str): "ln -f" for hard links, "cp -f" where hard links are not supported
+
+    Returns:
+        str: Shell command
+    """
+    commands = [f"cd {shlex.quote(staging_dir)}"]
+    for name, digest in digests.items():
+        commands.append(f"{tool} -- {shlex.quote(posixpath.join(blob_dir, digest))} {shlex.quote(name)}")
+    return " && ".join(commands)
+
+
+def link_blobs(ssh, blob_dir, staging_dir, digests):
+    """
+    Hard link the blobs into the staging directory, copying them if linking fails
+
+    Files that end up missing are found and re-uploaded by the verification
+    that follows.
+
+    Returns:
+        bool: True if every file was linked or copied
+    """
+    if not digests:
+        return True
+    for tool in ("ln -f", "cp -f"):
+        _, stdout, stderr = ssh.exec_command(build_link_command(blob_dir, staging_dir, digests, tool))
+        exit_status = stdout.channel.recv_exit_status()
+        if exit_status == 0:
+            return True
+        error = stderr.read().decode('utf-8', errors='replace').strip()
+        logger.warning(f"{tool.split()[0]} from the blob cache failed: {error or f'exit status {exit_status}'}")
+    return False
+
+
+def build_blob_collect_command(base_dir, max_age_days=BLOB_MAX_AGE_DAYS):
+    """Build the shell command that removes blobs unused for max_age_days"""
+    blob_dir = shlex.quote(get_blob_dir(base_dir))
+    return (f"find {blob_dir} -mindepth 1 -maxdepth 1 -type f -ctime +{int(max_age_days)} "
+            f"-exec rm -f -- {{}} + 2>/dev/null")
@@ -0,0 +1,112 @@
+"""
+Cooperative cancellation for long running operations
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class CancelledError(Exception):
+    """Raised when an operation notices its cancellation token was cancelled"""
+
+
+class CancellationToken:
+    """
+    Token shared between the code that runs an operation and the code that may cancel it
+
+    The running code checks the token between steps (or sleeps on it with wait),
+    so cancelling never interrupts an operation half way through a step. Steps
+    that block on the network can register on_cancel callbacks that close the
+    channel they are waiting on, which makes them return right away.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def cancel(self):
+        """Request cancellation and run the registered callbacks"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._run(callback)
+
+    def on_cancel(self, callback):
+        """
+        Register a callback to run when the token is cancelled
+
+        The callback runs in the thread that calls cancel(), so it should only
+        close things, not wait on them. If the token is already cancelled it
+        runs immediately.
+
+        Args:
+            callback (callable): Function taking no arguments
+
+        Returns:
+            callable: Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        self._run(callback)
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @staticmethod
+    def _run(callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Cancellation callback failed: {e}")
+
+    @property
+    def cancelled(self):
+        """True once cancel() has been called"""
+        return self._event.is_set()
+
+    def wait(self, timeout):
+        """
+        Sleep for up to timeout seconds, waking early if cancelled
+
+        Returns:
+            bool: True if the token was cancelled
+        """
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        """Raise CancelledError if the token was cancelled"""
+        if self.cancelled:
+            raise CancelledError("Operation cancelled")
+
+
+@contextmanager
+def cancellable(token):
+    """
+    Report any error raised after cancellation as CancelledError
+
+    Closing channels from on_cancel callbacks makes the blocked call fail with
+    whatever error the closed channel produces; inside this block such errors
+    surface as a CancelledError instead.
+
+    Args:
+        token (CancellationToken): Token of the running operation
+    """
+    try:
+        yield
+    except CancelledError:
+        raise
+    except Exception as e:
+        if token.cancelled:
+            raise CancelledError("Operation cancelled") from e
+        raise
@@ -0,0 +1,437 @@
+"""
+Thread-safe pool of authenticated SSH connections shared between submissions
+"""
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Each lease runs at most an SFTP session and one command at a time, so this keeps a
+# transport under OpenSSH's default MaxSessions of 10
+MAX_LEASES_PER_TRANSPORT = 4
+SESSIONS_PER_LEASE = 2
+MAX_SESSIONS_PER_TRANSPORT = 10
+# Unused connections are closed after this many seconds
+IDLE_TIMEOUT = 300
+# Connections unused for longer than this are probed with a session round trip before checkout
+HEALTH_CHECK_AFTER = 30
+HEALTH_CHECK_TIMEOUT = 5
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Keys the password digests in pool keys; random per process, so a digest is useless outside it
+_CREDENTIAL_KEY = secrets.token_bytes(32)
+
+
+def credential_digest(password):
+    """
+    Digest identifying a password within this process
+
+    Args:
+        password (str): SSH password
+
+    Returns:
+        str: Hex HMAC-SHA256 of the password under a per-process random key
+    """
+    return hmac.new(_CREDENTIAL_KEY, (password or "").encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class PooledConnection:
+    """
+    An authenticated SSH client owned by the pool
+
+    Args:
+        key (tuple): (host, port, username, hops, credential digest)
+        client (paramiko.SSHClient): Connected client
+        parent (Lease): Lease on the previous hop carrying this connection, if any
+    """
+
+    def __init__(self, key, client, parent=None):
+        self.key = key
+        self.client = client
+        self.parent = parent
+        self.leases = 0
+        # Sessions opened beyond the leases' own, see ConnectionPool.reserve_sessions
+        self.extra_sessions = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+
+    def is_alive(self):
+        """True if the transport is still connected and authenticated"""
+        if self.broken:
+            return False
+        try:
+            transport = self.client.get_transport()
+            return bool(transport and transport.is_active() and transport.is_authenticated())
+        except Exception:
+            return False
+
+    def probe(self, timeout=HEALTH_CHECK_TIMEOUT):
+        """
+        Check that the server still answers by opening and closing a session channel
+
+        Returns:
+            bool: True if the server answered in time
+        """
+        try:
+            channel = self.client.get_transport().open_session(timeout=timeout)
+            channel.close()
+            return True
+        except Exception as e:
+            logger.info(f"Pooled connection to {self.key[0]} failed its health check: {e}")
+            return False
+
+    def close(self):
+        """Close the client and give back the hop it was carried over"""
+        try:
+            self.client.close()
+        except Exception:
+            pass
+        if self.parent:
+            self.parent.close()
+            self.parent = None
+
+
+class CountingChannel:
+    """
+    Socket-like wrapper of a channel counting the bytes through it as turnin_tunnel_bytes_total
+
+    Connections to hosts behind a gateway run over such a channel, so this
+    counts the tunnelled traffic, SSH framing included.
+
+    Args:
+        channel (paramiko.Channel): Channel to wrap
+        metrics (MetricsRegistry): Where to count (default: get_metrics())
+    """
+
+    def __init__(self, channel, metrics=None):
+        self.channel = channel
+        self._metrics = metrics or get_metrics()
+
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+
+    def send(self, data):
+        sent = self.channel.send(data)
+        self._metrics.inc('turnin_tunnel_bytes_total', sent, direction='up')
+        return sent
+
+    def sendall(self, data):
+        self.channel.sendall(data)
+        self._metrics.inc('turnin_tunnel_bytes_total', len(data), direction='up')
+
+    def recv(self, nbytes):
+        data = self.channel.recv(nbytes)
+        if data:
+            self._metrics.inc('turnin_tunnel_bytes_total', len(data), direction='down')
+        return data
+
+
+class Lease:
+    """
+    A checked-out share of a pooled connection
+
+    Behaves like the underlying paramiko.SSHClient (exec_command, open_sftp,
+    get_transport, ...), except that close() hands the connection back to the
+    pool instead of disconnecting it. Leases can be used as context managers.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection.client, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def key(self):
+        """Pool key of the connection: (host, port, username, hops, credential digest)"""
+        return self._connection.key
+
+    @property
+    def client(self):
+        """The underlying paramiko.SSHClient"""
+        return self._connection.client
+
+    def open_channel_to(self, host, port=22, timeout=None):
+        """
+        Open a direct-tcpip channel from this connection's host to another host
+
+        Args:
+            host (str): Destination host as seen from this connection's host
+            port (int): Destination port
+            timeout (float): Seconds to wait for the channel to open
+
+        Returns:
+            CountingChannel: Socket-like channel to the destination, counting the bytes through it
+        """
+        return CountingChannel(self._connection.client.get_transport().open_channel(
+            'direct-tcpip', (host, port), ('127.0.0.1', 0), timeout=timeout
+        ))
+
+    def share(self):
+        """
+        Take another lease on the same connection
+
+        Returns:
+            Lease: New lease, released independently of this one
+        """
+        return self._pool._checkout(self._connection)
+
+    def invalidate(self):
+        """Mark the connection as broken so it is closed instead of reused"""
+        self._connection.broken = True
+
+    def close(self):
+        """Return the connection to the pool (only the first call has an effect)"""
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._connection)
+
+    release = close
+
+
+class ConnectionPool:
+    """
+    Pool of authenticated SSH connections keyed by (host, port, username, hop chain, password)
+
+    The password is part of the key as credential_digest(), so a lease asked
+    for with another password never gets a transport authenticated with the
+    old one: it logs in afresh and fails if the password is wrong.
+
+    Connections are shared: up to max_leases callers use the same transport at
+    once, each opening its own channels on it. When every connection for a key
+    is fully leased, another one is opened. Connections to hosts behind a
+    gateway are carried over a direct-tcpip channel of the pooled gateway
+    connection, so only the gateway is dialled directly.
+
+    Args:
+        connector (callable): connector(host, port, username, password, sock) -> connected SSHClient;
+            sock is None for direct connections
+        max_leases (int): Maximum simultaneous leases per connection
+        idle_timeout (float): Seconds after which unused connections are closed
+        health_check_after (float): Idle seconds after which a connection is probed before checkout
+    """
+
+    def __init__(self, connector, max_leases=MAX_LEASES_PER_TRANSPORT, idle_timeout=IDLE_TIMEOUT,
+                 health_check_after=HEALTH_CHECK_AFTER):
+        self.connector = connector
+        self.max_leases = max_leases
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    def acquire(self, host, username, password, port=22, via=None):
+        """
+        Lease a connection, reusing a healthy pooled one when possible
+
+        Args:
+            host (str): Host to connect to
+            username (str): SSH username
+            password (str): SSH password
+            port (int): SSH port
+            via (Lease): Connection to tunnel through (the previous hop)
+
+        Returns:
+            Lease: Lease on a connected, authenticated client
+
+        Raises:
+            Whatever the connector raises when a new connection is needed and fails
+        """
+        hops = ()
+        if via is not None:
+            via_host, via_port, _, via_hops, _ = via.key
+            hops = via_hops + ((via_host, via_port),)
+        key = (host, port, username, hops, credential_digest(password))
+
+        self.evict_idle()
+        while True:
+            connection = self._find_available(key)
+            if connection is None:
+                break
+            # Probing talks to the server, so it happens outside the pool lock
+            if time.monotonic() - connection.last_used < self.health_check_after or connection.probe():
+                return self._checkout(connection, reserved=True)
+            connection.broken = True
+            self._release(connection)
+
+        return self._connect(key, password, via)
+
+    def _find_available(self, key):
+        """Reserve a lease on the least used healthy connection for key, or return None"""
+        with self._lock:
+            candidates = [c for c in self._connections.get(key, [])
+                          if c.leases < self.max_leases and c.is_alive()]
+            if not candidates:
+                return None
+            connection = min(candidates, key=lambda c: c.leases)
+            connection.leases += 1
+            return connection
+
+    def _connect(self, key, password, via):
+        host, port, username, _, _ = key
+        parent = None
+        sock = None
+        if via is not None:
+            # The new connection keeps its own lease on the hop that carries it
+            parent = via.share()
+            try:
+                sock = parent.open_channel_to(host, port)
+            except Exception:
+                parent.close()
+                raise
+        try:
+            client = self.connector(host, port, username, password, sock)
+        except Exception:
+            if parent:
+                parent.close()
+            raise
+
+        connection = PooledConnection(key, client, parent)
+        with self._lock:
+            self._connections.setdefault(key, []).append(connection)
+        logger.info(f"Opened pooled connection to {host}:{port} as {username}"
+                    f"{' via ' + ' -> '.join(h for h, _ in key[3]) if key[3] else ''}")
+        return self._checkout(connection)
+
+    def _checkout(self, connection, reserved=False):
+        with self._lock:
+            if not reserved:
+                connection.leases += 1
+            connection.last_used = time.monotonic()
+        return Lease(self, connection)
+
+    def _release(self, connection):
+        with self._lock:
+            connection.leases = max(0, connection.leases - 1)
+            connection.last_used = time.monotonic()
+            if connection.leases or connection.is_alive():
+                return
+            self._forget(connection)
+        connection.close()
+
+    def _forget(self, connection):
+        """Remove a connection from the pool; the caller holds the lock"""
+        connections = self._connections.get(connection.key, [])
+        if connection in connections:
+            connections.remove(connection)
+        if not connections:
+            self._connections.pop(connection.key, None)
+
+    def reserve_sessions(self, transport, wanted):
+        """
+        Reserve sessions on a pooled transport beyond the ones every lease may use
+
+        The leases of a connection may together use SESSIONS_PER_LEASE sessions
+        each; whatever is left under MAX_SESSIONS_PER_TRANSPORT is shared by
+        callers that want more, such as ranged uploads.
+
+        Args:
+            transport (paramiko.Transport): Transport of a leased connection
+            wanted (int): Extra sessions wanted
+
+        Returns:
+            int: Sessions granted (all of them for a transport the pool does not own);
+                give them back with release_sessions()
+        """
+        with self._lock:
+            connection = self._find_by_transport(transport)
+            if connection is None:
+                return wanted
+            spare = (MAX_SESSIONS_PER_TRANSPORT - SESSIONS_PER_LEASE * self.max_leases
+                     - connection.extra_sessions)
+            granted = max(0, min(wanted, spare))
+            connection.extra_sessions += granted
+            return granted
+
+    def release_sessions(self, transport, count):
+        """Give back sessions granted by reserve_sessions()"""
+        with self._lock:
+            connection = self._find_by_transport(transport)
+            if connection is not None:
+                connection.extra_sessions = max(0, connection.extra_sessions - count)
+
+    def _find_by_transport(self, transport):
+        """Get the pooled connection using transport; the caller holds the lock"""
+        for connections in self._connections.values():
+            for connection in connections:
+                try:
+                    if connection.client.get_transport() is transport:
+                        return connection
+                except Exception:
+                    continue
+        return None
+
+    def evict_idle(self):
+        """Close connections that are dead or have been unused for longer than idle_timeout"""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for connections in list(self._connections.values()):
+                for connection in list(connections):
+                    if connection.leases:
+                        continue
+                    if now - connection.last_used > self.idle_timeout or not connection.is_alive():
+                        self._forget(connection)
+                        evicted.append(connection)
+        for connection in evicted:
+            connection.close()
+        return len(evicted)
+
+    def close_all(self):
+        """Close every pooled connection, leased or not"""
+        with self._lock:
+            connections = [c for group in self._connections.values() for c in group]
+            self._connections = {}
+        # Close the innermost hops first; their parents are released as they close
+        for connection in sorted(connections, key=lambda c: len(c.key[3]), reverse=True):
+            connection.close()
+
+    def stats(self):
+        """
+        Describe the pooled connections
+
+        Returns:
+            dict: (host, port, username, hops) -> list of lease counts, one per connection
+        """
+        stats = {}
+        with self._lock:
+            for key, group in self._connections.items():
+                stats.setdefault(key[:4], []).extend(c.leases for c in group)
+        return stats
+
+
+def get_connection_pool():
+    """Get the shared connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Imported here because the SSH helpers themselves use the pool
+            from .ssh import open_ssh_client
+            _pool = ConnectionPool(open_ssh_client)
+        return _pool
+
+
+def close_connection_pool():
+    """Close all pooled connections and forget the shared pool"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool:
+        pool.close_all()
@@ -2,12 +2,15 @@
 Credential management utilities for securely storing and retrieving user credentials
 """
 import json
+import logging
 import keyring
 import os
 from cryptography.fernet import Fernet, InvalidToken
 from PyQt6.QtWidgets import QMessageBox
 from os.path import expanduser, join
 
+logger = logging.getLogger(__name__)
+
 def get_credentials_path():
     """Get path to credentials file in user's home directory"""
     home_dir = expanduser("~")
@@ -76,7 +79,7 @@ def clear_credentials():
         if os.path.exists(creds_path):
             os.remove(creds_path)
     except Exception as e:
-        print(f"Error removing credentials file: {e}")
+        logger.error(f"Error removing credentials file: {e}")
         success = False
     
     try:
@@ -84,7 +87,7 @@ def clear_credentials():
         keyring.delete_password("turnin", "encryption_key")
     except Exception as e:
         # It's okay if the keyring entry doesn't exist
-        print(f"Note: Could not remove keyring entry (may not exist): {e}")
+        logger.info(f"Could not remove keyring entry (may not exist): {e}")
     
     return success
 
@@ -0,0 +1,659 @@
+"""
+Per-user background daemon holding warm SSH connections (turnin daemon / turnin submit)
+
+Like OpenSSH's ControlMaster, the daemon keeps the authenticated gateway and
+submission host connections in its connection pool between launches. Later
+`turnin submit` runs hand their files to it over a Unix socket in ~/.turnin
+(mode 0600) and start uploading at once, without a new key exchange,
+password authentication or rupt. The daemon exits after being idle for a
+while.
+
+The daemon is opt-in: `turnin submit` only starts one with --daemon or with
+"daemon": true in ~/.turnin/config.json (a daemon started by hand with
+`turnin daemon` is used either way). It does not keep passwords: every
+submission brings the credentials, which also select the warm connection
+they authenticated. Only with "daemon_cache_credentials": true (or
+`turnin daemon --cache-credentials`) does it keep them in memory until it
+exits, so submissions need no credentials at all.
+
+Protocol: one JSON object per line. A client sends a single request and reads
+events until the one that ends it:
+
+    {"op": "ping"}                        -> {"event": "pong", "pid": ..., "logged_in": ...}
+    {"op": "login", "username", "password"} -> {"event": "result", "ok": ..., "output": ...}
+    {"op": "submit", "assignment", "files", ["username", "password"]}
+        -> {"event": "progress", "percent": ..., "message": ...} ...
+        -> {"event": "result", "ok": ..., "output": ...}
+    {"op": "shutdown"}                    -> {"event": "result", "ok": true, "output": ""}
+
+Requests that need a connection before anyone logged in are answered with
+{"event": "error", "error": "login_required"}.
+"""
+import json
+import logging
+import os
+import select
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from .local_store import get_state_path
+from .metrics import start_metrics_writer
+from .user_config import get_setting
+
+try:
+    from config import TEMP_DIR
+except ImportError:
+    TEMP_DIR = "turnin"
+
+logger = logging.getLogger(__name__)
+
+SOCKET_FILE = "daemon.sock"
+# Output of a daemon started in the background, so a failed start can be looked into
+LOG_FILE = "daemon.log"
+# The daemon exits once no request arrived for this many seconds
+DAEMON_IDLE_TIMEOUT = 30 * 60
+# Seconds a starting daemon has to create its socket
+START_TIMEOUT = 10
+# Longest request line accepted
+MAX_REQUEST_SIZE = 1024 * 1024
+
+LOGIN_REQUIRED = "login_required"
+
+
+class DaemonUnavailable(Exception):
+    """Raised when no daemon is listening (or daemons are not supported here)"""
+
+
+class LoginRequired(Exception):
+    """Raised when the daemon has no credentials yet and the request did not bring any"""
+
+
+def get_socket_path():
+    """Get path to the daemon's Unix socket"""
+    return get_state_path(SOCKET_FILE)
+
+
+def daemon_supported():
+    """Check whether Unix sockets are available"""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def daemon_enabled():
+    """
+    Check whether turnin submit starts a daemon when none is running
+
+    Controlled by "daemon" in ~/.turnin/config.json (default: off).
+    """
+    return get_setting("daemon", False) is True
+
+
+def credential_caching_enabled():
+    """
+    Check whether the daemon keeps the credentials of the last login in memory
+
+    Controlled by "daemon_cache_credentials" in ~/.turnin/config.json (default: off).
+    """
+    return get_setting("daemon_cache_credentials", False) is True
+
+
+def peer_uid(conn):
+    """
+    Get the user id of the process on the other end of a Unix socket
+
+    Returns:
+        int or None: User id, or None where the platform does not tell
+    """
+    if hasattr(socket, 'SO_PEERCRED'):
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        return struct.unpack('3i', creds)[1]
+    if hasattr(os, 'getpeereid'):
+        return os.getpeereid(conn.fileno())[1]
+    return None
+
+
+class DaemonServer:
+    """
+    Serves submissions over the daemon socket with connections kept in the shared pool
+
+    Args:
+        path (str): Socket path (default: get_socket_path())
+        idle_timeout (float): Seconds without requests before the daemon exits
+        proxy_hosts (list): Gateway hosts (default: get_proxy_hosts())
+        temp_dir (str): Remote directory (relative to home) for staging directories
+        cache_credentials (bool): Keep the credentials of the last login, so later requests need none
+    """
+
+    def __init__(self, path=None, idle_timeout=DAEMON_IDLE_TIMEOUT, proxy_hosts=None, temp_dir=TEMP_DIR,
+                 cache_credentials=False):
+        self.path = path or get_socket_path()
+        self.idle_timeout = idle_timeout
+        self.proxy_hosts = proxy_hosts
+        self.temp_dir = temp_dir
+        self.cache_credentials = cache_credentials
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._active = 0
+        self._last_activity = time.monotonic()
+        self._stop = threading.Event()
+        self._socket = None
+
+    @property
+    def logged_in(self):
+        """True if requests can do without credentials (only when caching them)"""
+        with self._lock:
+            return self._credentials is not None
+
+    def bind(self):
+        """
+        Create the socket, readable and writable by the current user only
+
+        Raises:
+            DaemonUnavailable: If Unix sockets are not supported
+            RuntimeError: If another daemon is already listening
+        """
+        if not daemon_supported():
+            raise DaemonUnavailable("Unix sockets are not available on this platform")
+        if os.path.exists(self.path):
+            if DaemonClient(self.path).ping() is not None:
+                raise RuntimeError(f"A daemon is already listening on {self.path}")
+            # Left behind by a daemon that did not exit cleanly
+            os.unlink(self.path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.path, 0o600)
+        sock.listen(16)
+        sock.settimeout(1.0)
+        self._socket = sock
+
+    def serve_forever(self):
+        """Answer requests until shut down or idle for idle_timeout seconds"""
+        from .connection_pool import get_connection_pool, close_connection_pool
+
+        if not self._socket:
+            self.bind()
+        # Warm connections are the point of the daemon; keep them as long as the daemon lives
+        get_connection_pool().idle_timeout = self.idle_timeout
+        logger.info(f"Daemon listening on {self.path} (pid {os.getpid()})")
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._socket.accept()
+                except socket.timeout:
+                    with self._lock:
+                        idle = self._active == 0 and time.monotonic() - self._last_activity > self.idle_timeout
+                    if idle:
+                        logger.info("Daemon idle, shutting down")
+                        break
+                    get_connection_pool().evict_idle()
+                    continue
+                except OSError:
+                    break
+                threading.Thread(target=self._handle, args=(conn,), name="daemon-client", daemon=True).start()
+        finally:
+            self.close()
+            close_connection_pool()
+
+    def shutdown(self):
+        """Stop serving (from any thread)"""
+        self._stop.set()
+
+    def close(self):
+        """Close the socket and remove its file"""
+        self._stop.set()
+        if self._socket:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _handle(self, conn):
+        """Answer one client connection"""
+        with self._lock:
+            self._active += 1
+        try:
+            conn.settimeout(None)
+            uid = peer_uid(conn)
+            if uid is not None and uid != os.getuid():
+                logger.warning(f"Rejected daemon client of user {uid}")
+                return
+            stream = conn.makefile('rwb')
+            line = stream.readline(MAX_REQUEST_SIZE)
+            if not line:
+                return
+
+            def send(event):
+                stream.write((json.dumps(event) + "\n").encode('utf-8'))
+                stream.flush()
+
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request is not an object")
+            except ValueError as e:
+                send({'event': 'error', 'error': f"bad request: {e}"})
+                return
+            self._dispatch(request, send, conn)
+        except OSError as e:
+            logger.info(f"Daemon client went away: {e}")
+        except Exception as e:
+            logger.error(f"Daemon request failed: {e}")
+        finally:
+            try:
+                conn.close()
+            except OSError:
+                pass
+            with self._lock:
+                self._active -= 1
+                self._last_activity = time.monotonic()
+
+    def _dispatch(self, request, send, conn):
+        op = request.get('op')
+        if op == 'ping':
+            send({'event': 'pong', 'pid': os.getpid(), 'logged_in': self.logged_in})
+        elif op == 'login':
+            ok, output = self._login(request.get('username'), request.get('password'))
+            send({'event': 'result', 'ok': ok, 'output': output})
+        elif op == 'submit':
+            self._submit(request, send, conn)
+        elif op == 'shutdown':
+            send({'event': 'result', 'ok': True, 'output': ""})
+            self.shutdown()
+        else:
+            send({'event': 'error', 'error': f"unknown op {op!r}"})
+
+    def _proxy_hosts(self):
+        if self.proxy_hosts:
+            return self.proxy_hosts
+        from .proxy_health import get_proxy_hosts
+        return get_proxy_hosts()
+
+    def _connect(self, username, password):
+        """Lease a warm gateway connection; returns (ok, ssh, proxy_host, host_to_connect, error)"""
+        from .ssh import connect_to_gateway
+
+        ok, proxy_host, host_to_connect, ssh, error_type = connect_to_gateway(
+            username, password, self._proxy_hosts(), notify=False
+        )
+        if not ok:
+            if error_type == 'auth':
+                # Wrong or changed password: later requests must log in again
+                with self._lock:
+                    if self._credentials and self._credentials[0] == username:
+                        self._credentials = None
+                return False, None, None, None, "Authentication failed. Please check your credentials."
+            return False, None, None, None, f"Connection failed ({error_type})."
+        if self.cache_credentials:
+            with self._lock:
+                self._credentials = (username, password)
+        return True, ssh, proxy_host, host_to_connect, None
+
+    def _login(self, username, password):
+        if not username or not password:
+            return False, "Username and password are required."
+        ok, ssh, _, _, error = self._connect(username, password)
+        if not ok:
+            return False, error
+        ssh.close()
+        return True, f"Logged in as {username}"
+
+    def _submit(self, request, send, conn):
+        from .cancellation import CancellationToken
+        from .ssh import submit_files
+
+        assignment = request.get('assignment')
+        files = request.get('files')
+        if not isinstance(assignment, str) or not assignment or not isinstance(files, list) or not files:
+            send({'event': 'error', 'error': "assignment and files are required"})
+            return
+        files = [os.path.abspath(path) for path in files if isinstance(path, str)]
+
+        if request.get('username') and request.get('password'):
+            credentials = (request['username'], request['password'])
+        else:
+            with self._lock:
+                credentials = self._credentials
+        if not credentials:
+            send({'event': 'error', 'error': LOGIN_REQUIRED})
+            return
+
+        ok, ssh, proxy_host, host_to_connect, error = self._connect(*credentials)
+        if not ok:
+            send({'event': 'result', 'ok': False, 'output': error})
+            return
+
+        # A client that goes away cancels its submission
+        cancel_token = CancellationToken()
+        done = threading.Event()
+        watcher = threading.Thread(target=self._watch_client, args=(conn, cancel_token, done),
+                                   name="daemon-client-watch", daemon=True)
+        watcher.start()
+
+        def progress(percent, message):
+            try:
+                send({'event': 'progress', 'percent': percent, 'message': message})
+            except OSError:
+                cancel_token.cancel()
+
+        try:
+            ok, output = submit_files(proxy_host, host_to_connect, credentials[0], credentials[1], assignment,
+                                      files, self.temp_dir, ssh_client=ssh, progress_callback=progress,
+                                      cancel_token=cancel_token)
+        finally:
+            ssh.close()
+            done.set()
+            watcher.join()
+        send({'event': 'result', 'ok': ok, 'output': output})
+
+    @staticmethod
+    def _watch_client(conn, cancel_token, done):
+        """Cancel the submission when the client closes its end (it sends nothing after the request)"""
+        while not done.is_set():
+            try:
+                readable, _, _ = select.select([conn], [], [], 0.2)
+                if not readable or done.is_set():
+                    continue
+                if conn.recv(1, socket.MSG_PEEK):
+                    return  # not part of the protocol; leave it unread
+            except (OSError, ValueError):
+                pass
+            cancel_token.cancel()
+            return
+
+
+class DaemonClient:
+    """
+    Talks to a running daemon
+
+    Args:
+        path (str): Socket path (default: get_socket_path())
+        timeout (float): Seconds to wait for the daemon to accept a connection
+    """
+
+    def __init__(self, path=None, timeout=5):
+        self.path = path or get_socket_path()
+        self.timeout = timeout
+
+    def request(self, message, on_event=None):
+        """
+        Send one request and read its events
+
+        Args:
+            message (dict): Request
+            on_event (callable): Called with every event before the final one
+
+        Returns:
+            dict: The final event ("pong", "result" or "error")
+
+        Raises:
+            DaemonUnavailable: If no daemon is listening
+        """
+        if not daemon_supported():
+            raise DaemonUnavailable("Unix sockets are not available on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError as e:
+                raise DaemonUnavailable(f"No daemon on {self.path}: {e}")
+            # Submissions take as long as they take; the daemon reports progress meanwhile
+            sock.settimeout(None)
+            sock.sendall((json.dumps(message) + "\n").encode('utf-8'))
+            with sock.makefile('rb') as stream:
+                for line in stream:
+                    event = json.loads(line)
+                    if event.get('event') == 'progress':
+                        if on_event:
+                            on_event(event)
+                        continue
+                    return event
+        finally:
+            sock.close()
+        raise DaemonUnavailable("The daemon closed the connection without answering")
+
+    def ping(self):
+        """
+        Check whether a daemon is listening
+
+        Returns:
+            dict or None: The daemon's pong, or None if none is running
+        """
+        try:
+            return self.request({'op': 'ping'})
+        except (DaemonUnavailable, ValueError):
+            return None
+
+    def login(self, username, password):
+        """Give the daemon credentials and have it connect; returns (ok, output)"""
+        event = self.request({'op': 'login', 'username': username, 'password': password})
+        return bool(event.get('ok')), event.get('output') or event.get('error', "")
+
+    def submit(self, assignment, files, username=None, password=None, progress_callback=None):
+        """
+        Submit files through the daemon
+
+        Args:
+            assignment (str): Assignment name
+            files (list): Local files (the daemon reads them itself)
+            username, password (str): Credentials, needed only if the daemon has none yet
+            progress_callback (callable): progress_callback(percent, message)
+
+        Returns:
+            tuple: (success, output) as returned by submit_files
+
+        Raises:
+            LoginRequired: If the daemon needs credentials
+            DaemonUnavailable: If no daemon is listening
+        """
+        message = {'op': 'submit', 'assignment': assignment, 'files': [os.path.abspath(path) for path in files]}
+        if username and password:
+            message.update(username=username, password=password)
+
+        def on_event(event):
+            if progress_callback:
+                progress_callback(event.get('percent', 0), event.get('message', ""))
+
+        event = self.request(message, on_event)
+        if event.get('error') == LOGIN_REQUIRED:
+            raise LoginRequired()
+        if event.get('event') == 'error':
+            return False, event.get('error', "")
+        return bool(event.get('ok')), event.get('output', "")
+
+    def shutdown(self):
+        """Ask the daemon to exit"""
+        self.request({'op': 'shutdown'})
+
+
+def get_daemon_command():
+    """
+    Get the command line that runs `turnin daemon` from the code this process runs
+
+    The entry module is the turnin module of the package this one belongs to,
+    found on the package's own import path, so it works wherever the package
+    is installed, whatever the current directory.
+
+    Returns:
+        tuple: (argv, extra environment)
+    """
+    if getattr(sys, 'frozen', False):
+        return [sys.executable, "daemon"], {}
+    package = __package__.rpartition('.')[0]
+    if not package:
+        return [sys.executable, "-m", "turnin", "daemon"], {}
+    top = package.split('.')[0]
+    # The directory holding the top level package must be importable from anywhere
+    root = os.path.dirname(os.path.abspath(list(sys.modules[top].__path__)[0]))
+    python_path = os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')]))
+    return [sys.executable, "-m", f"{package}.turnin", "daemon"], {'PYTHONPATH': python_path}
+
+
+def start_daemon(path=None, timeout=START_TIMEOUT):
+    """
+    Start a daemon in the background and wait until it listens
+
+    Its output goes to ~/.turnin/daemon.log.
+
+    Returns:
+        bool: True once the daemon answers, False if it exited or did not answer in time
+    """
+    command, env = get_daemon_command()
+    with open(get_state_path(LOG_FILE), 'ab') as log:
+        process = subprocess.Popen(command, cwd=os.path.expanduser("~"), env={**os.environ, **env},
+                                   stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                                   start_new_session=True, close_fds=True)
+
+    client = DaemonClient(path)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.ping() is not None:
+            return True
+        if process.poll() is not None:
+            logger.warning(f"The daemon exited with status {process.returncode}, see {get_state_path(LOG_FILE)}")
+            return False
+        time.sleep(0.1)
+    return False
+
+
+def daemon_main(argv=None):
+    """
+    Run the daemon in the foreground (turnin daemon)
+
+    Returns:
+        int: Exit code
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="turnin daemon",
+                                     description="Keep SSH connections warm for later turnin submit runs")
+    parser.add_argument("--idle-timeout", type=float, default=DAEMON_IDLE_TIMEOUT,
+                        help=f"Seconds without requests before exiting (default: {DAEMON_IDLE_TIMEOUT})")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    parser.add_argument("--cache-credentials", action="store_true", default=credential_caching_enabled(),
+                        help="Keep the credentials of the last login in memory, so submissions need none "
+                             "(default: the \"daemon_cache_credentials\" setting)")
+    args = parser.parse_args(argv)
+
+    if args.stop:
+        try:
+            DaemonClient().shutdown()
+        except DaemonUnavailable:
+            print("No daemon is running", file=sys.stderr)
+            return 1
+        return 0
+
+    server = DaemonServer(idle_timeout=args.idle_timeout, cache_credentials=args.cache_credentials)
+    try:
+        server.bind()
+    except (DaemonUnavailable, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    start_metrics_writer()
+    server.serve_forever()
+    return 0
+
+
+def ask_credentials():
+    """Get saved credentials, or ask for them on the terminal"""
+    import getpass
+
+    try:
+        from .credential_manager import load_credentials
+        saved = load_credentials()
+    except Exception as e:
+        logger.info(f"Saved credentials unavailable: {e}")
+        saved = None
+    if saved:
+        return saved
+    username = input("Username: ").strip()
+    return username, getpass.getpass("Password: ")
+
+
+def submit_main(argv=None):
+    """
+    Submit files from the command line (turnin submit), through the daemon when possible
+
+    Returns:
+        int: Exit code (0 if the submission succeeded)
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="turnin submit", description="Submit files for an assignment")
+    parser.add_argument("assignment", help="Assignment name")
+    parser.add_argument("files", nargs="+", help="Files to submit")
+    parser.add_argument("--daemon", action="store_true", default=daemon_enabled(),
+                        help="Start the background daemon if none is running (default: the \"daemon\" setting)")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Connect from this process, even if a daemon is running")
+    args = parser.parse_args(argv)
+
+    missing = [path for path in args.files if not os.path.isfile(path)]
+    if missing:
+        print(f"Not a file: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    def progress(percent, message):
+        print(f"[{int(percent):3d}%] {message}", file=sys.stderr)
+
+    ok, output = None, None
+    if not args.no_daemon and daemon_supported():
+        client = DaemonClient()
+        pong = client.ping()
+        if pong is None and args.daemon:
+            if start_daemon():
+                pong = client.ping()
+            else:
+                logger.warning("Could not start the daemon, submitting directly")
+        if pong is not None:
+            try:
+                # A daemon that does not cache credentials needs them with every submission
+                credentials = (None, None) if pong.get('logged_in') else ask_credentials()
+                try:
+                    ok, output = client.submit(args.assignment, args.files, *credentials,
+                                               progress_callback=progress)
+                except LoginRequired:
+                    ok, output = client.submit(args.assignment, args.files, *ask_credentials(),
+                                               progress_callback=progress)
+            except DaemonUnavailable as e:
+                logger.warning(f"Daemon unavailable ({e}), submitting directly")
+
+    if ok is None:
+        ok, output = submit_directly(args.assignment, args.files, progress)
+
+    print(output)
+    return 0 if ok else 1
+
+
+def submit_directly(assignment, files, progress_callback=None):
+    """Connect and submit from this process; returns (success, output)"""
+    from .proxy_health import get_proxy_hosts
+    from .ssh import connect_to_gateway, submit_files
+    from .connection_pool import close_connection_pool
+
+    start_metrics_writer()
+    username, password = ask_credentials()
+    ok, proxy_host, host_to_connect, ssh, error_type = connect_to_gateway(username, password, get_proxy_hosts(),
+                                                                          notify=False)
+    if not ok:
+        return False, f"Connection failed ({error_type})."
+    try:
+        return submit_files(proxy_host, host_to_connect, username, password, assignment,
+                            [os.path.abspath(path) for path in files], TEMP_DIR, ssh_client=ssh,
+                            progress_callback=progress_callback)
+    finally:
+        ssh.close()
+        close_connection_pool()
@@ -0,0 +1,331 @@
+"""
+Offline buffer for error reports
+
+Sentry events are written to a bounded spool under ~/.turnin and sent by a
+background thread, so reporting an error never waits on the network and
+reports from offline sessions are sent once the network returns.
+"""
+import hashlib
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+
+from sentry_sdk.consts import VERSION as SENTRY_VERSION
+from sentry_sdk.transport import Transport
+
+from .local_store import get_state_path
+from .retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = "error_reports"
+# The oldest reports are dropped once the spool holds more than this many reports or bytes
+MAX_SPOOLED_REPORTS = 200
+MAX_SPOOL_BYTES = 5 * 1024 * 1024
+# Reports waiting in memory for the background thread; further reports are dropped
+MAX_QUEUED_REPORTS = 100
+# Identical errors within this many seconds are sent once, with a count of the ones suppressed
+DEDUP_WINDOW = 10 * 60
+# Seconds between spool checks while everything has been sent
+FLUSH_INTERVAL = 60
+SEND_TIMEOUT = 10
+
+# Delays between failed sends grow up to ten minutes; the spool is kept however long that takes
+SEND_BACKOFF = RetryPolicy(max_attempts=1, base_delay=5.0, max_delay=600.0)
+MIN_RETRY_DELAY = 1.0
+
+
+def get_spool_dir():
+    """Get path to the directory holding unsent error reports"""
+    return get_state_path(SPOOL_DIR)
+
+
+class ErrorSpool:
+    """
+    Directory of serialized Sentry envelopes, one file per report, oldest first
+
+    Args:
+        directory (str): Spool directory (created if needed)
+        max_reports (int): Maximum number of spooled reports
+        max_bytes (int): Maximum total size of the spooled reports
+    """
+
+    def __init__(self, directory=None, max_reports=MAX_SPOOLED_REPORTS, max_bytes=MAX_SPOOL_BYTES):
+        self.directory = directory or get_spool_dir()
+        self.max_reports = max_reports
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def put(self, data):
+        """
+        Store a report, dropping the oldest ones if the spool is over its limits
+
+        Args:
+            data (bytes): Serialized envelope
+        """
+        # Names sort by creation time; the suffix keeps reports from the same instant apart
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.envelope"
+        with self._lock:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, os.path.join(self.directory, name))
+            except Exception:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+            self._trim()
+
+    def _trim(self):
+        reports = self.pending()
+        sizes = {}
+        for path in reports:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                sizes[path] = 0
+        total = sum(sizes.values())
+        while reports and (len(reports) > self.max_reports or total > self.max_bytes):
+            oldest = reports.pop(0)
+            total -= sizes[oldest]
+            self.remove(oldest)
+            logger.warning("Error report spool is full, dropped the oldest report")
+
+    def pending(self):
+        """
+        List the spooled reports
+
+        Returns:
+            list: Paths of the reports, oldest first
+        """
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(".envelope"))
+        except OSError:
+            return []
+        return [os.path.join(self.directory, name) for name in names]
+
+    def remove(self, path):
+        """Delete a report (missing reports are ignored)"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class Deduplicator:
+    """
+    Drops repeats of the same error within a time window
+
+    Errors are identified by their exception types and stack frames, or by the
+    log message template for events captured from logging, so the same failure
+    raised again and again (e.g. on every reconnect attempt) is only sent once
+    per window. The first report after the window records how many repeats
+    were suppressed.
+
+    Args:
+        window (float): Seconds during which repeats are suppressed
+    """
+
+    def __init__(self, window=DEDUP_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    @staticmethod
+    def fingerprint(event):
+        """
+        Compute the identity of an event
+
+        Args:
+            event (dict): Sentry event
+
+        Returns:
+            str: Hex digest identifying identical errors
+        """
+        parts = []
+        for value in (event.get('exception') or {}).get('values') or []:
+            parts.append(str(value.get('type')))
+            for frame in (value.get('stacktrace') or {}).get('frames') or []:
+                parts.append(f"{frame.get('module') or frame.get('filename')}:"
+                             f"{frame.get('function')}:{frame.get('lineno')}")
+        if not parts:
+            logentry = event.get('logentry') or {}
+            parts.append(str(event.get('logger')))
+            parts.append(str(logentry.get('message') or event.get('message')))
+        return hashlib.sha256("\n".join(parts).encode('utf-8', errors='replace')).hexdigest()
+
+    def before_send(self, event, hint=None):
+        """
+        Sentry before_send hook
+
+        Returns:
+            dict or None: The event to send, or None to drop a repeat
+        """
+        key = self.fingerprint(event)
+        now = time.monotonic()
+        with self._lock:
+            # Forget errors whose window has passed so the table stays small
+            for old in [k for k, (first, _) in self._seen.items() if now - first > self.window and k != key]:
+                del self._seen[old]
+
+            first, suppressed = self._seen.get(key, (None, 0))
+            if first is not None and now - first <= self.window:
+                self._seen[key] = (first, suppressed + 1)
+                return None
+            self._seen[key] = (now, 0)
+
+        if suppressed:
+            event.setdefault('extra', {})['duplicates_suppressed'] = suppressed
+        return event
+
+
+class SpoolingTransport(Transport):
+    """
+    Sentry transport that spools envelopes to disk and sends them from a background thread
+
+    capture_envelope only serializes the envelope and queues it, so it returns
+    immediately on any thread. The background thread writes queued envelopes to
+    the spool and sends spooled envelopes oldest first. When a send fails the
+    envelope stays spooled and sending is retried with exponential backoff;
+    envelopes left over from earlier sessions are sent on startup.
+
+    Args:
+        options (dict): Sentry client options (passed by sentry_sdk.init)
+        spool (ErrorSpool): Spool to use; defaults to the one under ~/.turnin
+        sender (callable): sender(data) -> bool, True once the envelope needs no further sending;
+            defaults to posting to the DSN's envelope endpoint
+        start (bool): Start the background thread right away
+    """
+
+    def __init__(self, options=None, spool=None, sender=None, start=True):
+        super().__init__(options)
+        self.spool = spool or ErrorSpool()
+        self.sender = sender or self._post
+        self._queue = queue.Queue(maxsize=MAX_QUEUED_REPORTS)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._failures = 0
+        self._next_send = 0.0
+        self._thread = None
+        if start:
+            self.start()
+
+    def start(self):
+        """Start the background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="error-reports", daemon=True)
+        self._thread.start()
+
+    def capture_envelope(self, envelope):
+        """Queue an envelope for spooling and sending (never blocks)"""
+        try:
+            self._queue.put_nowait(envelope.serialize())
+        except queue.Full:
+            logger.warning("Error report queue is full, dropped a report")
+            return
+        self._wake.set()
+
+    def flush(self, timeout, callback=None):
+        """Write queued envelopes to the spool so they survive the application exiting"""
+        self._persist_queued()
+        self._wake.set()
+
+    def kill(self):
+        """Spool what is queued and stop the background thread"""
+        self._persist_queued()
+        self._stop.set()
+        self._wake.set()
+
+    def is_healthy(self):
+        return self._failures == 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._persist_queued()
+            wait = FLUSH_INTERVAL
+            if time.monotonic() >= self._next_send:
+                if not self.send_pending():
+                    self._failures += 1
+                    self._next_send = time.monotonic() + max(MIN_RETRY_DELAY, SEND_BACKOFF.delay(self._failures))
+                    logger.info(f"Error reports could not be sent, retrying in "
+                                f"{self._next_send - time.monotonic():.0f} s")
+                else:
+                    self._failures = 0
+            if self._failures:
+                wait = max(0.0, self._next_send - time.monotonic())
+            # New reports wake the thread, but only to spool them while backing off
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def _persist_queued(self):
+        while True:
+            try:
+                data = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.spool.put(data)
+            except OSError as e:
+                logger.error(f"Failed to spool error report: {e}")
+
+    def send_pending(self):
+        """
+        Send spooled envelopes oldest first, stopping at the first failure
+
+        Returns:
+            bool: True if the spool was emptied
+        """
+        for path in self.spool.pending():
+            if self._stop.is_set():
+                return False
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            try:
+                sent = self.sender(data)
+            except Exception as e:
+                logger.debug(f"Sending error report failed: {e}")
+                sent = False
+            if not sent:
+                return False
+            self.spool.remove(path)
+        return True
+
+    def _post(self, data):
+        """
+        Post an envelope to Sentry
+
+        Returns:
+            bool: True if Sentry accepted the envelope or rejected it for good
+        """
+        if self.parsed_dsn is None:
+            return True  # reporting is disabled; nothing will ever send this
+        # Imported here; only this background thread needs requests
+        import requests
+
+        auth = self.parsed_dsn.to_auth(f"sentry.python/{SENTRY_VERSION}")
+        response = requests.post(
+            auth.get_api_url(), data=data, timeout=SEND_TIMEOUT,
+            headers={
+                "Content-Type": "application/x-sentry-envelope",
+                "X-Sentry-Auth": auth.to_header(),
+            },
+        )
+        if response.status_code == 429 or response.status_code >= 500:
+            return False
+        if response.status_code >= 400:
+            # Malformed or too large; resending the same bytes cannot succeed
+            logger.warning(f"Sentry rejected an error report with status {response.status_code}")
+        return True
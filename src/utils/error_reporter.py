@@ -1,65 +1,107 @@
 """
 Error reporting utilities for capturing and handling exceptions
 """
+import logging
 import sys
+import threading
 from os import path
 import traceback
 import sentry_sdk
-from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtWidgets import QApplication, QMessageBox
 sys.path.insert(0, path.abspath(path.join(path.dirname(__file__), '..')))
 from config import SENTRY_DSN
 
+from .error_buffer import Deduplicator, SpoolingTransport
+
+logger = logging.getLogger(__name__)
+
+_dialogs = None
+_dialogs_lock = threading.Lock()
+
 
 def init_error_reporting():
     """
     Initialize the error reporting system with Sentry
+
+    Events are spooled under ~/.turnin and sent in the background (see
+    error_buffer), and repeats of the same error are only sent once per
+    deduplication window.
     """
     try:
-        sentry_sdk.init(SENTRY_DSN)
+        sentry_sdk.init(SENTRY_DSN, transport=SpoolingTransport, before_send=Deduplicator().before_send)
     except Exception as e:
-        print(f"Failed to initialize error reporting: {e}")
+        logger.error(f"Failed to initialize error reporting: {e}")
+
+
+class ErrorDialogNotifier(QObject):
+    """Shows error dialogs in the GUI thread, whichever thread reports the error"""
+    requested = pyqtSignal(str, str)
+
+    def __init__(self):
+        super().__init__()
+        self.requested.connect(self.show_dialog)
+
+    def show_dialog(self, message, details):
+        """Show a modal error dialog"""
+        error_dialog = QMessageBox()
+        error_dialog.setWindowTitle("Error")
+        error_dialog.setText(message)
+        if details:
+            error_dialog.setDetailedText(details)
+        error_dialog.setIcon(QMessageBox.Icon.Critical)
+        error_dialog.exec()
+
+
+def show_error_dialog(message, details=""):
+    """
+    Show an error dialog without blocking threads other than the GUI thread
+
+    Called from the GUI thread the dialog is shown right away; from any other
+    thread it is queued to the GUI thread and this returns immediately.
+
+    Args:
+        message (str): Text of the dialog
+        details (str): Text shown under "Show Details"
+    """
+    global _dialogs
+    app = QApplication.instance()
+    if app is None:
+        return
+    with _dialogs_lock:
+        if _dialogs is None:
+            _dialogs = ErrorDialogNotifier()
+            _dialogs.moveToThread(app.thread())
+    # Qt delivers the signal directly on the GUI thread and queued from other threads
+    _dialogs.requested.emit(message, details)
 
 
 def report_error(e, context="", user_info=None):
     """
     Report an error to Sentry and show a dialog to the user
 
+    Reporting only queues the event; it is sent by a background thread (see
+    init_error_reporting), so this never waits on the network.
+
     Args:
         e (Exception): The exception to report
         context (str): Additional context about where the error occurred
         user_info (dict): User information to include with the error
     """
+    details = "".join(traceback.format_exception(type(e), e, e.__traceback__))
     try:
-        # Set user context if provided
-        if user_info:
-            sentry_sdk.set_user(user_info)
-
-        # Add extra context data
-        with sentry_sdk.configure_scope() as scope:
+        # Context is set on a new scope so it does not stick to later events
+        with sentry_sdk.new_scope() as scope:
+            if user_info:
+                scope.set_user(user_info)
             scope.set_extra("context", context)
+            sentry_sdk.capture_exception(e)
 
-        # Capture the exception
-        sentry_sdk.capture_exception(e)
-
-        # Log to console
-        print(f"Error in {context}: {str(e)}")
-        traceback.print_exc()
-
-        # Show error message to user
-        error_dialog = QMessageBox()
-        error_dialog.setWindowTitle("Error")
-        error_dialog.setText(f"An error occurred: {str(e)}")
-        error_dialog.setDetailedText(traceback.format_exc())
-        error_dialog.setIcon(QMessageBox.Icon.Critical)
-        error_dialog.exec()
+        # Log with traceback
+        logger.error(f"Error in {context}: {str(e)}", exc_info=e)
 
     except Exception as report_error:
         # Failsafe if error reporting itself fails
-        print(f"Error in error reporting: {report_error}")
+        logger.error(f"Error in error reporting: {report_error}")
 
-        # Basic error dialog
-        error_dialog = QMessageBox()
-        error_dialog.setWindowTitle("Error")
-        error_dialog.setText(f"An error occurred: {str(e)}")
-        error_dialog.setIcon(QMessageBox.Icon.Critical)
-        error_dialog.exec()
\ No newline at end of file
+    show_error_dialog(f"An error occurred: {str(e)}", details)
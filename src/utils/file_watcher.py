@@ -0,0 +1,337 @@
+"""
+Watch selected files for changes, with inotify on Linux and mtime polling elsewhere
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# A batch is reported once the files have been quiet for this many seconds...
+DEBOUNCE = 2.0
+# ...or at the latest this long after the first change, for files that are written continuously
+MAX_BATCH_DELAY = 10.0
+# Seconds between scans when inotify is not available
+POLL_INTERVAL = 2.0
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# Editors save in place, by writing a new file and renaming it over the old one, or by deleting and recreating
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def fingerprint(path):
+    """
+    Cheap identity of a file's current content
+
+    Args:
+        path (str): Local file
+
+    Returns:
+        tuple or None: (size, mtime in ns, inode), or None if the file cannot be read
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class Inotify:
+    """
+    Minimal ctypes binding of the Linux inotify API
+
+    Raises:
+        OSError: If inotify is not available
+    """
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """
+        Watch a directory
+
+        Returns:
+            int: Watch descriptor
+
+        Raises:
+            OSError: If the directory cannot be watched (e.g. the watch limit is reached)
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def remove_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout):
+        """
+        Wait for events
+
+        Args:
+            timeout (float): Seconds to wait for the first event
+
+        Returns:
+            list: (wd, mask, name) tuples; empty if nothing happened in time
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FileWatcher:
+    """
+    Background thread reporting which of a set of files changed, debounced and batched
+
+    The directories holding the files are watched with inotify where available
+    (a file saved by renaming a new copy over it is still seen), and the files
+    are polled for size and modification time otherwise. Every change restarts
+    the debounce timer; once the files have been quiet for debounce seconds, or
+    max_batch_delay seconds have passed since the first change, on_change is
+    called on the watcher thread with the set of paths whose fingerprint
+    differs from the last batch.
+
+    Args:
+        on_change (callable): on_change(paths) with a set of changed paths
+        debounce (float): Quiet period before a batch is reported
+        max_batch_delay (float): Longest time a change waits to be reported
+        poll_interval (float): Seconds between scans when polling
+        use_inotify (bool): Use inotify (default: when available)
+    """
+
+    def __init__(self, on_change, debounce=DEBOUNCE, max_batch_delay=MAX_BATCH_DELAY,
+                 poll_interval=POLL_INTERVAL, use_inotify=True):
+        self.on_change = on_change
+        self.debounce = debounce
+        self.max_batch_delay = max_batch_delay
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        self._lock = threading.Lock()
+        self._paths = {}         # path -> fingerprint reported last
+        self._seen = {}          # path -> fingerprint seen by the last scan
+        self._dirty = set()
+        self._first_change = None
+        self._last_change = None
+        self._paths_changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.mode = None
+
+    def set_paths(self, paths):
+        """
+        Replace the set of watched files
+
+        Newly added files are reported as changed in the next batch, so
+        whatever they contain is picked up once.
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        with self._lock:
+            self._paths = {path: self._paths.get(path) for path in paths}
+            self._seen = {path: self._seen[path] for path in paths if path in self._seen}
+            added = [path for path in paths if self._paths[path] is None]
+            self._mark_dirty(added)
+        self._paths_changed.set()
+
+    def paths(self):
+        """Get the watched files"""
+        with self._lock:
+            return list(self._paths)
+
+    def start(self):
+        """Start the watcher thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self._stop.set()
+        self._paths_changed.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def _mark_dirty(self, paths):
+        """Note changed paths; the caller holds the lock"""
+        if not paths:
+            return
+        now = time.monotonic()
+        self._dirty.update(paths)
+        self._last_change = now
+        if self._first_change is None:
+            self._first_change = now
+
+    def _due_batch(self):
+        """Take the batch if it is due, returning the paths whose fingerprint changed"""
+        with self._lock:
+            if not self._dirty:
+                return None
+            now = time.monotonic()
+            if now - self._last_change < self.debounce and now - self._first_change < self.max_batch_delay:
+                return None
+            candidates = [path for path in self._dirty if path in self._paths]
+            self._dirty = set()
+            self._first_change = self._last_change = None
+
+        changed = set()
+        current = {path: fingerprint(path) for path in candidates}
+        with self._lock:
+            for path, value in current.items():
+                if path in self._paths and value is not None and value != self._paths[path]:
+                    self._paths[path] = value
+                    changed.add(path)
+        return changed
+
+    def _wait_time(self):
+        """Seconds until the pending batch is due (or the default wait without one)"""
+        with self._lock:
+            if not self._dirty:
+                return self.poll_interval
+            now = time.monotonic()
+            due = min(self._last_change + self.debounce, self._first_change + self.max_batch_delay)
+        return max(0.05, due - now)
+
+    def _run(self):
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = Inotify()
+            except OSError as e:
+                logger.info(f"inotify unavailable ({e}), polling for changes")
+        self.mode = 'inotify' if inotify else 'polling'
+        try:
+            if inotify:
+                self._run_inotify(inotify)
+            else:
+                self._run_polling()
+        except Exception as e:
+            logger.error(f"File watcher stopped: {e}")
+        finally:
+            if inotify:
+                inotify.close()
+
+    def _report(self):
+        changed = self._due_batch()
+        if changed:
+            try:
+                self.on_change(changed)
+            except Exception as e:
+                logger.error(f"File watcher callback failed: {e}")
+
+    def _scan(self, paths):
+        """Mark the paths whose fingerprint differs from the previous scan"""
+        current = {path: fingerprint(path) for path in paths}
+        with self._lock:
+            changed = [path for path, value in current.items()
+                       if path in self._paths and value != self._seen.get(path)]
+            self._seen.update((path, current[path]) for path in changed)
+            self._mark_dirty(changed)
+
+    def _run_polling(self):
+        while not self._stop.is_set():
+            self._scan(self.paths())
+            self._report()
+            self._paths_changed.wait(min(self.poll_interval, self._wait_time()))
+            self._paths_changed.clear()
+
+    def _run_inotify(self, inotify):
+        watches = {}  # directory -> wd
+        directories = {}  # wd -> directory
+        last_scan = 0.0
+        while not self._stop.is_set():
+            if self._paths_changed.is_set():
+                self._paths_changed.clear()
+                wanted = {os.path.dirname(path) for path in self.paths()}
+                for directory in set(watches) - wanted:
+                    directories.pop(watches[directory], None)
+                    inotify.remove_watch(watches.pop(directory))
+                for directory in wanted - set(watches):
+                    try:
+                        wd = inotify.add_watch(directory)
+                    except OSError as e:
+                        # Out of watches or the directory is gone; its files are polled instead
+                        logger.warning(f"Cannot watch {directory}: {e}")
+                        continue
+                    watches[directory] = wd
+                    directories[wd] = directory
+
+            unwatched = [path for path in self.paths() if os.path.dirname(path) not in watches]
+            if unwatched and time.monotonic() - last_scan >= self.poll_interval:
+                self._scan(unwatched)
+                last_scan = time.monotonic()
+
+            for wd, mask, name in inotify.read_events(min(self._wait_time(), 0.5)):
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost; check every file
+                    with self._lock:
+                        self._mark_dirty(list(self._paths))
+                    continue
+                directory = directories.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    directories.pop(wd, None)
+                    watches.pop(directory, None)
+                    self._paths_changed.set()
+                    continue
+                with self._lock:
+                    if name:
+                        # Editor swap and backup files next to the watched ones do not delay the batch
+                        path = os.path.join(directory, name)
+                        self._mark_dirty([path] if path in self._paths else [])
+                    else:
+                        self._mark_dirty([path for path in self._paths if os.path.dirname(path) == directory])
+            self._report()
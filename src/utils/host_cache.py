@@ -0,0 +1,119 @@
+"""
+Last known good submission host for each gateway, so logins can skip the rupt scan
+"""
+import logging
+import threading
+import time
+
+from .local_store import get_state_path, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+HOST_CACHE_FILE = "host_cache.json"
+
+# A cached host older than this is not trusted; the next login scans with rupt again
+HOST_MAX_AGE = 24 * 60 * 60
+
+
+def get_host_cache_path():
+    """Get path to the host cache file"""
+    return get_state_path(HOST_CACHE_FILE)
+
+
+class HostCache:
+    """
+    Persisted map of gateway -> the last submission host that worked through it, with a timestamp
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_host_cache_path()
+        self._lock = threading.Lock()
+        data = load_json(self.path, default={})
+        self._hosts = data if isinstance(data, dict) else {}
+
+    def get(self, proxy_host, max_age=HOST_MAX_AGE):
+        """
+        Get the last good host for a gateway
+
+        Args:
+            proxy_host (str): Gateway host
+            max_age (float): Seconds after which the cached host is ignored
+
+        Returns:
+            str or None: Host name, or None if nothing recent is cached
+        """
+        with self._lock:
+            entry = self._hosts.get(proxy_host)
+        if not isinstance(entry, dict) or not entry.get('host'):
+            return None
+        if time.time() - entry.get('verified', 0) > max_age:
+            return None
+        return entry['host']
+
+    def record(self, proxy_host, host):
+        """
+        Remember a host that just worked
+
+        Args:
+            proxy_host (str): Gateway the host was reached through
+            host (str): Submission host
+        """
+        with self._lock:
+            self._hosts[proxy_host] = {'host': host, 'verified': time.time()}
+            self._save()
+
+    def forget(self, proxy_host, host=None):
+        """
+        Drop the cached host of a gateway
+
+        Args:
+            proxy_host (str): Gateway host
+            host (str): Only forget the entry if it still names this host
+        """
+        with self._lock:
+            entry = self._hosts.get(proxy_host)
+            if entry is None or (host is not None and entry.get('host') != host):
+                return
+            del self._hosts[proxy_host]
+            self._save()
+
+    def _save(self):
+        try:
+            save_json(self.path, self._hosts)
+        except OSError as e:
+            logger.warning(f"Could not write host cache: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_host_cache():
+    """Get the shared HostCache instance, loading it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.path != get_host_cache_path():
+            _cache = HostCache()
+        return _cache
+
+
+def start_host_check(check, name="host-check"):
+    """
+    Run a cached host check in a daemon thread
+
+    Args:
+        check (callable): Function taking no arguments
+        name (str): Thread name
+
+    Returns:
+        threading.Thread: The started thread
+    """
+    def run():
+        try:
+            check()
+        except Exception as e:
+            logger.warning(f"Host check failed: {e}")
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,254 @@
+"""
+Integrity checks for uploaded files
+"""
+import hashlib
+import logging
+import secrets
+import shlex
+import threading
+import time
+
+from .metrics import get_metrics
+from .ranged_upload import use_ranged_upload, upload_ranges_and_hash
+from .rate_limit import get_upload_limiter
+from .upload_source import UploadSource
+
+logger = logging.getLogger(__name__)
+
+# Read size for the combined hash and upload pass; paramiko splits it into SFTP requests
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Bytes of quoted names per sha256sum call, well below the smallest ARG_MAX in use
+HASH_ARGV_BYTES = 64 * 1024
+
+
+def upload_and_hash(sftp, local_path, remote_path, chunk_size=UPLOAD_CHUNK_SIZE, cancel_token=None,
+                    rate_limiter=None):
+    """
+    Upload a file and compute its SHA-256 in the same read pass
+
+    Args:
+        sftp (paramiko.SFTPClient): Open SFTP session
+        local_path (str): Local file to upload
+        remote_path (str): Destination path on the server
+        chunk_size (int): Bytes read per iteration
+        cancel_token (CancellationToken): Checked before every chunk
+        rate_limiter (TokenBucket): Bandwidth limit (default: the global upload limit)
+
+    Returns:
+        str: Hex SHA-256 digest of the uploaded content
+
+    Raises:
+        CancelledError: If the token is cancelled during the upload
+    """
+    if use_ranged_upload(local_path):
+        digest = upload_ranges_and_hash(sftp, local_path, remote_path, chunk_size=chunk_size,
+                                        cancel_token=cancel_token, rate_limiter=rate_limiter)
+        if digest is not None:
+            return digest
+
+    rate_limiter = rate_limiter or get_upload_limiter()
+    metrics = get_metrics()
+    digest = hashlib.sha256()
+    started = time.monotonic()
+    sent = 0
+    try:
+        # Unbuffered so the memoryview slices reach the SFTP requests without being copied
+        with UploadSource(local_path) as source, sftp.open(remote_path, 'wb', bufsize=0) as remote_file:
+            # Pipelining sends write requests without waiting for each acknowledgement
+            remote_file.set_pipelined(True)
+            # Under a limit, smaller chunks keep the stream steady instead of sending a burst per chunk
+            for chunk in source.chunks(rate_limiter.chunk_size(chunk_size)):
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                rate_limiter.consume(len(chunk), cancel_token)
+                digest.update(chunk)
+                remote_file.write(chunk)
+                sent += len(chunk)
+    finally:
+        # Bytes of failed uploads were sent too
+        metrics.inc('turnin_upload_bytes_total', sent)
+    metrics.observe('turnin_upload_put_seconds', time.monotonic() - started)
+    return digest.hexdigest()
+
+
+def parse_sha256sum(output):
+    """
+    Parse the output of sha256sum
+
+    Args:
+        output (str): Lines of the form "<hash>  <name>"
+
+    Returns:
+        dict: File name -> hex digest
+    """
+    hashes = {}
+    for line in output.splitlines():
+        # sha256sum prefixes lines for names with backslashes or newlines with "\";
+        # such names are left out and treated as mismatches
+        if not line or line.startswith('\\'):
+            continue
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            continue
+        digest, name = parts
+        if name.startswith('*'):
+            name = name[1:]  # binary mode marker
+        hashes[name] = digest.lower()
+    return hashes
+
+
+def remote_hashes(ssh, remote_dir, names):
+    """
+    Hash staged files on the server, batching the names to keep each command line bounded
+
+    Args:
+        ssh (paramiko.SSHClient): Connected SSH client
+        remote_dir (str): Staging directory
+        names (list): File names inside the staging directory
+
+    Returns:
+        dict or None: File name -> hex digest, or None if the server could not hash at all
+    """
+    hashes = {}
+    for batch in _argv_batches([shlex.quote(name) for name in names], HASH_ARGV_BYTES):
+        batch_hashes = _run_sha256sum(ssh, remote_dir, batch)
+        if batch_hashes is None:
+            return None
+        hashes.update(batch_hashes)
+    return hashes
+
+
+def _argv_batches(quoted, limit):
+    """
+    Split quoted arguments into groups whose joined length stays within the limit
+
+    Args:
+        quoted (list): Shell-quoted arguments
+        limit (int): Maximum bytes per group (a single longer argument gets its own group)
+
+    Returns:
+        list: Lists of arguments
+    """
+    batches = []
+    batch = []
+    size = 0
+    for arg in quoted:
+        length = len(arg.encode('utf-8')) + 1
+        if batch and size + length > limit:
+            batches.append(batch)
+            batch = []
+            size = 0
+        batch.append(arg)
+        size += length
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _run_sha256sum(ssh, remote_dir, quoted):
+    """
+    Run one sha256sum call over already quoted names
+
+    Returns:
+        dict or None: File name -> hex digest, or None if the command produced no hashes and failed
+    """
+    _, stdout, stderr = ssh.exec_command(f"cd {shlex.quote(remote_dir)} && sha256sum -- {' '.join(quoted)}")
+    # Drain stderr while stdout is read, or a command writing many errors stalls on a full window
+    errors = []
+    reader = threading.Thread(target=lambda: errors.append(stderr.read()), daemon=True)
+    reader.start()
+    output = stdout.read().decode('utf-8', errors='replace')
+    exit_status = stdout.channel.recv_exit_status()
+    reader.join()
+
+    hashes = parse_sha256sum(output)
+    if exit_status != 0 and not hashes:
+        error = errors[0].decode('utf-8', errors='replace').strip() if errors else ''
+        logger.warning(f"Remote hashing unavailable: {error or f'exit status {exit_status}'}")
+        return None
+    return hashes
+
+
+def find_mismatches(expected, actual):
+    """
+    Compare local and remote hashes
+
+    Args:
+        expected (dict): File name -> local hex digest
+        actual (dict): File name -> remote hex digest
+
+    Returns:
+        list: Names whose remote copy is missing or different
+    """
+    return [name for name, digest in expected.items() if actual.get(name) != digest]
+
+
+def verify_staged_files(ssh, sftp, remote_dir, local_paths, local_hashes, max_repairs=2, cancel_token=None,
+                        rate_limiter=None):
+    """
+    Verify staged files against their local hashes, re-uploading only the ones that differ
+
+    All files are checked with as few remote sha256sum calls as the command
+    line allows; each repair round re-uploads and re-checks only the files
+    that did not match. Files that cannot be hashed count as not matching.
+
+    Args:
+        ssh (paramiko.SSHClient): Connected SSH client
+        sftp (paramiko.SFTPClient): Open SFTP session used for re-uploads
+        remote_dir (str): Staging directory (with trailing slash)
+        local_paths (dict): File name -> local path
+        local_hashes (dict): File name -> local hex digest; updated by re-uploads
+        max_repairs (int): Number of re-upload rounds before giving up
+        cancel_token (CancellationToken): Passed on to the re-uploads
+        rate_limiter (TokenBucket): Passed on to the re-uploads
+
+    Returns:
+        list: Names that still do not match after all repair rounds, or that
+            the server could not hash (empty on success)
+    """
+    pending = list(local_hashes)
+    for repair_round in range(max_repairs + 1):
+        hashes = remote_hashes(ssh, remote_dir, pending)
+        if hashes is None:
+            # Unverified files are not handed to turnin as if they had matched
+            logger.error("Staged files could not be verified on the server")
+            return pending
+
+        mismatched = find_mismatches({name: local_hashes[name] for name in pending}, hashes)
+        if not mismatched:
+            return []
+        if repair_round == max_repairs:
+            break
+
+        logger.warning(f"Re-uploading {len(mismatched)} file(s) that failed verification: {', '.join(mismatched)}")
+        for name in mismatched:
+            local_hashes[name] = _reupload(sftp, local_paths[name], remote_dir, name,
+                                           cancel_token=cancel_token, rate_limiter=rate_limiter)
+        pending = mismatched
+
+    return mismatched
+
+
+def _reupload(sftp, local_path, remote_dir, name, cancel_token=None, rate_limiter=None):
+    """
+    Replace a staged file with a fresh upload
+
+    The upload goes to a temporary name and is renamed over the staged file:
+    with the blob cache a staged file is a hard link into the cache, and
+    writing it in place would change the blob and every other link to it.
+
+    Returns:
+        str: Hex digest of the uploaded content
+    """
+    partial = f"{remote_dir}.{name}.{secrets.token_hex(4)}.part"
+    try:
+        digest = upload_and_hash(sftp, local_path, partial, cancel_token=cancel_token, rate_limiter=rate_limiter)
+        sftp.posix_rename(partial, f"{remote_dir}{name}")
+    except BaseException:
+        try:
+            sftp.remove(partial)
+        except Exception:
+            pass
+        raise
+    return digest
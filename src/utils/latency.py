@@ -0,0 +1,179 @@
+"""
+Per-host latency history and the adaptive timeouts derived from it
+"""
+import logging
+import math
+import threading
+
+from .local_store import get_state_path, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+LATENCY_FILE = "latency.json"
+
+# Number of samples kept per host and kind of operation
+HISTORY_SIZE = 50
+# Below this many samples the default timeout is used
+MIN_SAMPLES = 5
+# Timeouts are this many times the high percentile of the history
+PERCENTILE = 0.95
+HEADROOM = 3.0
+
+# Timeouts used before enough history exists
+DEFAULT_TIMEOUTS = {
+    'connect': 15,  # TCP connect
+    'banner': 10,   # SSH banner, key exchange and authentication
+    'command': 30,  # Remote command (turnin)
+}
+
+# (floor, ceiling) for every kind of timeout, in seconds; turnin never gets less
+# than the fixed 30 seconds it had before timeouts adapted
+TIMEOUT_BOUNDS = {
+    'connect': (3, 30),
+    'banner': (3, 30),
+    'command': (30, 300),
+}
+
+
+def get_latency_path():
+    """Get path to the latency history file"""
+    return get_state_path(LATENCY_FILE)
+
+
+def _sample_value(entry):
+    """Seconds of a history entry: a measured latency, or {"timed_out": timeout} for a censored one"""
+    return entry['timed_out'] if isinstance(entry, dict) else entry
+
+
+def _is_censored(entry):
+    return isinstance(entry, dict)
+
+
+def percentile(values, fraction):
+    """
+    Get the nearest-rank percentile of a list of values
+
+    Args:
+        values (list): Samples
+        fraction (float): Percentile between 0 and 1
+
+    Returns:
+        float: The percentile value
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class LatencyHistory:
+    """
+    Rolling latency samples per host and kind, persisted under ~/.turnin
+
+    Operations that time out are kept as censored samples: all that is known
+    is that they took at least the timeout, so they are counted at that
+    value, and a recent one makes the next timeout at least HEADROOM times
+    longer. Without them a timeout could only ever shrink towards its floor.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_latency_path()
+        self._lock = threading.Lock()
+        data = load_json(self.path, default={})
+        self._history = data if isinstance(data, dict) else {}
+
+    def record(self, host, kind, seconds):
+        """
+        Record a measured latency
+
+        Args:
+            host (str): Host the operation talked to
+            kind (str): 'connect', 'banner' or 'command'
+            seconds (float): Measured duration
+        """
+        self._append(host, kind, round(seconds, 4))
+
+    def record_timeout(self, host, kind, timeout):
+        """
+        Record an operation cut off by its timeout (a censored sample)
+
+        Args:
+            host (str): Host the operation talked to
+            kind (str): 'connect', 'banner' or 'command'
+            timeout (float): Timeout that expired; the real latency was at least this
+        """
+        self._append(host, kind, {'timed_out': round(timeout, 4)})
+
+    def _append(self, host, kind, entry):
+        with self._lock:
+            samples = self._history.setdefault(host, {}).setdefault(kind, [])
+            samples.append(entry)
+            del samples[:-HISTORY_SIZE]
+            try:
+                save_json(self.path, self._history)
+            except OSError as e:
+                logger.warning(f"Could not write latency history: {e}")
+
+    def samples(self, host, kind):
+        """Return the recorded samples for a host and kind, in seconds (censored ones at their timeout)"""
+        return [_sample_value(entry) for entry in self._entries(host, kind)]
+
+    def _entries(self, host, kind):
+        with self._lock:
+            return list(self._history.get(host, {}).get(kind, []))
+
+    def timeout(self, host, kind):
+        """
+        Get the timeout to use for an operation
+
+        With enough history the timeout is the high percentile of the recorded
+        latencies times a safety margin, clamped to the floor and ceiling for
+        that kind. Otherwise the default timeout is used. A timeout among the
+        last MIN_SAMPLES operations raises it to at least HEADROOM times the
+        timeout that expired (up to the ceiling).
+
+        Args:
+            host (str): Host the operation talks to
+            kind (str): 'connect', 'banner' or 'command'
+
+        Returns:
+            float: Timeout in seconds
+        """
+        entries = self._entries(host, kind)
+        floor, ceiling = TIMEOUT_BOUNDS[kind]
+        if len(entries) < MIN_SAMPLES:
+            estimate = DEFAULT_TIMEOUTS[kind]
+        else:
+            estimate = max(percentile([_sample_value(entry) for entry in entries], PERCENTILE) * HEADROOM, floor)
+
+        timed_out = [_sample_value(entry) for entry in entries[-MIN_SAMPLES:] if _is_censored(entry)]
+        if timed_out:
+            estimate = max(estimate, max(timed_out) * HEADROOM)
+        return min(estimate, ceiling)
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_latency_history():
+    """Get the shared LatencyHistory instance, loading it on first use"""
+    global _history
+    with _history_lock:
+        if _history is None or _history.path != get_latency_path():
+            _history = LatencyHistory()
+        return _history
+
+
+def record_latency(host, kind, seconds):
+    """Record a latency sample in the shared history"""
+    get_latency_history().record(host, kind, seconds)
+
+
+def record_timeout(host, kind, timeout):
+    """Record an operation that timed out in the shared history"""
+    get_latency_history().record_timeout(host, kind, timeout)
+
+
+def timeout_for(host, kind):
+    """Get the adaptive timeout for an operation from the shared history"""
+    return get_latency_history().timeout(host, kind)
@@ -0,0 +1,306 @@
+"""
+Concurrent client load test of the submission pipeline (turnin load-test)
+
+A local stand-in server (see stub_ssh_server) plays the gateway and the
+submission hosts. For every concurrency level the driver starts that many
+client processes, each with its own home directory like a separate lab
+machine. Once all of them are ready they start at the same moment and run the
+real connect_to_proxy -> submit_files flow (which uploads the files and runs
+turnin). End-to-end latency percentiles, failure rates and the server-side
+session counts are reported per level.
+"""
+import json
+import os
+import secrets
+import sys
+import time
+
+try:
+    from config import TEMP_DIR
+except ImportError:
+    TEMP_DIR = "turnin"
+
+DEFAULT_LEVELS = (1, 2, 4, 8, 16)
+ASSIGNMENT = "loadtest"
+# Seconds a level may take before its remaining clients count as failed
+LEVEL_TIMEOUT = 300
+READY_LINE = "ready"
+RESULT_PREFIX = "load-test-result "
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile
+
+    Args:
+        values (list): Samples
+        p (float): Percentile between 0 and 100
+
+    Returns:
+        float or None: The percentile, or None without samples
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))  # ceil(n * p / 100)
+    return ordered[int(rank) - 1]
+
+
+def summarize(results):
+    """
+    Summarize the results of one concurrency level
+
+    Args:
+        results (list): Result dicts from the clients ('ok', 'total', 'connect', 'error')
+
+    Returns:
+        dict: clients, ok, failed, failure_rate, p50, p95, p99, connect_p50 and errors
+            (error message -> count); latencies cover successful clients only
+    """
+    latencies = [r['total'] for r in results if r['ok']]
+    connects = [r['connect'] for r in results if r.get('connect') is not None]
+    errors = {}
+    for result in results:
+        if not result['ok']:
+            errors[result['error']] = errors.get(result['error'], 0) + 1
+    failed = len(results) - len(latencies)
+    return {
+        'clients': len(results),
+        'ok': len(latencies),
+        'failed': failed,
+        'failure_rate': failed / len(results) if results else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'connect_p50': percentile(connects, 50),
+        'errors': errors,
+    }
+
+
+def run_client(index, gateway, password, files):
+    """
+    Run one simulated client: connect, upload and submit
+
+    Args:
+        index (int): Client number (used for the user name)
+        gateway (str): Gateway specification ("host:port")
+        password (str): Password
+        files (list): Local files to submit
+
+    Returns:
+        dict: index, ok, error, connect (seconds) and total (seconds)
+    """
+    from .ssh import connect_to_proxy, submit_files
+
+    result = {'index': index, 'ok': False, 'error': None, 'connect': None, 'total': None}
+    started = time.monotonic()
+    try:
+        success, host, ssh, error_type = connect_to_proxy(f"student{index:03d}", password, gateway, notify=False)
+        result['connect'] = time.monotonic() - started
+        if not success:
+            result['error'] = f"connect failed ({error_type})"
+        else:
+            try:
+                ok, output = submit_files(gateway, host, f"student{index:03d}", password, ASSIGNMENT,
+                                          files, TEMP_DIR, ssh_client=ssh)
+            finally:
+                ssh.close()
+            result['ok'] = ok
+            if not ok:
+                result['error'] = output
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['total'] = time.monotonic() - started
+    return result
+
+
+def client_main(argv):
+    """
+    Entry point of a client process
+
+    The password is read from the first line of stdin. The process prints
+    READY_LINE once everything is imported, waits for a line on stdin and then
+    runs the flow, printing its result as JSON.
+    """
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(prog="load-test client")
+    parser.add_argument("--index", type=int, required=True)
+    parser.add_argument("--gateway", required=True)
+    parser.add_argument("--known-hosts", required=True)
+    parser.add_argument("files", nargs="+")
+    args = parser.parse_args(argv)
+
+    # Each client is a separate lab machine with its own state and known hosts
+    home = os.environ["HOME"]
+    os.makedirs(os.path.join(home, ".ssh"), exist_ok=True)
+    with open(args.known_hosts, 'r', encoding='utf-8') as src, \
+            open(os.path.join(home, ".ssh", "known_hosts"), 'w', encoding='utf-8') as dst:
+        dst.write(src.read())
+    logging.basicConfig(level=logging.ERROR)
+
+    password = sys.stdin.readline().rstrip("\n")
+    # Import the SSH stack now so every client starts from the same point
+    from . import ssh  # noqa: F401
+    print(READY_LINE, flush=True)
+    sys.stdin.readline()
+
+    result = run_client(args.index, args.gateway, password, args.files)
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+    return 0
+
+
+def run_level(server, clients, files, work_dir, timeout=LEVEL_TIMEOUT):
+    """
+    Run one concurrency level against a started stub server
+
+    Args:
+        server (StubSSHServer): Running server
+        clients (int): Number of simultaneous clients
+        files (list): Local files every client submits
+        work_dir (str): Directory for the clients' home directories
+        timeout (float): Seconds before unfinished clients are killed
+
+    Returns:
+        tuple: (summary dict, server stats snapshot)
+    """
+    import subprocess
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    known_hosts = os.path.join(work_dir, "known_hosts")
+    with open(known_hosts, 'w', encoding='utf-8') as f:
+        f.write("\n".join(server.known_hosts()) + "\n")
+
+    level_dir = os.path.join(work_dir, f"level-{clients}-{secrets.token_hex(2)}")
+    processes = []
+    for index in range(clients):
+        home = os.path.join(level_dir, f"client-{index:03d}")
+        os.makedirs(home)
+        env = dict(os.environ, HOME=home, USERPROFILE=home)
+        process = subprocess.Popen(
+            [sys.executable, "-m", "src.utils.load_test", "client", "--index", str(index),
+             "--gateway", server.gateway, "--known-hosts", known_hosts] + list(files),
+            cwd=repo_root, env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        process.stdin.write(server.password + "\n")
+        process.stdin.flush()
+        processes.append(process)
+
+    # Start everybody at once, after all of them have loaded the SSH stack
+    for process in processes:
+        process.stdout.readline()
+    server.stats.reset()
+    for process in processes:
+        try:
+            process.stdin.write("go\n")
+            process.stdin.flush()
+        except OSError:
+            pass  # exited early; reported below
+
+    results = []
+    deadline = time.monotonic() + timeout
+    for index, process in enumerate(processes):
+        try:
+            stdout, stderr = process.communicate(timeout=max(0.1, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            results.append({'index': index, 'ok': False, 'error': "timed out", 'connect': None, 'total': None})
+            continue
+        for line in stdout.splitlines():
+            if line.startswith(RESULT_PREFIX):
+                results.append(json.loads(line[len(RESULT_PREFIX):]))
+                break
+        else:
+            last_line = stderr.strip().splitlines()[-1] if stderr.strip() else f"exit code {process.returncode}"
+            results.append({'index': index, 'ok': False, 'error': f"client crashed: {last_line}",
+                            'connect': None, 'total': None})
+
+    return summarize(results), server.stats.snapshot()
+
+
+def make_payload(directory, count, size_kb):
+    """
+    Create the files every client submits
+
+    Returns:
+        list: Paths of the files
+    """
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"file{i + 1}.bin")
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size_kb * 1024))
+        paths.append(path)
+    return paths
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main(argv=None):
+    """
+    Run the load test from the command line
+
+    Args:
+        argv (list): Command line arguments (without the command name)
+
+    Returns:
+        int: Exit code (1 if any client failed)
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "client":
+        return client_main(argv[1:])
+
+    import argparse
+    import logging
+    import tempfile
+
+    from .stub_ssh_server import StubSSHServer
+
+    # Clients disconnecting abruptly is expected; keep the server's transports quiet
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+
+    parser = argparse.ArgumentParser(
+        prog="turnin load-test",
+        description="Ramp up simultaneous simulated clients against a local stand-in server"
+    )
+    parser.add_argument("--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS),
+                        help=f"Numbers of simultaneous clients (default: {' '.join(map(str, DEFAULT_LEVELS))})")
+    parser.add_argument("--files", type=int, default=3, help="Files per submission (default: 3)")
+    parser.add_argument("--file-size", type=int, default=256, help="Size of each file in KiB (default: 256)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Server-side latency of every command (default: 20)")
+    parser.add_argument("--auth-latency-ms", type=float, default=100, help="Server-side latency of every login (default: 100)")
+    parser.add_argument("--turnin-ms", type=float, default=500, help="Extra time turnin takes (default: 500)")
+    parser.add_argument("--timeout", type=float, default=LEVEL_TIMEOUT,
+                        help=f"Seconds per level before clients are killed (default: {LEVEL_TIMEOUT})")
+    args = parser.parse_args(argv)
+
+    exit_code = 0
+    with tempfile.TemporaryDirectory(prefix="turnin-load-") as work_dir, \
+            StubSSHServer(secrets.token_urlsafe(12), command_latency=args.latency_ms / 1000,
+                          auth_latency=args.auth_latency_ms / 1000,
+                          turnin_latency=args.turnin_ms / 1000) as server:
+        files = make_payload(work_dir, args.files, args.file_size)
+        print(f"Stand-in server on {server.gateway}; {args.files} x {args.file_size} KiB per submission")
+        print(f"{'clients':>7} {'ok':>5} {'fail%':>6} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} "
+              f"{'connect p50':>11} {'peak conn':>9} {'peak tunnels':>12} {'peak sftp':>9} {'peak cmds':>9}")
+        for clients in args.levels:
+            summary, stats = run_level(server, clients, files, work_dir, timeout=args.timeout)
+            print(f"{clients:>7} {summary['ok']:>5} {summary['failure_rate'] * 100:>5.1f}% "
+                  f"{format_seconds(summary['p50']):>8} {format_seconds(summary['p95']):>8} "
+                  f"{format_seconds(summary['p99']):>8} {format_seconds(summary['connect_p50']):>11} "
+                  f"{stats['connections']['peak']:>9} {stats['tunnels']['peak']:>12} "
+                  f"{stats['sftp']['peak']:>9} {stats['commands']['peak']:>9}")
+            for error, count in sorted(summary['errors'].items(), key=lambda item: -item[1])[:3]:
+                print(f"{'':>7} {count} x {error}")
+            if summary['failed']:
+                exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Helpers for small JSON state files kept in the user's ~/.turnin directory
+"""
+import json
+import os
+import tempfile
+from os.path import expanduser, join
+
+
+def get_state_dir():
+    """
+    Get the application state directory, creating it if needed
+
+    Returns:
+        str: Path to ~/.turnin
+    """
+    state_dir = join(expanduser("~"), ".turnin")
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
+
+def get_state_path(name):
+    """
+    Get the path of a file inside the application state directory
+
+    Args:
+        name (str): File name
+
+    Returns:
+        str: Full path of the file
+    """
+    return join(get_state_dir(), name)
+
+
+def load_json(path, default=None):
+    """
+    Load a JSON file, returning a default if it is missing or unreadable
+
+    Args:
+        path (str): File to read
+        default: Value returned when the file cannot be loaded
+
+    Returns:
+        The decoded data or the default
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    """
+    Atomically write data to a JSON file
+
+    The data is written to a temporary file in the same directory and then
+    renamed over the target, so readers never see a partially written file.
+
+    Args:
+        path (str): File to write
+        data: JSON serializable data
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,202 @@
+"""
+Logging pipeline: records are queued by the calling thread and written by a background listener
+"""
+import atexit
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from .local_store import get_state_path
+
+LOG_FILE = "turnin.log"
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# The log directory never holds more than about LOG_MAX_BYTES * (LOG_BACKUP_COUNT + 1) bytes
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# Rotate at least this often even if the size limit is not reached
+LOG_ROTATE_INTERVAL = 24 * 60 * 60
+# Records waiting for the listener; further records are dropped instead of blocking
+LOG_QUEUE_SIZE = 10000
+# At most RATE_LIMIT_COUNT records per call site every RATE_LIMIT_PERIOD seconds
+RATE_LIMIT_COUNT = 20
+RATE_LIMIT_PERIOD = 10.0
+
+_listener = None
+
+
+def get_log_path():
+    """Get path to the application log file"""
+    return get_state_path(LOG_FILE)
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotating file handler that rotates on size or age and gzips rotated files
+
+    Rotated files are named turnin.log.1.gz, turnin.log.2.gz, ... with the
+    newest first.
+
+    Args:
+        filename (str): Log file path
+        max_bytes (int): Rotate once the file would grow past this size
+        backup_count (int): Number of compressed files to keep
+        interval (float): Rotate once the file is older than this many seconds
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 interval=LOG_ROTATE_INTERVAL):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.interval = interval
+        self.namer = self._gzip_namer
+        self.rotator = self._gzip_rotator
+        self.rollover_at = self._compute_rollover_at()
+
+    def _compute_rollover_at(self):
+        now = time.time()
+        try:
+            # A log left over from an earlier run is rotated once it is older than the interval
+            last_written = os.stat(self.baseFilename).st_mtime
+            if now - last_written > self.interval:
+                return now
+        except OSError:
+            pass
+        return now + self.interval
+
+    @staticmethod
+    def _gzip_namer(name):
+        return f"{name}.gz"
+
+    @staticmethod
+    def _gzip_rotator(source, dest):
+        if not os.path.exists(source):
+            return
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if time.time() >= self.rollover_at and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drop records from call sites that log too often
+
+    Records are grouped by the line that logged them, so a message logged
+    once per file or per chunk is limited as a whole regardless of its
+    arguments. When a call site is allowed through again, the record notes
+    how many messages were suppressed in between. Warnings and errors are
+    never dropped.
+
+    Args:
+        rate (int): Records allowed per call site and period
+        period (float): Length of the period in seconds
+    """
+
+    def __init__(self, rate=RATE_LIMIT_COUNT, period=RATE_LIMIT_PERIOD):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            started, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.period:
+                started, count = now, 0
+            if count >= self.rate:
+                self._windows[key] = (started, count, suppressed + 1)
+                return False
+            self._windows[key] = (started, count + 1, 0)
+
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records when the queue is full instead of waiting"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging(level=logging.INFO, log_path=None, console=True):
+    """
+    Route all logging through a queue to a rotating log file
+
+    Loggers only format and enqueue records, so logging from the GUI thread
+    never waits for the disk; a QueueListener thread writes them out. Calling
+    this again replaces the previous pipeline.
+
+    Args:
+        level (int): Root logger level
+        log_path (str): Log file (defaults to ~/.turnin/turnin.log)
+        console (bool): Also write records to stderr
+
+    Returns:
+        logging.handlers.QueueListener: The running listener
+    """
+    global _listener
+    stop_logging()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    try:
+        file_handler = CompressingRotatingFileHandler(log_path or get_log_path())
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except OSError as e:
+        # Still log to the console if the log file cannot be opened
+        logging.getLogger(__name__).warning(f"Could not open log file: {e}")
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,306 @@
+"""
+Counters and latency histograms exported as a Prometheus textfile under ~/.turnin/metrics
+
+Lab machines run node-exporter style collectors that pick up *.prom files, so
+the numbers are aggregated across sessions without any service of our own.
+Every process keeps what it recorded since its last write in memory; writing
+adds that to the cumulative totals in state.json (under a file lock, so the
+GUI, the daemon and command line submissions can share the totals) and
+renders turnin.prom from them.
+"""
+import atexit
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from .local_store import get_state_path, load_json, save_json
+from .user_config import get_setting
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes from concurrent processes are not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = "metrics"
+TEXTFILE_NAME = "turnin.prom"
+STATE_FILE = "state.json"
+LOCK_FILE = ".lock"
+# Seconds between writes of the textfile
+WRITE_INTERVAL = 60
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name -> (type, help text)
+METRICS = {
+    'turnin_ssh_connects_total': ('counter', "SSH connections opened, by host and result"),
+    'turnin_ssh_connect_seconds': ('histogram', "TCP connect plus SSH handshake and authentication time"),
+    'turnin_ssh_auth_failures_total': ('counter', "SSH logins rejected by the server"),
+    'turnin_rupt_seconds': ('histogram', "Time for rupt to list the cluster's hosts"),
+    'turnin_upload_bytes_total': ('counter', "Bytes of file content sent over SFTP"),
+    'turnin_upload_put_seconds': ('histogram', "Time to upload one file over SFTP"),
+    'turnin_tunnel_bytes_total': ('counter', "Bytes forwarded through SSH tunnels, by direction"),
+    'turnin_command_seconds': ('histogram', "Time for the turnin command to run on the submission host"),
+}
+
+
+def metrics_enabled():
+    """
+    Check whether metrics are written to ~/.turnin/metrics
+
+    Controlled by "metrics" in ~/.turnin/config.json (default: on).
+    """
+    return get_setting("metrics", True) is not False
+
+
+def get_metrics_dir():
+    """Get the directory holding the textfile and the cumulative totals"""
+    return get_state_path(METRICS_DIR)
+
+
+def format_labels(labels):
+    """
+    Format labels the way they appear in the textfile
+
+    Args:
+        labels (dict): Label name -> value
+
+    Returns:
+        str: e.g. 'host="a",result="ok"', empty without labels
+    """
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def format_value(value):
+    """Format a sample value (integers without a fraction)"""
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def render(state):
+    """
+    Render cumulative totals in the Prometheus text format
+
+    Args:
+        state (dict): {'counters': {name: {labels: value}}, 'histograms': {name: {labels: {...}}}}
+
+    Returns:
+        str: Textfile content
+    """
+    lines = []
+    counters = state.get('counters', {})
+    histograms = state.get('histograms', {})
+    for name, (kind, help_text) in METRICS.items():
+        samples = (counters if kind == 'counter' else histograms).get(name)
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(samples.items()):
+            if kind == 'counter':
+                lines.append(f"{name}{{{labels}}} {format_value(value)}" if labels else f"{name} {format_value(value)}")
+                continue
+            cumulative = 0
+            bounds = [format_value(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            for bound, count in zip(bounds, value['buckets']):
+                cumulative += count
+                bucket_labels = f'{labels},le="{bound}"' if labels else f'le="{bound}"'
+                lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {format_value(round(value['sum'], 6))}")
+            lines.append(f"{name}_count{suffix} {value['count']}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _new_histogram():
+    return {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+
+
+def merge(state, counters, histograms):
+    """
+    Add recorded values to cumulative totals
+
+    Args:
+        state (dict): Totals as loaded from state.json (changed in place)
+        counters (dict): (name, labels) -> amount
+        histograms (dict): (name, labels) -> histogram
+
+    Returns:
+        dict: state
+    """
+    totals = state.setdefault('counters', {})
+    for (name, labels), amount in counters.items():
+        samples = totals.setdefault(name, {})
+        samples[labels] = samples.get(labels, 0) + amount
+
+    totals = state.setdefault('histograms', {})
+    for (name, labels), histogram in histograms.items():
+        samples = totals.setdefault(name, {})
+        total = samples.get(labels)
+        if not isinstance(total, dict) or len(total.get('buckets', ())) != len(histogram['buckets']):
+            total = samples[labels] = _new_histogram()  # missing, or written with other buckets
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], histogram['buckets'])]
+        total['sum'] += histogram['sum']
+        total['count'] += histogram['count']
+    return state
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms recorded by this process, written out periodically
+
+    Recording only updates dictionaries under a lock, so it is cheap enough
+    for the upload loop. Nothing is written until start() is called; the
+    benchmarks and load test record into a registry that is never written.
+
+    Args:
+        directory (str): Where the textfile goes (default: get_metrics_dir(), looked up at every write)
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def inc(self, name, amount=1, **labels):
+        """Add amount to a counter"""
+        key = (name, format_labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record a sample (in seconds) in a histogram"""
+        key = (name, format_labels(labels))
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _new_histogram()
+            histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe how long the block takes, if it completes without an exception"""
+        started = time.monotonic()
+        yield
+        self.observe(name, time.monotonic() - started, **labels)
+
+    def write(self):
+        """
+        Add what was recorded to the totals on disk and render the textfile
+
+        Returns:
+            bool: True if anything was written
+        """
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+        if not counters and not histograms:
+            return False
+
+        directory = self.directory or get_metrics_dir()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                state_path = os.path.join(directory, STATE_FILE)
+                state = load_json(state_path, default={})
+                state = merge(state if isinstance(state, dict) else {}, counters, histograms)
+                save_json(state_path, state)
+                self._write_textfile(directory, render(state))
+            return True
+        except OSError as e:
+            logger.warning(f"Could not write metrics: {e}")
+            self._restore(counters, histograms)
+            return False
+
+    def _restore(self, counters, histograms):
+        """Keep values that could not be written for the next write"""
+        with self._lock:
+            for key, amount in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + amount
+            for key, histogram in histograms.items():
+                current = self._histograms.get(key)
+                if current is None:
+                    self._histograms[key] = histogram
+                    continue
+                current['buckets'] = [a + b for a, b in zip(current['buckets'], histogram['buckets'])]
+                current['sum'] += histogram['sum']
+                current['count'] += histogram['count']
+
+    @staticmethod
+    def _write_textfile(directory, text):
+        """Replace the textfile atomically, so a collector never reads half of it"""
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, os.path.join(directory, TEXTFILE_NAME))
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def start(self, interval=WRITE_INTERVAL):
+        """Write every interval seconds from a background thread, and once more at exit"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="metrics", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background thread and write what is left"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.write()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.write()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Get the registry shared by everything in this process"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
+
+
+def start_metrics_writer(interval=WRITE_INTERVAL):
+    """
+    Start writing this process's metrics, unless disabled in the settings
+
+    Returns:
+        bool: True if the writer runs
+    """
+    if not metrics_enabled():
+        return False
+    get_metrics().start(interval)
+    return True
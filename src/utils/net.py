@@ -0,0 +1,264 @@
+"""
+Network helpers: Happy Eyeballs connection racing with a persistent address cache
+"""
+import logging
+import queue
+import socket
+import threading
+import time
+
+from .local_store import get_state_path, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+DNS_CACHE_FILE = "dns_cache.json"
+# How long a winning address is reused before the host name is resolved again
+DNS_CACHE_TTL = 6 * 60 * 60
+# Delay before starting the next connection attempt (RFC 8305 recommends 250 ms)
+CONNECTION_ATTEMPT_DELAY = 0.25
+# A cached address gets this long on its own before falling back to a full race
+CACHED_ATTEMPT_TIMEOUT = 3.0
+
+_cache_lock = threading.Lock()
+
+
+def get_dns_cache_path():
+    """Get path to the DNS cache file"""
+    return get_state_path(DNS_CACHE_FILE)
+
+
+def split_host_port(spec, default_port=22):
+    """
+    Split a "host", "host:port" or "[ipv6]:port" specification
+
+    Args:
+        spec (str): Host specification
+        default_port (int): Port used when the specification has none
+
+    Returns:
+        tuple: (host, port)
+    """
+    if spec.startswith('['):
+        host, _, rest = spec[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else ''
+    elif spec.count(':') == 1:
+        host, port = spec.split(':')
+    else:
+        # A plain name, or a bare IPv6 address
+        return spec, default_port
+    return host, int(port) if port.isdigit() else default_port
+
+
+def _cache_key(host, port):
+    return f"{host}:{port}"
+
+
+def load_cached_address(host, port):
+    """
+    Get the last address that won a connection race to host, if still fresh
+
+    Args:
+        host (str): Host name
+        port (int): Port number
+
+    Returns:
+        tuple or None: (family, sockaddr) or None if missing or expired
+    """
+    with _cache_lock:
+        cache = load_json(get_dns_cache_path(), default={})
+    entry = cache.get(_cache_key(host, port)) if isinstance(cache, dict) else None
+    if not entry or entry.get('expires', 0) < time.time():
+        return None
+    try:
+        return entry['family'], tuple(entry['sockaddr'])
+    except (KeyError, TypeError):
+        return None
+
+
+def store_cached_address(host, port, family, sockaddr, ttl=DNS_CACHE_TTL):
+    """
+    Remember the address that won a connection race to host
+
+    Args:
+        host (str): Host name
+        port (int): Port number
+        family (int): Address family of the winning address
+        sockaddr (tuple): Winning socket address
+        ttl (float): Seconds the entry stays valid
+    """
+    with _cache_lock:
+        path = get_dns_cache_path()
+        cache = load_json(path, default={})
+        if not isinstance(cache, dict):
+            cache = {}
+        if sockaddr is None:
+            cache.pop(_cache_key(host, port), None)
+        else:
+            cache[_cache_key(host, port)] = {
+                'family': int(family),
+                'sockaddr': list(sockaddr),
+                'expires': time.time() + ttl,
+            }
+        try:
+            save_json(path, cache)
+        except OSError as e:
+            logger.warning(f"Could not write DNS cache: {e}")
+
+
+def forget_cached_address(host, port):
+    """Drop the cached address for host"""
+    store_cached_address(host, port, None, None)
+
+
+def interleave_families(addresses):
+    """
+    Order addresses by alternating families, starting with IPv6 (RFC 8305 section 4)
+
+    Args:
+        addresses (list): (family, sockaddr) tuples in resolver order
+
+    Returns:
+        list: The same addresses with families interleaved
+    """
+    ipv6 = [addr for addr in addresses if addr[0] == socket.AF_INET6]
+    others = [addr for addr in addresses if addr[0] != socket.AF_INET6]
+    ordered = []
+    for i in range(max(len(ipv6), len(others))):
+        if i < len(ipv6):
+            ordered.append(ipv6[i])
+        if i < len(others):
+            ordered.append(others[i])
+    return ordered
+
+
+def resolve(host, port):
+    """
+    Resolve host to a list of addresses to try
+
+    Args:
+        host (str): Host name
+        port (int): Port number
+
+    Returns:
+        list: (family, sockaddr) tuples, de-duplicated and interleaved by family
+    """
+    addresses = []
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        if (family, sockaddr) not in addresses:
+            addresses.append((family, sockaddr))
+    return interleave_families(addresses)
+
+
+def race_connect(addresses, timeout, attempt_delay=CONNECTION_ATTEMPT_DELAY):
+    """
+    Connect to the first address that answers, starting attempts in a staggered race
+
+    A new attempt starts every attempt_delay seconds, or right away when the
+    previous attempt fails. The first successful connection wins and every other
+    attempt is closed.
+
+    Args:
+        addresses (list): (family, sockaddr) tuples to try in order
+        timeout (float): Overall time limit in seconds
+        attempt_delay (float): Head start given to each attempt
+
+    Returns:
+        tuple: (socket, (family, sockaddr)) of the winning connection
+
+    Raises:
+        OSError: If every attempt failed or the time limit was reached
+    """
+    if not addresses:
+        raise OSError("No addresses to connect to")
+
+    deadline = time.monotonic() + timeout
+    results = queue.Queue()
+    lock = threading.Lock()
+    state = {'winner': None}
+
+    def attempt(address):
+        family, sockaddr = address
+        sock = None
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(max(deadline - time.monotonic(), 0.01))
+            sock.connect(sockaddr)
+        except OSError as e:
+            if sock:
+                sock.close()
+            results.put((False, e, address))
+            return
+        with lock:
+            if state['winner'] is not None:
+                # Lost the race, nobody needs this connection
+                sock.close()
+                return
+            state['winner'] = address
+        results.put((True, sock, address))
+
+    pending = list(addresses)
+    running = 0
+    last_error = None
+
+    while True:
+        if pending:
+            threading.Thread(target=attempt, args=(pending.pop(0),), daemon=True).start()
+            running += 1
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        wait = min(attempt_delay, remaining) if pending else remaining
+
+        # Wait for this attempt's head start, moving on early if something fails
+        try:
+            ok, value, address = results.get(timeout=wait)
+        except queue.Empty:
+            continue
+        if ok:
+            value.settimeout(None)
+            return value, address
+
+        running -= 1
+        last_error = value
+        if not pending and running == 0:
+            break
+
+    with lock:
+        # Make late successes close themselves
+        if state['winner'] is None:
+            state['winner'] = ()
+    if last_error and not pending and running == 0:
+        raise last_error
+    raise socket.timeout(f"Connection timed out after {timeout} seconds")
+
+
+def open_connection(host, port=22, timeout=15):
+    """
+    Open a TCP connection to host, racing IPv6 and IPv4 in the Happy Eyeballs style
+
+    The address that wins is cached with a TTL, so later connections (including
+    later launches) try it directly without waiting for DNS. If the cached
+    address does not answer quickly it is dropped and a full race is run.
+
+    Args:
+        host (str): Host name
+        port (int): Port number
+        timeout (float): Overall time limit in seconds
+
+    Returns:
+        socket.socket: Connected socket
+    """
+    cached = load_cached_address(host, port)
+    if cached:
+        try:
+            sock, _ = race_connect([cached], min(timeout, CACHED_ATTEMPT_TIMEOUT))
+            return sock
+        except OSError as e:
+            logger.info(f"Cached address for {host} failed ({e}), resolving again")
+            forget_cached_address(host, port)
+
+    addresses = resolve(host, port)
+    sock, (family, sockaddr) = race_connect(addresses, timeout)
+    store_cached_address(host, port, family, sockaddr)
+    return sock
@@ -0,0 +1,240 @@
+"""
+Watch mode: keep a remote staging directory up to date while the student works
+"""
+import logging
+import os
+import posixpath
+import threading
+
+from .cancellation import CancellationToken, cancellable
+from .file_watcher import FileWatcher, fingerprint, DEBOUNCE
+from .integrity import upload_and_hash, verify_staged_files
+from .staging import WATCH_PREFIX, create_staging_dir, collect_staging_dirs
+
+logger = logging.getLogger(__name__)
+
+
+class PreStager:
+    """
+    Uploads the watched files to a staging directory of their own as they change
+
+    A FileWatcher reports changed files in debounced batches, and each batch
+    is uploaded and verified over a connection from connect(). Every file is
+    written under a temporary name and renamed into place, so the directory
+    only ever holds complete files. A file is staged when the content of its
+    remote copy was verified and the local file has not changed since;
+    stage() uploads whatever is not, so a submission only has to run turnin.
+
+    Args:
+        connect (callable): Returns a pooled gateway connection (closed after use), or None when offline
+        temp_dir (str): Remote directory (relative to home) holding staging directories
+        debounce (float): Quiet period before a batch of changes is uploaded
+        use_inotify (bool): Passed on to the FileWatcher
+    """
+
+    def __init__(self, connect, temp_dir, debounce=DEBOUNCE, use_inotify=True):
+        self.connect = connect
+        self.temp_dir = temp_dir
+        # Held while the directory is written, so a submission never reads a batch half done
+        self._lock = threading.RLock()
+        self._remote_dir = None
+        self._staged = {}  # remote name -> (local path, fingerprint)
+        self._listeners = []
+        self.watcher = FileWatcher(self._upload_batch, debounce=debounce, use_inotify=use_inotify)
+
+    @property
+    def remote_dir(self):
+        """The staging directory, or None before the first upload"""
+        return self._remote_dir
+
+    def add_listener(self, callback):
+        """
+        Register a callback called with (staged files, watched files) after every batch
+
+        Callbacks run on the watcher thread.
+        """
+        self._listeners.append(callback)
+
+    def start(self, paths):
+        """Start watching paths; their current content is uploaded in the first batch"""
+        self.watcher.set_paths(paths)
+        self.watcher.start()
+
+    def set_files(self, paths):
+        """Change the watched files"""
+        self.watcher.set_paths(paths)
+
+    def stop(self, remove=True):
+        """
+        Stop watching
+
+        Args:
+            remove (bool): Delete the staging directory in the background
+        """
+        self.watcher.stop()
+        with self._lock:
+            remote_dir = self._remote_dir
+            self._remote_dir = None
+            self._staged = {}
+        if remove and remote_dir:
+            threading.Thread(target=self._remove, args=(remote_dir,), name="prestage-cleanup", daemon=True).start()
+
+    def _remove(self, remote_dir):
+        ssh = self.connect()
+        if not ssh:
+            return  # the collector removes it once it is old enough
+        try:
+            collect_staging_dirs(ssh, posixpath.dirname(remote_dir.rstrip('/')), remote_dir)
+        finally:
+            ssh.close()
+
+    def is_staged(self, path):
+        """True if the remote copy of path matches the file as it is now"""
+        with self._lock:
+            entry = self._staged.get(os.path.basename(path))
+        return bool(entry) and entry[0] == os.path.abspath(path) and entry[1] == fingerprint(path)
+
+    def status(self):
+        """
+        Get the progress of watch mode
+
+        Returns:
+            tuple: (staged files, watched files)
+        """
+        paths = self.watcher.paths()
+        return sum(1 for path in paths if self.is_staged(path)), len(paths)
+
+    def _upload_batch(self, paths):
+        """Upload one batch of changed files (called on the watcher thread)"""
+        try:
+            ssh = self.connect()
+        except Exception as e:
+            ssh = None
+            logger.info(f"Watch mode offline: {e}")
+        if not ssh:
+            # Nothing is lost: stage() uploads whatever is not staged at submission time
+            return
+        try:
+            self.sync(ssh, paths)
+        except Exception as e:
+            logger.warning(f"Watch mode upload failed: {e}")
+        finally:
+            ssh.close()
+        staged, total = self.status()
+        for listener in list(self._listeners):
+            try:
+                listener(staged, total)
+            except Exception as e:
+                logger.error(f"Watch mode listener failed: {e}")
+
+    def sync(self, ssh, paths, progress_callback=None, cancel_token=None, preflight=None, rate_limiter=None):
+        """
+        Upload the files whose remote copy is missing or out of date, then verify them
+
+        Args:
+            ssh (Lease): Gateway connection
+            paths (iterable): Local files
+            progress_callback (callable): progress_callback(percent, message), from 20 to 75
+            cancel_token (CancellationToken): Closes the SFTP channel when cancelled
+            preflight (callable): Called once the directory exists, before anything is uploaded
+            rate_limiter (TokenBucket): Bandwidth limit (default: the global upload limit)
+
+        Returns:
+            str: The staging directory, with a trailing slash
+
+        Raises:
+            CancelledError: If cancel_token is cancelled
+        """
+        cancel_token = cancel_token or CancellationToken()
+        with self._lock:
+            sftp = ssh.open_sftp()
+            unregister_cancel = cancel_token.on_cancel(sftp.close)
+            try:
+                with cancellable(cancel_token):
+                    remote_dir = self._ensure_dir(ssh, sftp)
+                    if preflight:
+                        preflight()
+                    self._upload(ssh, sftp, remote_dir, paths, progress_callback, cancel_token, rate_limiter)
+                return remote_dir
+            finally:
+                unregister_cancel()
+                try:
+                    sftp.close()
+                except Exception:
+                    pass
+
+    def stage(self, ssh, files, progress_callback=None, cancel_token=None, preflight=None, rate_limiter=None):
+        """
+        Make sure every file is staged, for a submission
+
+        Args:
+            ssh (Lease): Gateway connection
+            files (list): Local files being submitted
+            progress_callback, cancel_token, preflight, rate_limiter: As for sync()
+
+        Returns:
+            tuple: (staging directory, file names in it), with an empty list if a file could not be staged
+        """
+        with self._lock:
+            remote_dir = self.sync(ssh, files, progress_callback, cancel_token, preflight, rate_limiter)
+            if not all(self.is_staged(path) for path in files):
+                return remote_dir, []
+            return remote_dir, [os.path.basename(path) for path in files]
+
+    def _ensure_dir(self, ssh, sftp):
+        """Get the staging directory, creating it if it does not exist (anymore)"""
+        if self._remote_dir:
+            try:
+                sftp.stat(self._remote_dir)
+                return self._remote_dir
+            except IOError:
+                logger.info(f"Watch mode staging directory {self._remote_dir} is gone, starting over")
+                self._remote_dir = None
+                self._staged = {}
+
+        _, stdout, _ = ssh.exec_command("pwd")
+        home_dir = stdout.readlines()[0].strip()
+        self._remote_dir = create_staging_dir(sftp, f"{home_dir}/{self.temp_dir}", prefix=WATCH_PREFIX)
+        return self._remote_dir
+
+    def _upload(self, ssh, sftp, remote_dir, paths, progress_callback, cancel_token, rate_limiter=None):
+        pending = [os.path.abspath(path) for path in paths if not self.is_staged(path)]
+        local_paths = {}
+        local_hashes = {}
+        fingerprints = {}
+        for idx, path in enumerate(pending):
+            cancel_token.raise_if_cancelled()
+            name = os.path.basename(path)
+            before = fingerprint(path)
+            if before is None:
+                continue
+            if progress_callback:
+                try:
+                    progress_callback(20 + idx * 55 / len(pending), f"Uploading changed file {idx + 1}/{len(pending)}: {name}")
+                except Exception:
+                    pass
+            # The remote copy is about to be replaced
+            self._staged.pop(name, None)
+            partial = f"{remote_dir}.{name}.part"
+            digest = upload_and_hash(sftp, path, partial, cancel_token=cancel_token, rate_limiter=rate_limiter)
+            sftp.posix_rename(partial, f"{remote_dir}{name}")
+            if fingerprint(path) != before:
+                # Saved again while uploading; the watcher reports it in the next batch
+                continue
+            local_paths[name] = path
+            local_hashes[name] = digest
+            fingerprints[name] = before
+
+        if not local_hashes:
+            return
+        if progress_callback:
+            try:
+                progress_callback(75, "Verifying uploaded files...")
+            except Exception:
+                pass
+        mismatched = verify_staged_files(ssh, sftp, remote_dir, local_paths, local_hashes,
+                                         cancel_token=cancel_token, rate_limiter=rate_limiter)
+        for name in local_hashes:
+            if name not in mismatched:
+                self._staged[name] = (local_paths[name], fingerprints[name])
+        logger.info(f"Watch mode staged {len(local_hashes) - len(mismatched)} file(s) in {remote_dir}")
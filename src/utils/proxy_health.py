@@ -0,0 +1,128 @@
+"""
+Health tracking and ranking for the SSH gateway (proxy) hosts
+"""
+import logging
+import threading
+import time
+
+from .local_store import get_state_path, load_json, save_json
+from .user_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+HEALTH_FILE = "proxy_health.json"
+
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.3
+# Success rate assumed for hosts without history: below a healthy host, above a failing one
+UNKNOWN_SUCCESS_RATE = 0.9
+# Connect latency above this many seconds does not lower the score any further
+LATENCY_CAP = 10.0
+# How much a slow connect can lower the score (a fully failing host loses 1.0)
+LATENCY_WEIGHT = 0.5
+
+
+def get_health_path():
+    """Get path to the gateway health file"""
+    return get_state_path(HEALTH_FILE)
+
+
+def get_proxy_hosts():
+    """
+    Get the ordered list of gateway hosts
+
+    The list comes from "proxy_hosts" in ~/.turnin/config.json when present,
+    otherwise from PROXY_HOSTS in config.py.
+
+    Returns:
+        list: Gateway host names in preference order
+    """
+    try:
+        from config import PROXY_HOSTS
+        default_hosts = list(PROXY_HOSTS)
+    except ImportError:
+        default_hosts = []
+
+    hosts = get_setting("proxy_hosts")
+    if isinstance(hosts, list) and hosts and all(isinstance(host, str) for host in hosts):
+        return hosts
+    return default_hosts
+
+
+class ProxyHealth:
+    """
+    Persisted health score for every gateway, built from recent success rate and connect latency
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_health_path()
+        self._lock = threading.Lock()
+        data = load_json(self.path, default={})
+        self._health = data if isinstance(data, dict) else {}
+
+    def record(self, host, success, latency=None):
+        """
+        Record the outcome of a connection attempt
+
+        Args:
+            host (str): Gateway host
+            success (bool): Whether the connection succeeded
+            latency (float): Seconds the connection took (successful attempts only)
+        """
+        with self._lock:
+            entry = self._health.setdefault(host, {'success_rate': UNKNOWN_SUCCESS_RATE, 'latency': None})
+            entry['success_rate'] = (1 - EWMA_ALPHA) * entry['success_rate'] + EWMA_ALPHA * (1.0 if success else 0.0)
+            if success and latency is not None:
+                if entry['latency'] is None:
+                    entry['latency'] = latency
+                else:
+                    entry['latency'] = (1 - EWMA_ALPHA) * entry['latency'] + EWMA_ALPHA * latency
+            entry['updated'] = time.time()
+            try:
+                save_json(self.path, self._health)
+            except OSError as e:
+                logger.warning(f"Could not write gateway health: {e}")
+
+    def score(self, host):
+        """
+        Get the health score of a gateway (higher is better)
+
+        Returns:
+            float: Success rate minus a penalty for slow connects
+        """
+        with self._lock:
+            entry = self._health.get(host)
+        if not entry:
+            return UNKNOWN_SUCCESS_RATE
+
+        penalty = 0.0
+        if entry.get('latency') is not None:
+            penalty = LATENCY_WEIGHT * min(entry['latency'], LATENCY_CAP) / LATENCY_CAP
+        return entry['success_rate'] - penalty
+
+    def rank(self, hosts):
+        """
+        Order gateways by health, keeping the configured order for ties
+
+        Args:
+            hosts (list): Gateway hosts in configured order
+
+        Returns:
+            list: The hosts, healthiest first
+        """
+        indexed = list(enumerate(hosts))
+        indexed.sort(key=lambda item: (-round(self.score(item[1]), 6), item[0]))
+        return [host for _, host in indexed]
+
+
+_health = None
+_health_lock = threading.Lock()
+
+
+def get_proxy_health():
+    """Get the shared ProxyHealth instance, loading it on first use"""
+    global _health
+    with _health_lock:
+        if _health is None or _health.path != get_health_path():
+            _health = ProxyHealth()
+        return _health
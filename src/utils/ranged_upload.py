@@ -0,0 +1,233 @@
+"""
+Parallel ranged upload of a single large file over several SFTP sessions
+
+One SFTP stream sends a file in order over one channel, so its throughput is
+capped at roughly the channel window per round trip; on a high-latency link
+that is a fraction of the bandwidth available. Large files are therefore split
+into ranges written concurrently, each through an SFTP session (channel) of
+its own on the same SSH transport, at its offset in a temporary file that is
+renamed into place once every range is written. The extra sessions come out
+of the connection pool's per-transport session budget.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+
+import paramiko
+
+from .cancellation import CancellationToken, cancellable
+from .connection_pool import get_connection_pool
+from .metrics import get_metrics
+from .rate_limit import get_upload_limiter
+from .upload_source import UploadSource, CHUNK_SIZE
+from .user_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Files at least this large are uploaded in parallel ranges
+RANGED_UPLOAD_THRESHOLD = 64 * 1024 * 1024
+# Smallest range worth a session of its own
+MIN_RANGE_SIZE = 16 * 1024 * 1024
+# Ranges are aligned to this, so no SFTP write straddles two ranges' chunks
+RANGE_ALIGNMENT = 1024 * 1024
+# Sessions used when "parallel_upload_streams" is not set, and the most allowed
+DEFAULT_STREAMS = 4
+MAX_STREAMS = 16
+
+
+def get_stream_count():
+    """
+    Get the number of concurrent SFTP sessions for a large file
+
+    Controlled by "parallel_upload_streams" in ~/.turnin/config.json; 1 turns
+    ranged uploads off.
+
+    Returns:
+        int: Number of sessions, between 1 and MAX_STREAMS
+    """
+    streams = get_setting("parallel_upload_streams", DEFAULT_STREAMS)
+    if not isinstance(streams, int) or isinstance(streams, bool) or streams < 1:
+        return 1
+    return min(streams, MAX_STREAMS)
+
+
+def split_ranges(size, streams, min_range=None):
+    """
+    Split a file into contiguous ranges of about equal size
+
+    Args:
+        size (int): File size in bytes
+        streams (int): Most ranges wanted
+        min_range (int): Smallest range, small files get fewer ranges (default: MIN_RANGE_SIZE)
+
+    Returns:
+        list: (start, end) offsets covering the whole file
+    """
+    if size <= 0:
+        return [(0, 0)]
+    count = max(1, min(streams, size // max(min_range or MIN_RANGE_SIZE, 1)))
+    # Aligned starts; the last range also takes the remainder
+    step = max(size // count // RANGE_ALIGNMENT * RANGE_ALIGNMENT, RANGE_ALIGNMENT)
+    count = max(1, min(count, size // step))
+    starts = [index * step for index in range(count)]
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def use_ranged_upload(local_path, streams=None):
+    """True if local_path is large enough to be split over several sessions"""
+    try:
+        size = os.path.getsize(local_path)
+    except OSError:
+        return False
+    return size >= RANGED_UPLOAD_THRESHOLD and len(split_ranges(size, streams or get_stream_count())) > 1
+
+
+def upload_ranges_and_hash(sftp, local_path, remote_path, streams=None, chunk_size=CHUNK_SIZE, cancel_token=None,
+                           rate_limiter=None):
+    """
+    Upload a file in parallel ranges and compute its SHA-256
+
+    The first range goes through sftp, the others through extra SFTP sessions
+    on the same transport, as many as the connection pool's session budget
+    allows (see ConnectionPool.reserve_sessions). The ranges go into a
+    temporary file next to remote_path, with pipelined writes on every
+    session, and the file is renamed to remote_path once all of them are
+    written, so remote_path never holds a partial file. The hash is computed
+    alongside in a separate sequential read; the remote hash check that
+    follows every upload catches a file changed while it was sent.
+
+    Args:
+        sftp (paramiko.SFTPClient): Open SFTP session; its transport carries the extra sessions
+        local_path (str): Local file to upload
+        remote_path (str): Destination path on the server
+        streams (int): Concurrent sessions wanted (default: get_stream_count())
+        chunk_size (int): Bytes read per iteration
+        cancel_token (CancellationToken): Closes every session when cancelled
+        rate_limiter (TokenBucket): Bandwidth limit shared by all ranges (default: the global upload limit)
+
+    Returns:
+        str or None: Hex SHA-256 digest of the file, or None if no extra session could be
+            opened; nothing was written then and the caller uploads the file sequentially
+
+    Raises:
+        CancelledError: If cancel_token is cancelled during the upload
+    """
+    rate_limiter = rate_limiter or get_upload_limiter()
+    transport = sftp.get_channel().get_transport()
+    size = os.path.getsize(local_path)
+    pool = get_connection_pool()
+    reserved = pool.reserve_sessions(transport, len(split_ranges(size, streams or get_stream_count())) - 1)
+    try:
+        try:
+            sessions = _open_sessions(transport, reserved)
+        except paramiko.SSHException as e:
+            logger.info(f"Could not open SFTP sessions for {local_path}, uploading it in one stream: {e}")
+            return None
+        try:
+            ranges = split_ranges(size, 1 + len(sessions))
+            if len(ranges) < 2:
+                return None
+            return _upload_ranges(sftp, sessions, ranges, local_path, remote_path, chunk_size, cancel_token,
+                                  rate_limiter)
+        finally:
+            for session in sessions:
+                try:
+                    session.close()
+                except Exception:
+                    pass
+    finally:
+        pool.release_sessions(transport, reserved)
+
+
+def _open_sessions(transport, count):
+    """Open count extra SFTP sessions, closing the ones already open if one fails"""
+    sessions = []
+    try:
+        for _ in range(count):
+            session = paramiko.SFTPClient.from_transport(transport)
+            if session is None:
+                raise paramiko.SSHException("Could not open an SFTP session for a range")
+            sessions.append(session)
+    except BaseException:
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+        raise
+    return sessions
+
+
+def _upload_ranges(sftp, sessions, ranges, local_path, remote_path, chunk_size, cancel_token, rate_limiter):
+    """Write every range through a session of its own and rename the result into place"""
+    partial = posixpath.join(posixpath.dirname(remote_path),
+                             f".{posixpath.basename(remote_path)}.{secrets.token_hex(4)}.part")
+    # Stops the other ranges as soon as one fails, or when the caller cancels
+    token = CancellationToken()
+    unregister_cancel = cancel_token.on_cancel(token.cancel) if cancel_token else (lambda: None)
+    # Closing the extra sessions makes their writes in progress fail right away
+    unregister_close = [token.on_cancel(session.close) for session in sessions]
+    started = time.monotonic()
+
+    try:
+        # Create the file once; every range then opens it without truncating
+        sftp.open(partial, 'wb').close()
+        with ThreadPoolExecutor(max_workers=len(ranges) + 1, thread_name_prefix="ranged-upload") as executor:
+            hashing = executor.submit(_hash_file, local_path, chunk_size, token)
+            futures = [hashing] + [executor.submit(_write_range, session, partial, local_path, start, end,
+                                                   chunk_size, token, rate_limiter)
+                                   for session, (start, end) in zip([sftp] + sessions, ranges)]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = next((future for future in done if future.exception()), None)
+            if failed:
+                # Raise the error that stopped the upload, not the ones caused by stopping the others
+                token.cancel()
+                failed.result()
+            digest = hashing.result()
+        sftp.posix_rename(partial, remote_path)
+    except BaseException:
+        try:
+            sftp.remove(partial)
+        except Exception:
+            pass
+        raise
+    finally:
+        unregister_cancel()
+        for unregister in unregister_close:
+            unregister()
+
+    get_metrics().observe('turnin_upload_put_seconds', time.monotonic() - started)
+    logger.debug(f"Uploaded {local_path} in {len(ranges)} parallel range(s)")
+    return digest
+
+
+def _hash_file(local_path, chunk_size, token):
+    """SHA-256 of a local file, read sequentially"""
+    digest = hashlib.sha256()
+    with UploadSource(local_path) as source:
+        for chunk in source.chunks(chunk_size):
+            token.raise_if_cancelled()
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_range(session, partial, local_path, start, end, chunk_size, token, rate_limiter):
+    """Write one range of the file at its offset through an SFTP session"""
+    sent = 0
+    try:
+        with cancellable(token):
+            with UploadSource(local_path) as source, session.open(partial, 'r+b', bufsize=0) as remote_file:
+                remote_file.seek(start)
+                # Pipelining sends write requests without waiting for each acknowledgement
+                remote_file.set_pipelined(True)
+                for chunk in source.chunks(rate_limiter.chunk_size(chunk_size), start, end):
+                    token.raise_if_cancelled()
+                    rate_limiter.consume(len(chunk), token)
+                    remote_file.write(chunk)
+                    sent += len(chunk)
+    finally:
+        get_metrics().inc('turnin_upload_bytes_total', sent)
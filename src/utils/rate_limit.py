@@ -0,0 +1,155 @@
+"""
+Token bucket bandwidth limiter for uploads, so one large submission does not saturate a shared uplink
+"""
+import logging
+import threading
+import time
+
+from .user_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Smallest burst allowance, so a low limit still moves data in reasonably sized writes
+MIN_BURST = 32 * 1024
+# Longest single sleep, so rate changes and cancellation take effect quickly
+MAX_SLEEP = 0.1
+
+
+def get_configured_rate():
+    """
+    Get the upload limit that applies to all submissions
+
+    The limit comes from "upload_rate_limit" (KiB/s) in ~/.turnin/config.json
+    when present, otherwise from UPLOAD_RATE_LIMIT in config.py. 0 means unlimited.
+
+    Returns:
+        int or None: Bytes per second, or None for no limit
+    """
+    try:
+        from config import UPLOAD_RATE_LIMIT
+        default_limit = UPLOAD_RATE_LIMIT
+    except ImportError:
+        default_limit = 0
+
+    limit = get_setting("upload_rate_limit", default_limit)
+    if not isinstance(limit, (int, float)) or isinstance(limit, bool) or limit <= 0:
+        return None
+    return int(limit * 1024)
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the average rate of a byte stream, with a burst allowance
+
+    Tokens (bytes) accumulate at rate per second up to burst. consume() takes
+    the tokens it needs right away, going into debt if there are not enough,
+    and then sleeps until the debt is repaid; concurrent callers therefore
+    queue up behind each other and share the rate. The rate can be changed at
+    any time, also while callers are waiting. A bucket may have a parent
+    (e.g. the global limit above a per-submission one), which is consumed too.
+
+    Args:
+        rate (float): Bytes per second, or None/0 for no limit
+        burst (int): Largest number of bytes sent without waiting (default: one second's worth)
+        parent (TokenBucket): Bucket that also has to allow the bytes
+    """
+
+    def __init__(self, rate=None, burst=None, parent=None):
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._rate = None
+        self._burst = MIN_BURST
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    @property
+    def rate(self):
+        """Bytes per second, or None if unlimited"""
+        return self._rate
+
+    @property
+    def burst(self):
+        """Burst allowance in bytes"""
+        return self._burst
+
+    def set_rate(self, rate, burst=None):
+        """
+        Change the limit, taking effect for callers already waiting
+
+        Args:
+            rate (float): Bytes per second, or None/0 for no limit
+            burst (int): Burst allowance (default: one second's worth)
+        """
+        with self._lock:
+            self._refill()
+            self._rate = float(rate) if rate and rate > 0 else None
+            self._burst = int(max(burst or self._rate or 0, MIN_BURST))
+            if self._rate is None:
+                self._tokens = 0.0
+            else:
+                self._tokens = min(self._tokens, self._burst)
+        logger.debug(f"Upload rate limit {f'{self._rate / 1024:.0f} KiB/s' if self._rate else 'off'}")
+
+    def _refill(self):
+        """Add the tokens accumulated since the last update; the caller holds the lock"""
+        now = time.monotonic()
+        if self._rate:
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def consume(self, amount, cancel_token=None):
+        """
+        Wait until amount bytes may be sent
+
+        Args:
+            amount (int): Bytes about to be sent
+            cancel_token (CancellationToken): Interrupts the wait
+
+        Raises:
+            CancelledError: If cancel_token is cancelled while waiting
+        """
+        if amount > 0:
+            with self._lock:
+                self._refill()
+                if self._rate:
+                    self._tokens -= amount
+
+            while True:
+                with self._lock:
+                    self._refill()
+                    if not self._rate or self._tokens >= 0:
+                        break
+                    delay = min(-self._tokens / self._rate, MAX_SLEEP)
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                    cancel_token.wait(delay)
+                else:
+                    time.sleep(delay)
+
+        if self.parent:
+            self.parent.consume(amount, cancel_token)
+
+    def chunk_size(self, default):
+        """Largest write that keeps the stream smooth at the current limit"""
+        size = default
+        bucket = self
+        while bucket:
+            if bucket.rate:
+                size = min(size, bucket.burst)
+            bucket = bucket.parent
+        return size
+
+
+_upload_limiter = None
+_upload_limiter_lock = threading.Lock()
+
+
+def get_upload_limiter():
+    """Get the limiter shared by every upload in this process, configured on first use"""
+    global _upload_limiter
+    with _upload_limiter_lock:
+        if _upload_limiter is None:
+            _upload_limiter = TokenBucket(get_configured_rate())
+        return _upload_limiter
+
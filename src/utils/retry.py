@@ -0,0 +1,71 @@
+"""
+Retry policy with capped exponential backoff and jitter
+"""
+import random
+
+
+class RetryPolicy:
+    """
+    Decides how often and how long to wait before retrying a failed operation
+
+    Delays use "full jitter": a random value between zero and the capped
+    exponential delay, so many clients failing at the same moment do not all
+    retry at the same moment too.
+
+    Args:
+        max_attempts (int): Total number of attempts, including the first one
+        base_delay (float): Delay cap before the first retry, in seconds
+        max_delay (float): Upper limit for any delay, in seconds
+        retry_on (tuple): Error types that are worth retrying
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=8.0, retry_on=('timeout',)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = tuple(retry_on)
+
+    def should_retry(self, attempt, error_type):
+        """
+        Check whether another attempt should be made
+
+        Args:
+            attempt (int): Number of attempts made so far (1 after the first failure)
+            error_type (str): Type of the last error
+
+        Returns:
+            bool: True if the operation should be retried
+        """
+        return attempt < self.max_attempts and self.is_transient(error_type)
+
+    def is_transient(self, error_type):
+        """
+        Check whether an error type is worth retrying at all
+
+        Args:
+            error_type (str): Type of the error
+
+        Returns:
+            bool: True if a later attempt may succeed
+        """
+        return error_type in self.retry_on
+
+    def delay(self, attempt):
+        """
+        Get the delay before the next attempt
+
+        Args:
+            attempt (int): Number of attempts made so far
+
+        Returns:
+            float: Seconds to wait
+        """
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+# Used for interactive connections: transient network failures are retried, auth failures are not
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# A single attempt, for callers that already retry on their own schedule
+NO_RETRY = RetryPolicy(max_attempts=1)
@@ -1,13 +1,36 @@
 """
 SSH utilities for handling connections and file transfers
 """
+import logging
 import os
 import socket
 import paramiko
-import threading
-import select
 import hashlib
 import base64
+import posixpath
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .blob_cache import (
+    blob_cache_enabled, get_blob_dir, get_blob_cache_limit, get_local_hash_cache, list_blobs, find_cached_blobs,
+    blobs_to_evict, remove_blobs, upload_blob, link_blobs
+)
+from .assignment_catalog import (
+    ASSIGNMENT_CHECK_TIMEOUT, UnknownAssignmentError, assignment_check_enforced, get_assignment_catalog,
+    unknown_assignment_message
+)
+from .cancellation import CancellationToken, CancelledError, cancellable
+from .connection_pool import get_connection_pool
+from .file_watcher import fingerprint
+from .host_cache import get_host_cache, start_host_check
+from .integrity import upload_and_hash, verify_staged_files
+from .latency import record_latency, record_timeout, timeout_for
+from .metrics import get_metrics
+from .net import open_connection, split_host_port
+from .proxy_health import get_proxy_health
+from .retry import DEFAULT_RETRY_POLICY
+from .transport_profile import get_transport_profile, apply_socket_options, connect_options
+from .staging import StagingHeartbeat, create_staging_dir, start_staging_collector
 
 try:
     from PyQt6.QtWidgets import QMessageBox
@@ -15,6 +38,17 @@ try:
 except ImportError:
     PYQT_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# Result message of a submission stopped through its cancellation token
+SUBMISSION_CANCELLED = "Submission cancelled"
+# Start of the result message of a submission rejected because the assignment is not open
+ASSIGNMENT_NOT_OPEN = "Assignment not open"
+# Starts of the result messages of submissions that failed on the network
+CONNECTION_TIMED_OUT = "SSH connection timed out"
+NETWORK_FAILED = "Network connection failed"
+AUTHENTICATION_FAILED = "Authentication failed"
+
 
 class KnownHostKeyPolicy(paramiko.MissingHostKeyPolicy):
     """
@@ -39,161 +73,13 @@ class KnownHostKeyPolicy(paramiko.MissingHostKeyPolicy):
         # Check against hardcoded keys
         for host, stored_type, stored_key in self.ssh_keys:
             if host == hostname and stored_type == key_type and stored_key == key_data:
-                print(f"Host key verified for {hostname} using known keys")
+                logger.info(f"Host key verified for {hostname} using known keys")
                 return  # Accept the key
         
         # If no match found, reject
         raise paramiko.SSHException(f"Host key verification failed for {hostname} - unknown host key")
 
 
-class SSHTunnelForwarder:
-    """Simple SSH tunnel forwarder using paramiko without DSSKey dependencies"""
-    
-    def __init__(self, ssh_host, ssh_port, ssh_username, ssh_password, 
-                 remote_bind_address, local_bind_address=('127.0.0.1', 0)):
-        self.ssh_host = ssh_host
-        self.ssh_port = ssh_port
-        self.ssh_username = ssh_username
-        self.ssh_password = ssh_password
-        self.remote_bind_address = remote_bind_address
-        self.local_bind_address = local_bind_address
-        
-        self._ssh_client = None
-        self._local_socket = None
-        self.local_bind_port = None
-        self._tunnel_thread = None
-        self._stop_tunnel = False
-    
-    def __enter__(self):
-        self.start()
-        return self
-    
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.stop()
-    
-    def start(self):
-        """Start the SSH tunnel"""
-        # Create SSH connection
-        self._ssh_client = paramiko.SSHClient()
-        add_ssh_keys(self._ssh_client)
-        self._ssh_client.connect(
-            self.ssh_host,
-            port=self.ssh_port,
-            username=self.ssh_username,
-            password=self.ssh_password,
-            timeout=15,
-            banner_timeout=10,
-            allow_agent=False,  # Disable SSH agent key usage
-            look_for_keys=False  # Disable automatic private key discovery
-        )
-        
-        # Create local socket
-        self._local_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._local_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self._local_socket.bind(self.local_bind_address)
-        self.local_bind_port = self._local_socket.getsockname()[1]
-        self._local_socket.listen(1)
-        
-        # Start tunnel thread
-        self._stop_tunnel = False
-        self._tunnel_thread = threading.Thread(target=self._tunnel_handler)
-        self._tunnel_thread.daemon = True
-        self._tunnel_thread.start()
-    
-    def stop(self):
-        """Stop the SSH tunnel"""
-        self._stop_tunnel = True
-        
-        if self._local_socket:
-            try:
-                self._local_socket.close()
-            except:
-                pass
-        
-        if self._ssh_client:
-            try:
-                self._ssh_client.close()
-            except:
-                pass
-        
-        if self._tunnel_thread and self._tunnel_thread.is_alive():
-            self._tunnel_thread.join(timeout=1)
-    
-    def _tunnel_handler(self):
-        """Handle tunnel connections"""
-        try:
-            while not self._stop_tunnel:
-                try:
-                    # Set a timeout for accept to allow checking stop condition
-                    self._local_socket.settimeout(1.0)
-                    client_socket, addr = self._local_socket.accept()
-                    
-                    # Handle connection in separate thread
-                    connection_thread = threading.Thread(
-                        target=self._handle_connection, 
-                        args=(client_socket,)
-                    )
-                    connection_thread.daemon = True
-                    connection_thread.start()
-                    
-                except socket.timeout:
-                    continue
-                except Exception:
-                    break
-        except Exception:
-            pass
-    
-    def _handle_connection(self, client_socket):
-        """Handle a single tunnel connection"""
-        try:
-            # Create channel through SSH connection
-            channel = self._ssh_client.get_transport().open_channel(
-                'direct-tcpip',
-                self.remote_bind_address,
-                client_socket.getpeername()
-            )
-            
-            # Forward data between client and channel
-            self._forward_data(client_socket, channel)
-            
-        except Exception:
-            pass
-        finally:
-            try:
-                client_socket.close()
-            except:
-                pass
-    
-    def _forward_data(self, client_socket, channel):
-        """Forward data between client socket and SSH channel"""
-        try:
-            while True:
-                ready, _, _ = select.select([client_socket, channel], [], [], 1.0)
-                
-                if self._stop_tunnel:
-                    break
-                
-                if client_socket in ready:
-                    data = client_socket.recv(4096)
-                    if not data:
-                        break
-                    channel.send(data)
-                
-                if channel in ready:
-                    data = channel.recv(4096)
-                    if not data:
-                        break
-                    client_socket.send(data)
-        
-        except Exception:
-            pass
-        finally:
-            try:
-                channel.close()
-            except:
-                pass
-
-
 def add_ssh_keys(ssh):
     """
     Configure SSH client with host key verification and password-only authentication
@@ -206,7 +92,7 @@ def add_ssh_keys(ssh):
         # Load system-wide known_hosts
         ssh.load_system_host_keys()
     except Exception as e:
-        print(f"Warning: Could not load system host keys: {e}")
+        logger.warning(f"Could not load system host keys: {e}")
     
     try:
         # Load user's known_hosts file
@@ -214,11 +100,106 @@ def add_ssh_keys(ssh):
         if os.path.exists(user_known_hosts):
             ssh.load_host_keys(user_known_hosts)
     except Exception as e:
-        print(f"Warning: Could not load user host keys: {e}")
+        logger.warning(f"Could not load user host keys: {e}")
     
     # Set host key verification policy (falls back to hardcoded keys for known servers)
     ssh.set_missing_host_key_policy(KnownHostKeyPolicy())
 
+def connect_ssh_client(ssh, host, username, password, port=22, sock=None, latency_host=None, profile=None):
+    """
+    Connect an SSH client using timeouts learned from this host's latency history
+
+    The TCP connect and the SSH handshake are timed separately and recorded,
+    so the timeouts used next time follow how the host actually behaves. The
+    transport profile (ciphers, window sizes, compression, TCP options) is
+    applied to the connection.
+
+    Args:
+        ssh (paramiko.SSHClient): Client to connect
+        host (str): Host name to connect to
+        username (str): SSH username
+        password (str): SSH password
+        port (int): SSH port
+        sock (socket): Already connected socket or channel to use instead of dialing host
+        latency_host (str): Name to record latencies under (defaults to host)
+        profile (dict): Transport settings (defaults to the configured profile)
+    """
+    latency_host = latency_host or host
+    profile = profile or get_transport_profile()
+    connect_timeout = timeout_for(latency_host, 'connect')
+    banner_timeout = timeout_for(latency_host, 'banner')
+    metrics = get_metrics()
+    connect_started = time.monotonic()
+
+    try:
+        if sock is None:
+            # Race IPv6/IPv4 to the host (reusing the last winning address when cached)
+            started = time.monotonic()
+            try:
+                sock = open_connection(host, port, timeout=connect_timeout)
+            except socket.timeout:
+                # Censored sample, so a host that got slower gets a longer timeout next time
+                record_timeout(latency_host, 'connect', connect_timeout)
+                raise
+            record_latency(latency_host, 'connect', time.monotonic() - started)
+        apply_socket_options(sock, profile)
+
+        started = time.monotonic()
+        try:
+            ssh.connect(
+                host,
+                port=port,
+                username=username,
+                password=password,
+                timeout=connect_timeout,
+                banner_timeout=banner_timeout,
+                allow_agent=False,  # Disable SSH agent key usage
+                look_for_keys=False,  # Disable automatic private key discovery
+                sock=sock,
+                **connect_options(profile)
+            )
+        except paramiko.AuthenticationException:
+            raise
+        except (socket.timeout, paramiko.SSHException):
+            # paramiko reports an expired banner timeout as a plain SSHException
+            if time.monotonic() - started >= banner_timeout:
+                record_timeout(latency_host, 'banner', banner_timeout)
+            raise
+        record_latency(latency_host, 'banner', time.monotonic() - started)
+    except paramiko.AuthenticationException:
+        metrics.inc('turnin_ssh_connects_total', host=latency_host, result='auth_failed')
+        metrics.inc('turnin_ssh_auth_failures_total', host=latency_host)
+        raise
+    except Exception:
+        metrics.inc('turnin_ssh_connects_total', host=latency_host, result='error')
+        raise
+    metrics.inc('turnin_ssh_connects_total', host=latency_host, result='ok')
+    metrics.observe('turnin_ssh_connect_seconds', time.monotonic() - connect_started, host=latency_host)
+
+
+def open_ssh_client(host, port, username, password, sock=None):
+    """
+    Create and connect a new SSH client (the connection pool's connector)
+
+    Args:
+        host (str): Host name to connect to
+        port (int): SSH port
+        username (str): SSH username
+        password (str): SSH password
+        sock: Channel to the host through a gateway, or None to dial it directly
+
+    Returns:
+        paramiko.SSHClient: Connected and authenticated client
+    """
+    ssh = paramiko.SSHClient()
+    add_ssh_keys(ssh)
+    try:
+        connect_ssh_client(ssh, host, username, password, port=port, sock=sock)
+    except Exception:
+        _close_quietly(ssh)
+        raise
+    return ssh
+
 def get_available_server(ssh):
     """
     Find an available server from the cluster
@@ -229,8 +210,9 @@ def get_available_server(ssh):
     Returns:
         str or None: Hostname of available server or None if no server is available
     """
-    _, ssh_stdout, _ = ssh.exec_command("rupt")
-    servers = ssh_stdout.readlines()
+    with get_metrics().timer('turnin_rupt_seconds'):
+        _, ssh_stdout, _ = ssh.exec_command("rupt")
+        servers = ssh_stdout.readlines()
     for server in servers:
         server = server.split()
         host_name = server[0]
@@ -239,112 +221,281 @@ def get_available_server(ssh):
             return host_name
     return None
 
-def connect_to_proxy(username, password, proxy_host):
+def check_cached_host(ssh, proxy_host, host, username, password):
     """
-    Connect to the SSH proxy
+    Check a cached submission host in the background
+
+    The host is reached over a direct-tcpip channel of the gateway connection
+    and its connection is kept in the pool, so a submission made soon after
+    login reuses it. If the host does not answer, it is dropped from the cache
+    and replaced with one found by rupt.
 
     Args:
+        ssh (Lease): Pooled gateway connection
+        proxy_host (str): Gateway host
+        host (str): Cached submission host
         username (str): SSH username
         password (str): SSH password
-        proxy_host (str): Proxy hostname
 
     Returns:
-        tuple: (success (bool), host_to_connect (str), ssh_client (paramiko.SSHClient), error_type (str))
-        error_type can be: None (success), 'auth' (authentication failed), 'timeout' (connection timeout), 'other' (other errors)
+        threading.Thread: The thread running the check
+    """
+    # The check keeps its own lease, since the caller may release theirs at any time
+    gateway = ssh.share()
+    cache = get_host_cache()
+
+    def check():
+        try:
+            try:
+                target = get_connection_pool().acquire(host, username, password, via=gateway)
+            except Exception as e:
+                logger.warning(f"Cached host {host} did not answer, scanning with rupt: {e}")
+                cache.forget(proxy_host, host)
+                replacement = get_available_server(gateway)
+                if replacement:
+                    cache.record(proxy_host, replacement)
+                return
+            target.close()
+            cache.record(proxy_host, host)
+        finally:
+            gateway.close()
+
+    return start_host_check(check)
+
+def show_error(title, message, notify=True):
+    """
+    Show an error message in a dialog if PyQt is available, otherwise log it
+
+    Args:
+        title (str): Dialog title
+        message (str): Error message
+        notify (bool): If False the message is only logged (for background callers)
+    """
+    if notify and PYQT_AVAILABLE:
+        try:
+            QMessageBox.critical(None, title, message)
+            return
+        except:
+            pass
+    logger.error(message)
+
+def _close_quietly(ssh):
+    """Close an SSH client (or return a pooled one), ignoring any error"""
+    if ssh:
+        try:
+            ssh.close()
+        except:
+            pass
+
+def error_type_for(error):
+    """
+    Classify an exception into the error types connect_to_proxy reports
+
+    Args:
+        error (Exception): The exception raised
+
+    Returns:
+        str: 'auth', 'timeout' (network failures worth retrying) or 'other'
+    """
+    if isinstance(error, paramiko.AuthenticationException):
+        return 'auth'
+    if isinstance(error, paramiko.ssh_exception.SSHException):
+        message = str(error).lower()
+        return 'timeout' if "banner" in message or "timeout" in message else 'other'
+    if isinstance(error, (socket.timeout, OSError, ConnectionError)):
+        return 'timeout'
+    return 'other'
+
+
+def submission_error_type(output):
+    """
+    Classify the result message of a failed submission like error_type_for classifies exceptions
+
+    Args:
+        output (str): Message returned by submit_files
+
+    Returns:
+        str: 'cancelled', 'auth', 'timeout' (network failures worth retrying) or 'other'
+    """
+    if output.startswith(SUBMISSION_CANCELLED):
+        return 'cancelled'
+    if output.startswith(AUTHENTICATION_FAILED):
+        return 'auth'
+    if output.startswith((CONNECTION_TIMED_OUT, NETWORK_FAILED)):
+        return 'timeout'
+    return 'other'
+
+
+def _connect_once(username, password, proxy_host):
+    """
+    Make a single attempt to connect to the proxy and find an available server
+
+    Returns:
+        tuple: (host_to_connect, ssh_client, error_type, error_title, error_message)
+        On success the error fields are None and ssh_client is a connection pool lease;
+        on failure host and client are None.
     """
     ssh = None
     try:
-        ssh = paramiko.SSHClient()
-        add_ssh_keys(ssh)
-        
-        # Set connection timeout to prevent hanging
-        ssh.connect(
-            proxy_host, 
-            username=username, 
-            password=password, 
-            timeout=15,  # Reduced to 15 second connection timeout
-            banner_timeout=10,  # Reduced to 10 second banner timeout
-            allow_agent=False,  # Disable SSH agent key usage
-            look_for_keys=False  # Disable automatic private key discovery
-        )
-
-        # Find available host
-        host_to_connect = get_available_server(ssh)
-        if not host_to_connect:
-            if PYQT_AVAILABLE:
-                try:
-                    QMessageBox.critical(None, "Error", "No available hosts found. Aborting...")
-                except:
-                    print("Error: No available hosts found. Aborting...")
-            else:
-                print("Error: No available hosts found. Aborting...")
-            return False, None, None, 'other'
+        # Reuse a pooled connection to the proxy, or connect with timeouts adapted
+        # to the proxy's measured latency
+        # Gateways may be given as "host:port" to use a port other than 22
+        gateway_host, gateway_port = split_host_port(proxy_host)
+        ssh = get_connection_pool().acquire(gateway_host, username, password, port=gateway_port)
+
+        # The last host that worked through this gateway is used right away and checked
+        # in the background; rupt only runs when nothing recent is cached
+        cache = get_host_cache()
+        host_to_connect = cache.get(proxy_host)
+        if host_to_connect:
+            check_cached_host(ssh, proxy_host, host_to_connect, username, password)
+        else:
+            host_to_connect = get_available_server(ssh)
+            if not host_to_connect:
+                _close_quietly(ssh)
+                return None, None, 'other', "Error", "Error: No available hosts found. Aborting..."
+            cache.record(proxy_host, host_to_connect)
 
-        return True, host_to_connect, ssh, None
+        return host_to_connect, ssh, None, None, None
     except paramiko.AuthenticationException:
-        if ssh:
-            try:
-                ssh.close()
-            except:
-                pass
-        return False, None, None, 'auth'
+        _close_quietly(ssh)
+        return None, None, 'auth', None, None
     except paramiko.ssh_exception.SSHException as e:
-        if ssh:
-            try:
-                ssh.close()
-            except:
-                pass
+        _close_quietly(ssh)
         # Handle specific banner timeout errors more gracefully
-        if "banner" in str(e).lower() or "timeout" in str(e).lower():
-            error_msg = f"SSH connection timed out. Please check your network connection and try again."
+        if error_type_for(e) == 'timeout':
+            error_msg = f"{CONNECTION_TIMED_OUT}. Please check your network connection and try again."
             error_type = 'timeout'
         else:
             error_msg = f"SSH Error: {e}"
             error_type = 'other'
-        
-        if PYQT_AVAILABLE:
-            try:
-                QMessageBox.critical(None, "SSH Error", error_msg)
-            except:
-                print(error_msg)
-        else:
-            print(error_msg)
-        return False, None, None, error_type
+        return None, None, error_type, "SSH Error", error_msg
     except (socket.timeout, OSError, ConnectionError) as e:
-        if ssh:
-            try:
-                ssh.close()
-            except:
-                pass
-        error_msg = f"Network connection failed: {e}"
-        if PYQT_AVAILABLE:
-            try:
-                QMessageBox.critical(None, "Connection Error", error_msg)
-            except:
-                print(error_msg)
-        else:
-            print(error_msg)
-        return False, None, None, 'timeout'
+        _close_quietly(ssh)
+        return None, None, 'timeout', "Connection Error", f"{NETWORK_FAILED}: {e}"
     except Exception as e:
-        if ssh:
+        _close_quietly(ssh)
+        return None, None, 'other', "Connection Error", f"Connection Error: {e}"
+
+def connect_to_gateway(username, password, proxy_hosts, notify=True, retry_policy=None,
+                       cancel_token=None, on_retry=None, on_error=None):
+    """
+    Connect through the healthiest available gateway, failing over to the others
+
+    Each round tries every gateway once, healthiest first, and moves straight
+    on to the next one when a gateway fails. Only when a whole round fails with
+    transient errors does it back off (per retry_policy) before the next round.
+    Authentication failures end the search immediately, since every gateway
+    shares the same accounts. The outcome of every attempt updates that
+    gateway's health score.
+
+    Args:
+        username (str): SSH username
+        password (str): SSH password
+        proxy_hosts (list): Gateway hosts in configured order
+        notify (bool): Show error dialogs on failure (disable for background callers)
+        retry_policy (RetryPolicy): Retry policy for whole rounds (defaults to DEFAULT_RETRY_POLICY)
+        cancel_token (CancellationToken): Token that aborts the retries
+        on_retry (callable): Called as on_retry(attempt, max_attempts, delay, error_message) before each wait
+        on_error (callable): Called as on_error(title, message) with the final error instead of showing it
+
+    Returns:
+        tuple: (success (bool), proxy_host (str), host_to_connect (str), ssh_client (Lease), error_type (str))
+        ssh_client is a pooled connection; closing it returns it to the pool.
+        error_type is one of the values returned by connect_to_proxy
+    """
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    cancel_token = cancel_token or CancellationToken()
+    health = get_proxy_health()
+
+    attempt = 0
+    while True:
+        attempt += 1
+        error_type, error_title, error_msg = 'other', "Connection Error", "No gateway hosts configured"
+        for proxy_host in health.rank(proxy_hosts):
+            if cancel_token.cancelled:
+                return False, None, None, None, 'cancelled'
+
+            started = time.monotonic()
+            host_to_connect, ssh, error_type, error_title, error_msg = _connect_once(username, password, proxy_host)
+            if not error_type:
+                health.record(proxy_host, True, time.monotonic() - started)
+                return True, proxy_host, host_to_connect, ssh, None
+            if error_type == 'auth':
+                break
+
+            health.record(proxy_host, False)
+            logger.warning(f"Gateway {proxy_host} failed: {error_msg}")
+
+        if not retry_policy.should_retry(attempt, error_type) or cancel_token.cancelled:
+            break
+
+        delay = retry_policy.delay(attempt)
+        logger.warning(f"Connection attempt {attempt}/{retry_policy.max_attempts} failed, retrying in {delay:.1f}s: {error_msg}")
+        if on_retry:
             try:
-                ssh.close()
-            except:
+                on_retry(attempt, retry_policy.max_attempts, delay, error_msg)
+            except Exception:
                 pass
-        error_msg = f"Connection Error: {e}"
-        if PYQT_AVAILABLE:
-            try:
-                QMessageBox.critical(None, "Connection Error", error_msg)
-            except:
-                print(error_msg)
+        if cancel_token.wait(delay):
+            return False, None, None, None, 'cancelled'
+
+    if error_msg:
+        if on_error:
+            on_error(error_title, error_msg)
         else:
-            print(error_msg)
-        return False, None, None, 'other'
+            show_error(error_title, error_msg, notify)
+    return False, None, None, None, error_type
+
+def connect_to_proxy(username, password, proxy_host, notify=True, retry_policy=None,
+                     cancel_token=None, on_retry=None, on_error=None):
+    """
+    Connect to the SSH proxy, retrying transient failures with backoff
+
+    Transient failures (timeouts, unreachable network) are retried according to
+    retry_policy with exponential backoff and jitter. Authentication failures
+    are never retried. Waiting between attempts can be interrupted with
+    cancel_token.
+
+    Args:
+        username (str): SSH username
+        password (str): SSH password
+        proxy_host (str): Proxy hostname
+        notify (bool): Show error dialogs on failure (disable for background callers)
+        retry_policy (RetryPolicy): Retry policy (defaults to DEFAULT_RETRY_POLICY)
+        cancel_token (CancellationToken): Token that aborts the retries
+        on_retry (callable): Called as on_retry(attempt, max_attempts, delay, error_message) before each wait
+        on_error (callable): Called as on_error(title, message) with the final error instead of showing it
+
+    Returns:
+        tuple: (success (bool), host_to_connect (str), ssh_client (Lease), error_type (str))
+        error_type can be: None (success), 'auth' (authentication failed), 'timeout' (connection timeout),
+        'cancelled' (cancelled while retrying), 'other' (other errors)
+    """
+    success, _, host_to_connect, ssh, error_type = connect_to_gateway(
+        username, password, [proxy_host], notify=notify, retry_policy=retry_policy,
+        cancel_token=cancel_token, on_retry=on_retry, on_error=on_error
+    )
+    return success, host_to_connect, ssh, error_type
+
+def upload_files(files, username, password, ssh, host, temp_dir, progress_callback=None, cancel_token=None,
+                 preflight=None, rate_limiter=None):
+    """
+    Upload files with progress reporting using existing SSH connection
+
+    preflight is called once the staging directory exists, before the first
+    file is sent; if it raises UnknownAssignmentError nothing is uploaded.
+    rate_limiter (a TokenBucket) limits the bandwidth of this upload; the
+    global upload limit applies either way.
 
-def upload_files(files, username, password, ssh, host, temp_dir, progress_callback=None):
-    """Upload files with progress reporting using existing SSH connection"""
+    Raises:
+        CancelledError: If cancel_token is cancelled; the SFTP channel is closed at once
+        UnknownAssignmentError: If preflight rejects the submission
+    """
     if not files:
         return None, None
+    cancel_token = cancel_token or CancellationToken()
+    cancel_token.raise_if_cancelled()
 
     # Get home directory using existing SSH connection
     _, ssh_stdout, _ = ssh.exec_command("pwd")
@@ -352,15 +503,41 @@ def upload_files(files, username, password, ssh, host, temp_dir, progress_callba
 
     # Use existing SSH connection to create SFTP channel (avoids multiple connections)
     sftp = ssh.open_sftp()
-
-    remote_dir = f"{home_dir}/{temp_dir}/"
-
-    # Try to create directory (ignore if exists)
+    # Closing the channel makes a write in progress fail right away
+    unregister_cancel = cancel_token.on_cancel(sftp.close)
+    remote_dir = None
     try:
-        sftp.mkdir(remote_dir)
-    except:
-        pass
+        with cancellable(cancel_token):
+            # Every submission gets its own staging directory so concurrent submissions
+            # never overwrite each other and stale files are never resent
+            try:
+                remote_dir = create_staging_dir(sftp, f"{home_dir}/{temp_dir}")
+            except IOError as e:
+                cancel_token.raise_if_cancelled()
+                logger.error(f"Upload error: {str(e)}")
+                return None, None
+
+            if preflight:
+                preflight()
+            # Another session's collector must not mistake a slow upload for an abandoned one
+            with StagingHeartbeat(ssh, remote_dir):
+                return _upload_to_staging(files, ssh, sftp, remote_dir, progress_callback, cancel_token,
+                                          rate_limiter)
+    except (CancelledError, UnknownAssignmentError):
+        if remote_dir:
+            # Remove the partial upload in the background
+            start_staging_collector(ssh, posixpath.dirname(remote_dir.rstrip('/')), remote_dir)
+        raise
+    finally:
+        unregister_cancel()
+        try:
+            sftp.close()
+        except:
+            pass
 
+
+def _upload_to_staging(files, ssh, sftp, remote_dir, progress_callback, cancel_token, rate_limiter=None):
+    """Upload the files into the staging directory and verify them"""
     # Safe progress reporting
     if progress_callback:
         try:
@@ -368,11 +545,62 @@ def upload_files(files, username, password, ssh, host, temp_dir, progress_callba
         except Exception:
             pass  # Ignore callback errors
 
+    staged = None
+    if blob_cache_enabled():
+        try:
+            staged = _stage_from_blob_cache(files, ssh, sftp, remote_dir, progress_callback, cancel_token,
+                                            rate_limiter)
+        except CancelledError:
+            raise
+        except Exception as e:
+            cancel_token.raise_if_cancelled()
+            logger.warning(f"Blob cache unavailable, uploading directly: {str(e)}")
+
+    if staged:
+        remote_paths, local_paths, local_hashes = staged
+    else:
+        remote_paths, local_paths, local_hashes = _upload_directly(files, sftp, remote_dir, progress_callback,
+                                                                   cancel_token, rate_limiter)
+
+    # Check everything that landed in the staging directory with one remote call
+    if local_hashes:
+        if progress_callback:
+            try:
+                progress_callback(75, "Verifying uploaded files...")
+            except Exception:
+                pass
+        try:
+            mismatched = verify_staged_files(ssh, sftp, remote_dir, local_paths, local_hashes,
+                                             cancel_token=cancel_token, rate_limiter=rate_limiter)
+        except CancelledError:
+            raise
+        except Exception as e:
+            cancel_token.raise_if_cancelled()
+            logger.error(f"Verification error: {str(e)}")
+            mismatched = list(local_hashes)
+        if mismatched:
+            # Never hand corrupted files to turnin
+            logger.error(f"Upload error: files failed verification: {', '.join(mismatched)}")
+            remote_paths = []
+
+    return remote_dir, remote_paths
+
+
+def _upload_directly(files, sftp, remote_dir, progress_callback, cancel_token, rate_limiter=None):
+    """
+    Upload the files straight into the staging directory
+
+    Returns:
+        tuple: (uploaded names, name -> local path, name -> hex digest)
+    """
     remote_paths = []
+    local_paths = {}
+    local_hashes = {}
     total_files = len(files)
-    progress_range = 60  # Progress from 20% to 80%
+    progress_range = 55  # Progress from 20% to 75%
 
     for idx, localpath in enumerate(files):
+        cancel_token.raise_if_cancelled()
         name = os.path.basename(localpath)
         filepath = f"{remote_dir}{name}"
 
@@ -383,10 +611,14 @@ def upload_files(files, username, password, ssh, host, temp_dir, progress_callba
             except Exception:
                 pass  # Ignore callback errors
 
-        # Upload the file
+        # Upload the file, hashing it in the same read pass
         try:
-            sftp.put(localpath, filepath)
+            local_hashes[name] = upload_and_hash(sftp, localpath, filepath, cancel_token=cancel_token,
+                                                 rate_limiter=rate_limiter)
+            local_paths[name] = localpath
             remote_paths.append(name)
+            # One line per file; the logging rate limiter keeps large directories from flooding the log
+            logger.info(f"Uploaded {localpath} to {filepath}")
 
             if progress_callback:
                 current_progress = 20 + ((idx + 1) * progress_range / total_files)
@@ -394,101 +626,369 @@ def upload_files(files, username, password, ssh, host, temp_dir, progress_callba
                     progress_callback(current_progress, f"Uploaded {idx+1}/{total_files} files")
                 except Exception:
                     pass
+        except CancelledError:
+            raise
         except Exception as e:
-            print(f"Upload error: {str(e)}")
+            cancel_token.raise_if_cancelled()
+            logger.error(f"Upload error: {str(e)}")
+
+    return remote_paths, local_paths, local_hashes
+
 
-    # Close SFTP connection
+def _stage_from_blob_cache(files, ssh, sftp, remote_dir, progress_callback, cancel_token, rate_limiter=None):
+    """
+    Upload only the files the server's blob cache lacks and link all of them into the staging directory
+
+    Only files whose digest is remembered locally are looked up; hashing the
+    others first would read them twice, so they are uploaded (and hashed in
+    the same pass) straight away. The blobs are looked up by name and size,
+    leaving the one remote hash check to the verification of the staging
+    directory.
+
+    Returns:
+        tuple: (staged names, name -> local path, name -> hex digest)
+    """
+    blob_dir = get_blob_dir(posixpath.dirname(remote_dir.rstrip('/')))
     try:
-        sftp.close()
-    except:
-        pass
+        sftp.mkdir(blob_dir, mode=0o700)
+    except IOError:
+        pass  # already there
+
+    # One remote call lists every blob the server already has
+    blobs = list_blobs(ssh, blob_dir)
+    if blobs is None:
+        raise OSError("could not list the blob cache")
+
+    hash_cache = get_local_hash_cache()
+    local_paths = {}
+    local_hashes = {}
+    sizes = {}
+    for localpath in files:
+        name = os.path.basename(localpath)
+        local_paths[name] = localpath
+        digest = hash_cache.get(localpath)
+        if digest:
+            local_hashes[name] = digest
+            sizes[digest] = os.path.getsize(localpath)
+
+    cached = find_cached_blobs(blobs, sizes)
+    missing = [name for name in local_paths if local_hashes.get(name) not in cached]
+    if cached:
+        logger.info(f"{len(local_paths) - len(missing)} of {len(local_paths)} file(s) found in the blob cache")
+
+    progress_range = 55  # Progress from 20% to 75%
+    uploaded = set()
+    for idx, name in enumerate(missing):
+        cancel_token.raise_if_cancelled()
+        if local_hashes.get(name) in uploaded:
+            continue  # same content as a file uploaded already
 
-    return remote_dir, remote_paths
+        if progress_callback:
+            try:
+                progress_callback(20 + (idx * progress_range / len(missing)),
+                                  f"Uploading file {idx+1}/{len(missing)}: {name}")
+            except Exception:
+                pass
+
+        try:
+            # The file may have changed since it was hashed; the blob is named after what was sent
+            before = fingerprint(local_paths[name])
+            local_hashes[name] = upload_blob(sftp, local_paths[name], blob_dir, cancel_token=cancel_token,
+                                             rate_limiter=rate_limiter)
+            if fingerprint(local_paths[name]) == before:
+                hash_cache.put(local_paths[name], local_hashes[name], before)
+            uploaded.add(local_hashes[name])
+            blobs[local_hashes[name]] = (before[0] if before else 0, time.time())
+            logger.info(f"Uploaded {local_paths[name]} to {blob_dir}/{local_hashes[name]}")
+
+            if progress_callback:
+                try:
+                    progress_callback(20 + ((idx + 1) * progress_range / len(missing)),
+                                      f"Uploaded {idx+1}/{len(missing)} files")
+                except Exception:
+                    pass
+        except CancelledError:
+            raise
+        except Exception as e:
+            cancel_token.raise_if_cancelled()
+            logger.error(f"Upload error: {str(e)}")
+            local_hashes.pop(name, None)
+            local_paths.pop(name, None)
+    hash_cache.save()
+
+    cancel_token.raise_if_cancelled()
+    link_blobs(ssh, blob_dir, remote_dir, local_hashes)
+    remote_paths = [name for name in (os.path.basename(path) for path in files) if name in local_hashes]
+
+    # Keep the cache under its cap, dropping the least recently used blobs of earlier submissions
+    evict = blobs_to_evict(blobs, set(local_hashes.values()), get_blob_cache_limit())
+    if evict:
+        try:
+            remove_blobs(ssh, blob_dir, evict)
+            logger.info(f"Removed {len(evict)} blob(s) to keep the blob cache under its size cap")
+        except Exception as e:
+            logger.warning(f"Could not trim the blob cache: {e}")
+    return remote_paths, local_paths, local_hashes
+
+
+def duplicate_names(paths):
+    """
+    Find file names shared by several of the paths
+
+    Files are staged and passed to turnin by name alone, so two files with the
+    same name (e.g. a/Makefile and b/Makefile) would overwrite each other.
+
+    Returns:
+        list: The shared names, sorted
+    """
+    seen = {}
+    for path in paths:
+        name = os.path.basename(path)
+        seen.setdefault(name, set()).add(os.path.abspath(path))
+    return sorted(name for name, owners in seen.items() if len(owners) > 1)
 
 
 def submit_files(proxy_host, host_to_connect, username, password, assignment,
-                 file_list, temp_dir, ssh_client=None, progress_callback=None):
-    """Submit files to the assignment submission server"""
+                 file_list, temp_dir, ssh_client=None, progress_callback=None, cancel_token=None,
+                 prestager=None, rate_limiter=None):
+    """
+    Submit files to the assignment submission server
+
+    ssh_client is a pooled proxy connection (as returned by connect_to_gateway)
+    to reuse; without one a connection is leased for this submission only.
+    The target host is always reached through the proxy connection.
+
+    With a PreStager (watch mode) the files are submitted from its staging
+    directory: only files changed since its last upload are sent, and the
+    directory is kept for the next submission.
+
+    rate_limiter (a TokenBucket, default: the global utils.rate_limit.get_upload_limiter())
+    limits the upload bandwidth of this submission; its rate can be changed
+    while the upload runs.
+
+    Cancelling cancel_token closes the channels in use right away; the
+    submission then returns (False, SUBMISSION_CANCELLED) and the partial
+    upload is removed in the background.
+    """
+    duplicates = duplicate_names(file_list)
+    if duplicates:
+        return False, f"Several files are named {', '.join(duplicates)}; rename them so every file name is unique."
+
+    cancel_token = cancel_token or CancellationToken()
     # Use existing SSH client or create a new one
     if ssh_client:
         ssh = ssh_client
     else:
-        result, _, ssh, error_type = connect_to_proxy(username, password, proxy_host)
+        result, _, ssh, error_type = connect_to_proxy(username, password, proxy_host, notify=False,
+                                                      cancel_token=cancel_token)
         if not result:
-            if error_type == 'timeout':
-                return False, "SSH connection timed out. Please check your network connection and try again."
+            if error_type == 'cancelled':
+                return False, SUBMISSION_CANCELLED
+            elif error_type == 'timeout':
+                return False, f"{CONNECTION_TIMED_OUT}. Please check your network connection and try again."
             elif error_type == 'auth':
-                return False, "Authentication failed. Please check your credentials."
+                return False, f"{AUTHENTICATION_FAILED}. Please check your credentials."
             else:
                 return False, "Connection failed. Please try again."
 
+    try:
+        return _submit_over(ssh, proxy_host, host_to_connect, username, password, assignment,
+                            file_list, temp_dir, progress_callback, cancel_token, prestager, rate_limiter)
+    finally:
+        if not ssh_client:
+            # Return the connection taken for this submission to the pool
+            ssh.close()
+
+
+def _acquire_target(ssh, proxy_host, host_to_connect, username, password):
+    """
+    Lease a connection to the submission host through the gateway
+
+    A host found by the background check replaces the one chosen at login. If
+    the host does not answer, the cluster is scanned with rupt once and the
+    submission moves to the host found.
+
+    Returns:
+        tuple: (Lease, host actually connected to)
+    """
+    pool = get_connection_pool()
+    cache = get_host_cache()
+    host_to_connect = cache.get(proxy_host) or host_to_connect
+    try:
+        target = pool.acquire(host_to_connect, username, password, via=ssh)
+    except paramiko.AuthenticationException:
+        raise
+    except Exception as e:
+        logger.warning(f"Submission host {host_to_connect} failed ({e}), scanning with rupt")
+        cache.forget(proxy_host, host_to_connect)
+        replacement = get_available_server(ssh)
+        if not replacement or replacement == host_to_connect:
+            raise
+        target = pool.acquire(replacement, username, password, via=ssh)
+        host_to_connect = replacement
+    cache.record(proxy_host, host_to_connect)
+    return target, host_to_connect
+
+
+def fetch_assignments(ssh, proxy_host, host_to_connect, username, password):
+    """
+    List the open assignments on the submission host and cache them
+
+    Args:
+        ssh (Lease): Pooled gateway connection
+        proxy_host (str): Gateway host
+        host_to_connect (str): Submission host
+        username (str): SSH username
+        password (str): SSH password
+
+    Returns:
+        list or None: Assignment names, or None if the server could not list them
+    """
+    target, _ = _acquire_target(ssh, proxy_host, host_to_connect, username, password)
+    try:
+        return get_assignment_catalog().refresh(target)
+    finally:
+        target.close()
+
+
+def check_assignment(assignment, ssh, proxy_host, host_to_connect, username, password):
+    """
+    Check an assignment name against the open assignments
+
+    A name in a cached list younger than its TTL is accepted without asking
+    the server. Otherwise the list is fetched again first, so assignments
+    opened since the last fetch are not rejected.
+
+    Returns:
+        str or None: Why the name is rejected, or None if it is open or the list is unavailable
+    """
+    catalog = get_assignment_catalog()
+    names = catalog.fresh_names()
+    if names and assignment in names:
+        return None
+    try:
+        names = fetch_assignments(ssh, proxy_host, host_to_connect, username, password)
+    except Exception as e:
+        logger.warning(f"Could not list assignments, skipping the check: {e}")
+        return None
+    return unknown_assignment_message(assignment, names)
+
+
+def _submit_over(ssh, proxy_host, host_to_connect, username, password, assignment,
+                 file_list, temp_dir, progress_callback, cancel_token, prestager=None, rate_limiter=None):
+    """Upload the files over a proxy connection and run turnin on the target host"""
     if progress_callback:
         try:
             progress_callback(10, "Connected to SSH server...")
         except Exception:
             pass
 
+    # The assignment name is checked while the staging directory is set up, so a typo
+    # fails before anything is uploaded. Unless the list command is configured the check
+    # is advisory: the warning is put in front of the turnin output instead
+    warnings = []
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assignment-check")
+    check = executor.submit(check_assignment, assignment, ssh, proxy_host, host_to_connect, username, password)
+    executor.shutdown(wait=False)
+
+    def preflight():
+        deadline = time.monotonic() + ASSIGNMENT_CHECK_TIMEOUT
+        while True:
+            cancel_token.raise_if_cancelled()
+            try:
+                error = check.result(timeout=min(0.1, max(0.0, deadline - time.monotonic())))
+                break
+            except FutureTimeout:
+                if time.monotonic() >= deadline:
+                    logger.warning("Assignment check did not finish in time, uploading anyway")
+                    return
+        if not error:
+            return
+        if assignment_check_enforced():
+            raise UnknownAssignmentError(error)
+        logger.warning(f"{error.splitlines()[0]} Submitting anyway, the assignment list is advisory")
+        warnings.append(f"Warning: {error}")
+
     # Upload files to the server
-    remote_dir, remote_paths = upload_files(file_list, username, password, ssh, proxy_host, temp_dir, progress_callback)
+    try:
+        if prestager:
+            if progress_callback:
+                try:
+                    progress_callback(20, "Checking pre-staged files...")
+                except Exception:
+                    pass
+            remote_dir, remote_paths = prestager.stage(ssh, file_list, progress_callback,
+                                                       cancel_token=cancel_token, preflight=preflight,
+                                                       rate_limiter=rate_limiter)
+        else:
+            remote_dir, remote_paths = upload_files(file_list, username, password, ssh, proxy_host, temp_dir,
+                                                    progress_callback, cancel_token=cancel_token,
+                                                    preflight=preflight, rate_limiter=rate_limiter)
+    except CancelledError:
+        return False, SUBMISSION_CANCELLED
+    except UnknownAssignmentError as e:
+        return False, f"{ASSIGNMENT_NOT_OPEN}: {e}"
 
     if not remote_dir or not remote_paths:
         return False, "Failed to upload files"
 
     if progress_callback:
         try:
-            progress_callback(80, "Files uploaded. Creating SSH tunnel...")
+            progress_callback(80, "Files uploaded. Connecting to the submission server...")
         except Exception:
             pass
 
-    # Run the turnin command through SSH tunnel
+    # Run the turnin command on the target host
     try:
-        # Create SSH tunnel to the target host through the proxy
-        with SSHTunnelForwarder(
-            ssh_host=proxy_host,
-            ssh_port=22,
-            ssh_username=username,
-            ssh_password=password,
-            remote_bind_address=(host_to_connect, 22),
-            local_bind_address=('127.0.0.1', 0)  # Let system choose port
-        ) as tunnel:
-            # Create a new SSH client to connect to the tunneled host
-            target_ssh = paramiko.SSHClient()
-            add_ssh_keys(target_ssh)
-
-            # Connect through the tunnel with timeout
-            target_ssh.connect('127.0.0.1',
-                             port=tunnel.local_bind_port,
-                             username=username,
-                             password=password,
-                             timeout=15,  # Reduced to 15 second connection timeout
-                             banner_timeout=10,  # Reduced to 10 second banner timeout
-                             allow_agent=False,  # Disable SSH agent key usage
-                             look_for_keys=False)  # Disable automatic private key discovery
-
-            if progress_callback:
+        with cancellable(cancel_token), StagingHeartbeat(ssh, remote_dir):
+            cancel_token.raise_if_cancelled()
+            # The target is reached over a direct-tcpip channel of the pooled proxy connection,
+            # and its own connection is pooled too, so later submissions skip both handshakes
+            target_ssh, host_to_connect = _acquire_target(ssh, proxy_host, host_to_connect, username, password)
+            try:
+                if progress_callback:
+                    try:
+                        progress_callback(85, "Connected. Running turnin command...")
+                    except Exception:
+                        pass
+
+                cancel_token.raise_if_cancelled()
+
+                # Build and execute the turnin command
+                cmd = f"cd {remote_dir} && yes|turnin {assignment} {' '.join(remote_paths)}"
+                logger.info(f"Running: {cmd}")
+                command_started = time.monotonic()
+                command_timeout = timeout_for(host_to_connect, 'command')
+                stdin, stdout, stderr = target_ssh.exec_command(cmd, timeout=command_timeout)
+                # The target connection may be shared, so cancelling closes only this command's channel
+                unregister_cancel = cancel_token.on_cancel(stdout.channel.close)
+                # Send "y" to the command to confirm any prompts
+                stdin.write('y\n')
+                stdin.flush()
+                stdin.write('y\n')
+                stdin.flush()
+
+                # Gather output
                 try:
-                    progress_callback(85, "Tunnel created. Running turnin command...")
-                except Exception:
-                    pass
-
-            # Build and execute the turnin command
-            cmd = f"cd {remote_dir} && yes|turnin {assignment} {' '.join(remote_paths)}"
-            print(cmd)
-            stdin, stdout, stderr = target_ssh.exec_command(cmd, timeout=30)
-            # Send "y" to the command to confirm any prompts
-            stdin.write('y\n')
-            stdin.flush()
-            stdin.write('y\n')
-            stdin.flush()
-
-
-            # Gather output
-            output_stdout = stdout.read().decode('utf-8', errors='replace')
-            output_stderr = stderr.read().decode('utf-8', errors='replace')
-            output = output_stdout + output_stderr
-
-            # Close connection
-            target_ssh.close()
+                    output_stdout = stdout.read().decode('utf-8', errors='replace')
+                    output_stderr = stderr.read().decode('utf-8', errors='replace')
+                except socket.timeout:
+                    record_timeout(host_to_connect, 'command', command_timeout)
+                    raise
+                output = output_stdout + output_stderr
+                unregister_cancel()
+                # A cancelled command ends with whatever output arrived before its channel was closed
+                cancel_token.raise_if_cancelled()
+                record_latency(host_to_connect, 'command', time.monotonic() - command_started)
+                get_metrics().observe('turnin_command_seconds', time.monotonic() - command_started,
+                                      host=host_to_connect)
+            finally:
+                # Return the target connection to the pool
+                target_ssh.close()
+
+        # Remove this staging directory (unless watch mode keeps it) and stale ones from
+        # earlier attempts in the background
+        start_staging_collector(ssh, posixpath.dirname(remote_dir.rstrip('/')), None if prestager else remote_dir)
 
         if progress_callback:
             try:
@@ -496,13 +996,19 @@ def submit_files(proxy_host, host_to_connect, username, password, assignment,
             except Exception as e:
                 return False, f"Error updating progress bar: {str(e)}"
 
+        if warnings:
+            output = "\n\n".join(warnings + [output])
         return True, output
+    except CancelledError:
+        logger.info(f"Submission for {assignment} cancelled")
+        start_staging_collector(ssh, posixpath.dirname(remote_dir.rstrip('/')), None if prestager else remote_dir)
+        return False, SUBMISSION_CANCELLED
     except paramiko.ssh_exception.SSHException as e:
-        if "banner" in str(e).lower() or "timeout" in str(e).lower():
-            return False, f"SSH connection timed out during submission. Please check your network connection and try again."
+        if error_type_for(e) == 'timeout':
+            return False, f"{CONNECTION_TIMED_OUT} during submission. Please check your network connection and try again."
         else:
             return False, f"SSH error during submission: {str(e)}"
     except (socket.timeout, OSError, ConnectionError) as e:
-        return False, f"Network connection failed during submission: {str(e)}"
+        return False, f"{NETWORK_FAILED} during submission: {str(e)}"
     except Exception as e:
         return False, f"Error executing turnin command: {str(e)}"
@@ -0,0 +1,188 @@
+"""
+Remote staging directory management for submissions
+"""
+import logging
+import posixpath
+import secrets
+import shlex
+import threading
+import time
+
+from .blob_cache import build_blob_collect_command
+
+logger = logging.getLogger(__name__)
+
+STAGING_PREFIX = "sub-"
+# Staging directories older than this are removed by the collector; younger ones may
+# still belong to a submission running in another session
+STAGING_MAX_AGE_MINUTES = 60
+# Directories kept up to date by watch mode live across submissions; every upload into
+# one refreshes its modification time, so only abandoned ones get this old
+WATCH_PREFIX = "watch-"
+WATCH_MAX_AGE_MINUTES = 24 * 60
+# Seconds between touches of a staging directory in use, so a slow upload, verification
+# or turnin run never looks abandoned to another session's collector
+HEARTBEAT_INTERVAL = 5 * 60
+
+
+def new_staging_name(prefix=STAGING_PREFIX):
+    """
+    Generate a unique name for a staging directory
+
+    Args:
+        prefix (str): STAGING_PREFIX, or WATCH_PREFIX for watch mode
+
+    Returns:
+        str: Name made of a timestamp and a random suffix
+    """
+    return f"{prefix}{time.strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4)}"
+
+
+def create_staging_dir(sftp, base_dir, attempts=5, prefix=STAGING_PREFIX):
+    """
+    Create a fresh staging directory for a single submission
+
+    The directory is created with a single SFTP mkdir, which fails if the path
+    already exists, so two submissions can never end up sharing a directory.
+
+    Args:
+        sftp (paramiko.SFTPClient): Open SFTP session
+        base_dir (str): Remote directory that holds all staging directories
+        attempts (int): Number of names to try before giving up
+        prefix (str): Name prefix (see new_staging_name)
+
+    Returns:
+        str: Path of the new staging directory, with a trailing slash
+    """
+    # Make sure the parent exists (ignore if it already does)
+    try:
+        sftp.mkdir(base_dir)
+    except IOError:
+        pass
+
+    last_error = None
+    for _ in range(attempts):
+        staging_dir = posixpath.join(base_dir, new_staging_name(prefix))
+        try:
+            sftp.mkdir(staging_dir, mode=0o700)
+            return f"{staging_dir}/"
+        except IOError as e:
+            # Name collision or transient failure, try another name
+            last_error = e
+
+    raise IOError(f"Could not create staging directory in {base_dir}: {last_error}")
+
+
+class StagingHeartbeat:
+    """
+    Keeps the modification time of a staging directory fresh while its submission runs
+
+    The collector judges directories by modification time alone, and writing
+    into a file that already exists does not change it, so a long rate-limited
+    upload would otherwise look abandoned. A background thread touches the
+    directory every interval seconds until stop() is called. Use as a context
+    manager.
+
+    Args:
+        ssh (paramiko.SSHClient): SSH client connected to the proxy
+        staging_dir (str): Staging directory in use
+        interval (float): Seconds between touches
+    """
+
+    def __init__(self, ssh, staging_dir, interval=HEARTBEAT_INTERVAL):
+        self.ssh = ssh
+        self.staging_dir = staging_dir.rstrip('/')
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Start touching the directory in the background"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="staging-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop touching the directory (never waits for a touch in progress)"""
+        self._stop.set()
+
+    def touch(self):
+        """Refresh the directory's modification time now"""
+        try:
+            _, stdout, _ = self.ssh.exec_command(f"touch -c -- {shlex.quote(self.staging_dir)}")
+            stdout.channel.recv_exit_status()
+        except Exception as e:
+            # The collector only removes directories an hour old; the next touch tries again
+            logger.debug(f"Could not touch {self.staging_dir}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.touch()
+
+
+def build_collect_command(base_dir, current_dir=None, max_age_minutes=STAGING_MAX_AGE_MINUTES):
+    """
+    Build the shell command that removes old staging directories (and unused cached blobs) in one go
+
+    Args:
+        base_dir (str): Remote directory that holds all staging directories
+        current_dir (str): Staging directory of the submission that just finished
+        max_age_minutes (int): Remove other staging directories older than this
+
+    Returns:
+        str: Shell command
+    """
+    commands = []
+    if current_dir:
+        commands.append(f"rm -rf -- {shlex.quote(current_dir.rstrip('/'))}")
+    for prefix, max_age in ((STAGING_PREFIX, max_age_minutes), (WATCH_PREFIX, WATCH_MAX_AGE_MINUTES)):
+        commands.append(
+            f"find {shlex.quote(base_dir)} -mindepth 1 -maxdepth 1 -type d "
+            f"-name '{prefix}*' -mmin +{int(max_age)} -exec rm -rf -- {{}} +"
+        )
+    commands.append(build_blob_collect_command(base_dir))
+    return "; ".join(commands)
+
+
+def collect_staging_dirs(ssh, base_dir, current_dir=None, max_age_minutes=STAGING_MAX_AGE_MINUTES):
+    """
+    Remove the finished staging directory and any stale ones with a single exec call
+
+    Args:
+        ssh (paramiko.SSHClient): SSH client connected to the proxy
+        base_dir (str): Remote directory that holds all staging directories
+        current_dir (str): Staging directory of the submission that just finished
+        max_age_minutes (int): Remove other staging directories older than this
+    """
+    try:
+        cmd = build_collect_command(base_dir, current_dir, max_age_minutes)
+        _, stdout, _ = ssh.exec_command(cmd)
+        stdout.channel.recv_exit_status()
+        logger.info(f"Collected staging directories under {base_dir}")
+    except Exception as e:
+        # Cleanup is best effort; the next successful submission will try again
+        logger.warning(f"Could not collect staging directories: {e}")
+
+
+def start_staging_collector(ssh, base_dir, current_dir=None, max_age_minutes=STAGING_MAX_AGE_MINUTES):
+    """
+    Run collect_staging_dirs in a background daemon thread
+
+    Returns:
+        threading.Thread: The started collector thread
+    """
+    collector = threading.Thread(
+        target=collect_staging_dirs,
+        args=(ssh, base_dir, current_dir, max_age_minutes),
+        name="staging-collector",
+        daemon=True
+    )
+    collector.start()
+    return collector
@@ -0,0 +1,164 @@
+"""
+Startup time benchmark (turnin bench-startup)
+
+The application is started in a child process under python -X importtime
+with a fresh home directory. When the first window is shown the child prints
+a probe line and quits, so both the import cost and the time to the first
+window are measured end to end.
+"""
+import json
+import os
+import sys
+import time
+
+# Set (to the launch timestamp) in the child process to enable the first window probe
+STARTUP_PROBE_ENV = "TURNIN_STARTUP_PROBE"
+PROBE_PREFIX = "startup-probe "
+
+# Modules that must not be imported before the first window; they load in the background or on first use
+DEFERRED_MODULES = ("paramiko", "sentry_sdk", "requests")
+
+# Default time-to-first-window budget in milliseconds
+STARTUP_BUDGET_MS = 1500
+
+
+def report_first_window(app):
+    """
+    Print the probe line once the first window has been shown, then quit
+
+    Called by main() when STARTUP_PROBE_ENV is set. Deferred modules are
+    recorded right away, before any background loading can start.
+
+    Args:
+        app (QApplication): The running application
+    """
+    from PyQt6.QtCore import QTimer
+
+    launched = float(os.environ[STARTUP_PROBE_ENV])
+    loaded_early = [name for name in DEFERRED_MODULES if name in sys.modules]
+
+    def report():
+        probe = {
+            'first_window_ms': (time.time() - launched) * 1000,
+            'deferred_loaded': loaded_early,
+        }
+        print(PROBE_PREFIX + json.dumps(probe), flush=True)
+        app.quit()
+
+    # Runs after the event loop has started and processed the first show and paint events
+    QTimer.singleShot(0, report)
+
+
+def parse_importtime(output):
+    """
+    Parse the output of python -X importtime
+
+    Args:
+        output (str): stderr of the child process
+
+    Returns:
+        dict: Top-level module name -> cumulative import time in microseconds
+    """
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        # Nested imports are indented below the module that triggered them
+        if name.startswith(" " * 3):
+            continue
+        imports[name.strip()] = int(parts[1])
+    return imports
+
+
+def run_startup(repo_root, offscreen=True, timeout=60):
+    """
+    Start the application once and measure it
+
+    Args:
+        repo_root (str): Directory containing the src package
+        offscreen (bool): Use Qt's offscreen platform instead of a display
+        timeout (float): Seconds before the child is killed
+
+    Returns:
+        tuple: (probe dict, imports dict)
+
+    Raises:
+        RuntimeError: If the application did not report its first window
+    """
+    # Imported here so that the application only pays for the probe hook at startup
+    import subprocess
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ)
+        # A fresh home has no saved credentials or state, like a first start
+        env["HOME"] = home
+        env["USERPROFILE"] = home
+        env[STARTUP_PROBE_ENV] = repr(time.time())
+        if offscreen:
+            env["QT_QPA_PLATFORM"] = "offscreen"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "src.turnin"],
+            cwd=repo_root, env=env, capture_output=True, text=True, timeout=timeout
+        )
+
+    for line in result.stdout.splitlines():
+        if line.startswith(PROBE_PREFIX):
+            return json.loads(line[len(PROBE_PREFIX):]), parse_importtime(result.stderr)
+    raise RuntimeError(f"No startup probe in output (exit code {result.returncode}):\n{result.stderr[-2000:]}")
+
+
+def main(argv=None):
+    """
+    Run the startup benchmark from the command line
+
+    Args:
+        argv (list): Command line arguments (without the command name)
+
+    Returns:
+        int: Exit code (1 if over budget or if deferred modules were imported early)
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="turnin bench-startup",
+        description="Measure import time and time to the first window"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Number of starts to measure (default: 3)")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help=f"Time-to-first-window budget in ms (default: {STARTUP_BUDGET_MS})")
+    parser.add_argument("--display", action="store_true", help="Show the window instead of using offscreen rendering")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list (default: 10)")
+    args = parser.parse_args(argv)
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    first_window_times = []
+    for run in range(args.runs):
+        probe, imports = run_startup(repo_root, offscreen=not args.display)
+        first_window_times.append(probe['first_window_ms'])
+        print(f"run {run + 1}: first window after {probe['first_window_ms']:.0f} ms, "
+              f"imports {sum(imports.values()) / 1000:.0f} ms")
+
+    # The imports of the last run are representative; the first run also pays for cold caches
+    print(f"\nslowest imports before the first window:")
+    for name, micros in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:<40} {micros / 1000:>8.1f} ms")
+
+    best = min(first_window_times)
+    print(f"\nfirst window: best {best:.0f} ms, budget {args.budget_ms:.0f} ms")
+    exit_code = 0
+    if best > args.budget_ms:
+        print("over budget")
+        exit_code = 1
+    if probe['deferred_loaded']:
+        print(f"imported before the first window but should be deferred: {', '.join(probe['deferred_loaded'])}")
+        exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
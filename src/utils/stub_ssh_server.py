@@ -0,0 +1,493 @@
+"""
+Local stand-in for the gateway and the submission hosts (used by turnin load-test)
+
+A paramiko SSH server on 127.0.0.1 that accepts password logins and answers
+the commands the client runs (pwd, rupt, sha256sum, turnin and the staging
+cleanup) with configurable server-side latency. SFTP is served from a
+temporary directory, and direct-tcpip channels to the submission hosts are
+answered with a nested SSH session, so the client reaches them through the
+gateway exactly as it does in the lab.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import shlex
+import shutil
+import socket
+import tempfile
+import threading
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+# Hosts listed by rupt; direct-tcpip channels to other hosts are refused
+SERVER_HOSTS = ("dl380ws01", "dl380ws02", "dl380ws03")
+# Assignments listed by "turnin --list"
+SERVER_ASSIGNMENTS = ("loadtest",)
+LISTEN_BACKLOG = 128
+# Seconds turnin waits for the client's "y" confirmations on stdin
+CONFIRM_TIMEOUT = 2.0
+
+
+class ServerStats:
+    """
+    Thread-safe counters kept by the stub server
+
+    Gauges (connections, tunnels, sftp, commands) track how many are open now,
+    the peak and the total since the last reset; counters (command names,
+    auth_failures) only count.
+    """
+
+    GAUGES = ("connections", "tunnels", "sftp", "commands")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero all counters; gauges keep their current value as the new peak"""
+        with self._lock:
+            current = {name: gauge['current'] for name, gauge in getattr(self, '_gauges', {}).items()}
+            self._gauges = {name: {'current': current.get(name, 0), 'peak': current.get(name, 0), 'total': 0}
+                            for name in self.GAUGES}
+            self._counts = {}
+
+    def opened(self, name):
+        with self._lock:
+            gauge = self._gauges[name]
+            gauge['current'] += 1
+            gauge['total'] += 1
+            gauge['peak'] = max(gauge['peak'], gauge['current'])
+
+    def closed(self, name):
+        with self._lock:
+            self._gauges[name]['current'] -= 1
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def snapshot(self):
+        """
+        Copy the counters
+
+        Returns:
+            dict: Gauge name -> {'current', 'peak', 'total'}, plus 'counts': name -> count
+        """
+        with self._lock:
+            snapshot = {name: dict(gauge) for name, gauge in self._gauges.items()}
+            snapshot['counts'] = dict(self._counts)
+        return snapshot
+
+
+class StubServerInterface(paramiko.ServerInterface):
+    """Authentication and channel policy of one stub SSH session"""
+
+    def __init__(self, stub):
+        self.stub = stub
+        self.username = None
+        self.direct_channels = set()
+        # Keepalive round trips of one transport must not overlap (see StubSSHServer.run_command)
+        self.barrier_lock = threading.Lock()
+
+    @property
+    def home(self):
+        return f"/home/{self.username}"
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        self.stub.delay(self.stub.auth_latency)
+        if password != self.stub.password:
+            self.stub.stats.count('auth_failures')
+            return paramiko.AUTH_FAILED
+        # Every student has their own home directory
+        self.username = username
+        os.makedirs(self.stub.local_path(self.home), exist_ok=True)
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        host, port = destination
+        if host not in self.stub.hosts or port != 22:
+            return paramiko.OPEN_FAILED_CONNECT_FAILED
+        self.direct_channels.add(chanid)
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command):
+        if isinstance(command, bytes):
+            command = command.decode('utf-8', errors='replace')
+        threading.Thread(target=self.stub.run_command, args=(self, channel, command),
+                         name="stub-exec", daemon=True).start()
+        return True
+
+
+class StubSFTPInterface(paramiko.SFTPServerInterface):
+    """SFTP backed by the stub server's temporary directory"""
+
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.session = server
+        self.stub = server.stub
+
+    def session_started(self):
+        self.stub.stats.opened('sftp')
+
+    def session_ended(self):
+        self.stub.stats.closed('sftp')
+
+    def canonicalize(self, path):
+        return posixpath.normpath(posixpath.join(self.session.home, path))
+
+    def _local(self, path):
+        return self.stub.local_path(self.canonicalize(path))
+
+    def list_folder(self, path):
+        local = self._local(path)
+        try:
+            return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(local, name)), name)
+                    for name in os.listdir(local)]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        local = self._local(path)
+        try:
+            fd = os.open(local, flags | getattr(os, 'O_BINARY', 0), 0o600)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+        handle = paramiko.SFTPHandle(flags)
+        handle.filename = local
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def _call(self, function, *args):
+        try:
+            function(*args)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        return self._call(os.mkdir, self._local(path))
+
+    def rmdir(self, path):
+        return self._call(os.rmdir, self._local(path))
+
+    def remove(self, path):
+        return self._call(os.remove, self._local(path))
+
+    def rename(self, oldpath, newpath):
+        return self._call(os.rename, self._local(oldpath), self._local(newpath))
+
+    def posix_rename(self, oldpath, newpath):
+        return self._call(os.replace, self._local(oldpath), self._local(newpath))
+
+    def chattr(self, path, attr):
+        return paramiko.SFTP_OK
+
+
+class StubSSHServer:
+    """
+    SSH server on 127.0.0.1 standing in for the gateway and the submission hosts
+
+    Any user name is accepted with the configured password. Latencies are
+    added on the server side: auth_latency to every password check,
+    command_latency to every exec request and
+    turnin_latency to every turnin run on top of that.
+
+    Args:
+        password (str): Password every user logs in with
+        command_latency (float): Seconds added to every command
+        auth_latency (float): Seconds added to every login
+        turnin_latency (float): Extra seconds turnin takes
+        hosts (tuple): Submission hosts listed by rupt
+        assignments (tuple): Open assignments listed by "turnin --list"
+        host_key (paramiko.PKey): Host key (a new RSA key by default)
+        root (str): Directory holding the remote file system (a temporary directory by default)
+    """
+
+    def __init__(self, password, command_latency=0.0, auth_latency=0.0, turnin_latency=0.0,
+                 hosts=SERVER_HOSTS, host_key=None, root=None, assignments=SERVER_ASSIGNMENTS):
+        self.password = password
+        self.command_latency = command_latency
+        self.auth_latency = auth_latency
+        self.turnin_latency = turnin_latency
+        self.hosts = tuple(hosts)
+        self.assignments = tuple(assignments)
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+        self.stats = ServerStats()
+
+        self._temp_root = None if root else tempfile.mkdtemp(prefix="turnin-stub-")
+        self.root = root or self._temp_root
+        self._sock = None
+        self._stopped = threading.Event()
+        self._transports = set()
+        self._transports_lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def port(self):
+        return self._sock.getsockname()[1]
+
+    @property
+    def gateway(self):
+        """Gateway specification clients connect to ("127.0.0.1:<port>")"""
+        return f"127.0.0.1:{self.port}"
+
+    def known_hosts(self):
+        """
+        known_hosts lines that make clients trust this server
+
+        Returns:
+            list: One line for the gateway address and one per submission host
+        """
+        key = f"{self.host_key.get_name()} {self.host_key.get_base64()}"
+        return [f"[127.0.0.1]:{self.port} {key}"] + [f"{host} {key}" for host in self.hosts]
+
+    def start(self):
+        """
+        Start listening on a free port
+
+        Returns:
+            int: The port
+        """
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(LISTEN_BACKLOG)
+        self._sock.settimeout(0.5)
+        threading.Thread(target=self._accept_loop, name="stub-listener", daemon=True).start()
+        return self.port
+
+    def stop(self):
+        """Close the listener and every session, and remove the temporary directory"""
+        self._stopped.set()
+        if self._sock:
+            self._sock.close()
+        with self._transports_lock:
+            transports = list(self._transports)
+        for transport in transports:
+            try:
+                transport.close()
+            except (EOFError, OSError, paramiko.SSHException):
+                pass  # a nested session whose outer connection is already closed
+        if self._temp_root:
+            shutil.rmtree(self._temp_root, ignore_errors=True)
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            client.settimeout(None)
+            threading.Thread(target=self._serve, args=(client, 'connections'),
+                             name="stub-session", daemon=True).start()
+
+    def _serve(self, sock, gauge):
+        """Run an SSH server session over a socket, or over a direct-tcpip channel for tunnels"""
+        transport = paramiko.Transport(sock)
+        transport.add_server_key(self.host_key)
+        transport.set_subsystem_handler('sftp', paramiko.SFTPServer, StubSFTPInterface)
+        session = StubServerInterface(self)
+        with self._transports_lock:
+            self._transports.add(transport)
+        self.stats.opened(gauge)
+        try:
+            transport.start_server(server=session)
+            # paramiko only keeps weak references to channels, and a session channel
+            # collected before its exec or subsystem request arrives is closed under the client
+            channels = []
+            while transport.is_active() and not self._stopped.is_set():
+                channel = transport.accept(1)
+                if channel is None:
+                    continue
+                channels = [c for c in channels if not c.closed] + [channel]
+                if channel.get_id() in session.direct_channels:
+                    # A connection to a submission host through the gateway
+                    threading.Thread(target=self._serve, args=(channel, 'tunnels'),
+                                     name="stub-tunnel", daemon=True).start()
+        except Exception as e:
+            logger.debug(f"Stub session ended: {e}")
+        finally:
+            self.stats.closed(gauge)
+            with self._transports_lock:
+                self._transports.discard(transport)
+            transport.close()
+
+    def delay(self, seconds):
+        if seconds > 0:
+            self._stopped.wait(seconds)
+
+    def local_path(self, remote_path):
+        """Map an absolute remote path into the server's directory"""
+        return os.path.join(self.root, posixpath.normpath(remote_path).lstrip('/'))
+
+    def run_command(self, session, channel, command):
+        """Answer an exec request on its channel"""
+        self.stats.opened('commands')
+        try:
+            # paramiko replies to the exec request only after check_channel_exec_request
+            # returns; answering before that makes the client see the channel close first.
+            # The transport thread reads the client's answer to a keepalive only after it
+            # has sent that reply, so one round trip orders the two.
+            with session.barrier_lock:
+                channel.transport.global_request("keepalive@openssh.com", wait=True)
+            self.delay(self.command_latency)
+            status, output = self.execute(session, channel, command)
+            if output:
+                channel.sendall(output.encode('utf-8'))
+            channel.send_exit_status(status)
+        except Exception as e:
+            logger.debug(f"Stub command {command!r} failed: {e}")
+        finally:
+            self.stats.closed('commands')
+            try:
+                channel.close()
+            except (EOFError, OSError, paramiko.SSHException):
+                pass  # the client went away first
+
+    def execute(self, session, channel, command):
+        """
+        Interpret the few shell commands the client sends
+
+        Handles "a; b" sequences, "a && b" chains and pipelines ("yes|turnin"),
+        of which only the last command runs.
+
+        Returns:
+            tuple: (exit status, output)
+        """
+        cwd = session.home
+        output = []
+        status = 0
+        for sequence in command.split(';'):
+            for step in sequence.split('&&'):
+                args = shlex.split(step.split('|')[-1])
+                if not args:
+                    continue
+                name = args[0]
+                self.stats.count(name)
+                status, text = self._run(session, channel, name, args[1:], cwd)
+                output.append(text)
+                if name == 'cd' and status == 0:
+                    cwd = posixpath.normpath(posixpath.join(cwd, args[1]))
+                if status != 0:
+                    break
+        return status, "".join(output)
+
+    def _run(self, session, channel, name, args, cwd):
+        if name == 'pwd':
+            return 0, session.home + "\n"
+        if name == 'cd':
+            target = posixpath.join(cwd, args[0]) if args else session.home
+            if not os.path.isdir(self.local_path(target)):
+                return 1, f"cd: {args[0]}: No such file or directory\n"
+            return 0, ""
+        if name == 'rupt':
+            return 0, "".join(f"{host:<12} up  12 days,  3:04,  4 users,  load 0.10, 0.20, 0.30\n"
+                              for host in self.hosts)
+        if name == 'sha256sum':
+            lines = []
+            for file_name in (arg for arg in args if arg != '--'):
+                digest = hashlib.sha256()
+                try:
+                    with open(self.local_path(posixpath.join(cwd, file_name)), 'rb') as f:
+                        for block in iter(lambda: f.read(1024 * 1024), b""):
+                            digest.update(block)
+                except OSError:
+                    continue
+                lines.append(f"{digest.hexdigest()}  {file_name}\n")
+            return 0, "".join(lines)
+        if name == 'turnin' and args[:1] == ['--list']:
+            self.stats.count('lists')
+            return 0, "".join(f"{assignment}\n" for assignment in self.assignments)
+        if name == 'turnin':
+            # turnin asks for confirmation; the client answers with two "y" lines
+            channel.settimeout(CONFIRM_TIMEOUT)
+            received = b""
+            try:
+                while received.count(b"\n") < 2:
+                    data = channel.recv(64)
+                    if not data:
+                        break
+                    received += data
+            except socket.timeout:
+                pass
+            self.delay(self.turnin_latency)
+            self.stats.count('submissions')
+            return 0, f"Turnin of {len(args) - 1} file(s) for {args[0] if args else '?'} succeeded\n"
+        if name == 'touch':
+            for path in args[args.index('--') + 1:] if '--' in args else args:
+                local = self.local_path(posixpath.join(cwd, path))
+                if os.path.exists(local):
+                    os.utime(local)
+            return 0, ""
+        if name == 'rm':
+            for path in args[args.index('--') + 1:] if '--' in args else args[1:]:
+                local = self.local_path(posixpath.join(cwd, path))
+                if os.path.isfile(local):
+                    os.remove(local)
+                else:
+                    shutil.rmtree(local, ignore_errors=True)
+            return 0, ""
+        if name in ('ln', 'cp'):
+            # "ln -f -- blob name" and "cp -f -- blob name", as sent by the blob cache
+            paths = args[args.index('--') + 1:] if '--' in args else [arg for arg in args if not arg.startswith('-')]
+            if len(paths) != 2:
+                return 1, f"{name}: missing file operand\n"
+            source, target = (self.local_path(posixpath.join(cwd, path)) for path in paths)
+            try:
+                if os.path.lexists(target):
+                    os.remove(target)
+                if name == 'ln':
+                    os.link(source, target)
+                else:
+                    shutil.copyfile(source, target)
+            except OSError as e:
+                return 1, f"{name}: {e.strerror}\n"
+            return 0, ""
+        if name == 'find' and '-printf' in args:
+            # "find dir -maxdepth 1 -type f -printf '%f %s %C@\\n'", as sent by the blob cache
+            local = self.local_path(posixpath.join(cwd, args[0]))
+            if not os.path.isdir(local):
+                return 1, f"find: '{args[0]}': No such file or directory\n"
+            lines = []
+            for entry in os.scandir(local):
+                if entry.is_file():
+                    stat = entry.stat()
+                    lines.append(f"{entry.name} {stat.st_size} {stat.st_ctime}\n")
+            return 0, "".join(lines)
+        if name == 'find':
+            # Stale staging directories from earlier runs are left alone
+            return 0, ""
+        return 127, f"{name}: command not found\n"
@@ -0,0 +1,260 @@
+"""
+Durable local queue for submissions that could not be sent right away
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .local_store import get_state_path, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FILE = "queue.json"
+
+STATE_QUEUED = 'queued'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+# Finished entries are kept for display for this long, then dropped from the journal
+FINISHED_RETENTION = 24 * 60 * 60
+
+
+def get_queue_path():
+    """Get path to the submission queue journal"""
+    return get_state_path(QUEUE_FILE)
+
+
+class SubmissionQueue:
+    """
+    Submission queue persisted as a JSON journal under ~/.turnin
+
+    Every change is written to disk before listeners are notified, so queued
+    submissions survive crashes and restarts. Entries are plain dicts with the
+    keys id, assignment, files, priority, state, attempts, created, updated,
+    last_error and output.
+    """
+
+    def __init__(self, journal_path=None):
+        self.journal_path = journal_path or get_queue_path()
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._entries = self._load()
+
+    def _load(self):
+        entries = load_json(self.journal_path, default=[])
+        if not isinstance(entries, list):
+            return []
+
+        now = time.time()
+        kept = []
+        for entry in entries:
+            if entry.get('state') in (STATE_DONE, STATE_FAILED) and \
+                    now - entry.get('updated', 0) > FINISHED_RETENTION:
+                continue
+            # A submission that was running when the application stopped never finished
+            if entry.get('state') == STATE_RUNNING:
+                entry['state'] = STATE_QUEUED
+            kept.append(entry)
+        return kept
+
+    def _save(self):
+        try:
+            save_json(self.journal_path, self._entries)
+        except OSError as e:
+            logger.error(f"Failed to write submission queue: {e}")
+
+    def _changed(self):
+        self._save()
+        snapshot = self.entries()
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Submission queue listener failed: {e}")
+
+    def add_listener(self, callback):
+        """
+        Register a callback called with a snapshot of the entries after every change
+
+        Args:
+            callback (callable): Function taking a list of entry dicts
+        """
+        self._listeners.append(callback)
+
+    def entries(self):
+        """Return a copy of all entries"""
+        with self._lock:
+            return [dict(entry) for entry in self._entries]
+
+    def enqueue(self, assignment, files, priority=0):
+        """
+        Add a submission to the queue
+
+        Args:
+            assignment (str): Assignment name
+            files (list): Local file paths
+            priority (int): Higher priorities are sent first
+
+        Returns:
+            str: Id of the new entry
+        """
+        now = time.time()
+        entry = {
+            'id': uuid.uuid4().hex,
+            'assignment': assignment,
+            'files': list(files),
+            'priority': priority,
+            'state': STATE_QUEUED,
+            'attempts': 0,
+            'created': now,
+            'updated': now,
+            'last_error': None,
+            'output': None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self._changed()
+        return entry['id']
+
+    def pending(self):
+        """
+        Return queued entries in the order they should be sent
+
+        Returns:
+            list: Entry dicts sorted by priority, then by fewest attempts, then by age
+        """
+        with self._lock:
+            queued = [dict(entry) for entry in self._entries if entry['state'] == STATE_QUEUED]
+        return sorted(queued, key=lambda e: (-e['priority'], e['attempts'], e['created']))
+
+    def update(self, entry_id, **fields):
+        """
+        Update fields of an entry
+
+        Args:
+            entry_id (str): Id of the entry
+            **fields: Fields to set
+        """
+        with self._lock:
+            for entry in self._entries:
+                if entry['id'] == entry_id:
+                    entry.update(fields)
+                    entry['updated'] = time.time()
+                    break
+            else:
+                return
+            self._changed()
+
+    def remove(self, entry_id):
+        """Remove an entry from the queue"""
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry['id'] != entry_id]
+            self._changed()
+
+    def clear_finished(self):
+        """Remove all entries that are done or failed"""
+        with self._lock:
+            self._entries = [entry for entry in self._entries
+                             if entry['state'] not in (STATE_DONE, STATE_FAILED)]
+            self._changed()
+
+
+class QueueScheduler:
+    """
+    Background thread that flushes a SubmissionQueue whenever the proxy is reachable
+
+    Args:
+        queue (SubmissionQueue): Queue to flush
+        connect (callable): Returns (ssh, target) or raises / returns (None, None) when offline;
+            target is passed through to submit unchanged (e.g. the server to submit to)
+        submit (callable): submit(entry, ssh, target) -> (success, output)
+        max_concurrency (int): Maximum number of submissions sent at the same time
+        poll_interval (float): Seconds between reconnection attempts while offline
+        max_attempts (int): Attempts before an entry is marked as failed
+    """
+
+    def __init__(self, queue, connect, submit, max_concurrency=2, poll_interval=30, max_attempts=5):
+        self.queue = queue
+        self.connect = connect
+        self.submit = submit
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="submission-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1)
+
+    def wake(self):
+        """Try to flush the queue now instead of waiting for the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.queue.pending():
+                self.flush()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def flush(self):
+        """
+        Send all pending submissions if the proxy can be reached
+
+        Returns:
+            bool: True if a connection was made, False if still offline
+        """
+        try:
+            ssh, target = self.connect()
+        except Exception as e:
+            logger.info(f"Submission queue still offline: {e}")
+            return False
+        if not ssh:
+            return False
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                for entry in self.queue.pending():
+                    if self._stop.is_set():
+                        break
+                    self.queue.update(entry['id'], state=STATE_RUNNING)
+                    executor.submit(self._send, entry, ssh, target)
+        finally:
+            try:
+                ssh.close()
+            except Exception:
+                pass
+        return True
+
+    def _send(self, entry, ssh, target):
+        attempts = entry['attempts'] + 1
+        try:
+            success, output = self.submit(entry, ssh, target)
+        except Exception as e:
+            success, output = False, str(e)
+
+        if success:
+            logger.info(f"Queued submission for {entry['assignment']} sent")
+            self.queue.update(entry['id'], state=STATE_DONE, attempts=attempts, output=output, last_error=None)
+        elif attempts >= self.max_attempts:
+            logger.warning(f"Queued submission for {entry['assignment']} failed permanently: {output}")
+            self.queue.update(entry['id'], state=STATE_FAILED, attempts=attempts, last_error=output)
+        else:
+            self.queue.update(entry['id'], state=STATE_QUEUED, attempts=attempts, last_error=output)
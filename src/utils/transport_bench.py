@@ -0,0 +1,112 @@
+"""
+Upload throughput benchmark for the transport profiles (turnin bench-transport)
+"""
+import argparse
+import getpass
+import os
+import sys
+import time
+
+import paramiko
+
+from .proxy_health import get_proxy_hosts
+from .ssh import add_ssh_keys, connect_ssh_client
+from .staging import create_staging_dir
+from .transport_profile import PROFILES, get_transport_profile
+
+try:
+    from config import TEMP_DIR
+except ImportError:
+    TEMP_DIR = "turnin"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def benchmark_profile(profile_name, host, username, password, size_mb):
+    """
+    Measure upload throughput for a single transport profile
+
+    A fresh connection is made with the profile, a payload of random data is
+    written into a temporary staging directory and then removed again.
+
+    Args:
+        profile_name (str): Name of the transport profile
+        host (str): Gateway host
+        username (str): SSH username
+        password (str): SSH password
+        size_mb (int): Payload size in MiB
+
+    Returns:
+        tuple: (connect seconds, upload seconds, throughput in MiB/s)
+    """
+    ssh = paramiko.SSHClient()
+    add_ssh_keys(ssh)
+
+    started = time.monotonic()
+    connect_ssh_client(ssh, host, username, password, profile=get_transport_profile(profile_name))
+    connect_time = time.monotonic() - started
+
+    sftp = ssh.open_sftp()
+    try:
+        home_dir = sftp.normalize('.')
+        staging_dir = create_staging_dir(sftp, f"{home_dir}/{TEMP_DIR}")
+        remote_path = f"{staging_dir}bench.bin"
+        # Random data is the worst case for compression, like most submissions (archives, binaries)
+        chunk = os.urandom(CHUNK_SIZE)
+
+        started = time.monotonic()
+        with sftp.open(remote_path, 'wb') as remote_file:
+            remote_file.set_pipelined(True)
+            for _ in range(size_mb):
+                remote_file.write(chunk)
+        upload_time = time.monotonic() - started
+
+        sftp.remove(remote_path)
+        sftp.rmdir(staging_dir.rstrip('/'))
+    finally:
+        sftp.close()
+        ssh.close()
+
+    return connect_time, upload_time, size_mb / upload_time
+
+
+def main(argv=None):
+    """
+    Run the transport benchmark from the command line
+
+    Args:
+        argv (list): Command line arguments (without the command name)
+
+    Returns:
+        int: Exit code
+    """
+    parser = argparse.ArgumentParser(
+        prog="turnin bench-transport",
+        description="Measure upload throughput of each transport profile"
+    )
+    parser.add_argument("--host", help="Gateway host (defaults to the first configured gateway)")
+    parser.add_argument("--user", help="SSH username")
+    parser.add_argument("--size", type=int, default=32, help="Payload size in MiB (default: 32)")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(PROFILES), default=sorted(PROFILES),
+                        help="Profiles to measure (default: all)")
+    args = parser.parse_args(argv)
+
+    host = args.host or get_proxy_hosts()[0]
+    username = args.user or input("Username: ")
+    password = getpass.getpass("Password: ")
+
+    print(f"Uploading {args.size} MiB to {host} with each profile...")
+    print(f"{'profile':<12} {'connect (s)':>12} {'upload (s)':>12} {'MiB/s':>10}")
+    exit_code = 0
+    for name in args.profiles:
+        try:
+            connect_time, upload_time, throughput = benchmark_profile(name, host, username, password, args.size)
+            print(f"{name:<12} {connect_time:>12.2f} {upload_time:>12.2f} {throughput:>10.2f}")
+        except Exception as e:
+            print(f"{name:<12} failed: {e}")
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
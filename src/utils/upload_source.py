@@ -0,0 +1,122 @@
+"""
+Zero-copy read path for local files being uploaded
+"""
+import mmap
+import os
+
+# Files at least this large are memory-mapped instead of read into buffers
+MMAP_THRESHOLD = 8 * 1024 * 1024
+# Size of the slices handed to the hash and the SFTP writer
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadSource:
+    """
+    Read-only source of a local file's bytes for uploading
+
+    Large files are memory-mapped and handed out as memoryview slices of the
+    mapping, so neither hashing nor the SFTP writer copies the data into new
+    bytes objects, and the pages stay file-backed (the kernel can drop them
+    under memory pressure) no matter how large the file is. Small files are
+    read into one reusable buffer instead, which is cheaper than setting up a
+    mapping.
+
+    Use as a context manager; slices yielded by chunks() are only valid until
+    the next slice is requested.
+
+    Args:
+        path (str): Local file path
+        mmap_threshold (int): Minimum size for memory-mapping
+    """
+
+    def __init__(self, path, mmap_threshold=MMAP_THRESHOLD):
+        self.path = path
+        self.mmap_threshold = mmap_threshold
+        self.size = 0
+        self._file = None
+        self._mmap = None
+        self._view = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size and self.size >= self.mmap_threshold:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._mmap, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                # Read ahead aggressively and let pages go once they have been sent
+                self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+            self._view = memoryview(self._mmap)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def is_mapped(self):
+        """True if the file is memory-mapped"""
+        return self._mmap is not None
+
+    def chunks(self, chunk_size=CHUNK_SIZE, start=0, end=None):
+        """
+        Iterate over the file contents
+
+        Args:
+            chunk_size (int): Maximum size of each slice
+            start (int): Offset of the first byte
+            end (int): Offset after the last byte (defaults to the end of the file)
+
+        Yields:
+            memoryview: Consecutive slices of the file
+        """
+        end = self.size if end is None else min(end, self.size)
+        if self._view is not None:
+            for offset in range(start, end, chunk_size):
+                chunk = self._view[offset:min(offset + chunk_size, end)]
+                try:
+                    yield chunk
+                finally:
+                    # Drop the export right away so the mapping can be closed later
+                    _release(chunk)
+            return
+
+        buffer = bytearray(min(chunk_size, max(end - start, 1)))
+        buffer_view = memoryview(buffer)
+        try:
+            self._file.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                read = self._file.readinto(buffer_view[:min(len(buffer), remaining)])
+                if not read:
+                    break
+                remaining -= read
+                chunk = buffer_view[:read]
+                try:
+                    yield chunk
+                finally:
+                    _release(chunk)
+        finally:
+            _release(buffer_view)
+
+    def close(self):
+        """Release the mapping and close the file"""
+        if self._view is not None:
+            _release(self._view)
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A caller still holds a slice; the mapping is freed with it
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _release(view):
+    """Release a memoryview, ignoring views that are still exported elsewhere"""
+    try:
+        view.release()
+    except (BufferError, ValueError):
+        pass
@@ -0,0 +1,73 @@
+"""
+Optional per-user settings read from ~/.turnin/config.json
+"""
+import logging
+import os
+
+from .local_store import get_state_path, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+USER_CONFIG_FILE = "config.json"
+
+
+def get_user_config_path():
+    """Get path to the user configuration file"""
+    return get_state_path(USER_CONFIG_FILE)
+
+
+def load_user_config():
+    """
+    Load the user configuration
+
+    Returns:
+        dict: Settings from the file, or an empty dict if it is missing or invalid
+    """
+    config = load_json(get_user_config_path(), default={})
+    if not isinstance(config, dict):
+        logger.warning(f"Ignoring {get_user_config_path()}: expected a JSON object")
+        return {}
+    return config
+
+
+def get_setting(key, default=None):
+    """
+    Get a single setting from the user configuration
+
+    Args:
+        key (str): Setting name
+        default: Value returned when the setting is not present
+
+    Returns:
+        The setting value or the default
+    """
+    return load_user_config().get(key, default)
+
+
+def set_setting(key, value):
+    """
+    Store a single setting in the user configuration
+
+    A file that exists but cannot be parsed is left alone rather than replaced,
+    so a typo in a hand-edited file does not cost the user their other settings.
+
+    Args:
+        key (str): Setting name
+        value: JSON serializable value
+
+    Returns:
+        bool: True if the setting was written
+    """
+    path = get_user_config_path()
+    config = load_json(path, default=None)
+    if config is None and os.path.exists(path) or config is not None and not isinstance(config, dict):
+        logger.warning(f"Not saving {key}: {path} is not a valid JSON object")
+        return False
+    config = config or {}
+    config[key] = value
+    try:
+        save_json(path, config)
+    except OSError as e:
+        logger.warning(f"Could not write {path}: {e}")
+        return False
+    return True
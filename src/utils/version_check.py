@@ -1,31 +1,41 @@
 """
 Version check utility for ensuring the application is up to date
 """
-import requests
+import logging
 from PyQt6.QtWidgets import QMessageBox
 from PyQt6.QtGui import QDesktopServices
-from PyQt6.QtCore import QUrl
+from PyQt6.QtCore import Qt, QObject, QThread, QUrl, pyqtSignal
 import sys
 
 from src.config import APP_VERSION, REPO_OWNER, REPO_NAME
 
+logger = logging.getLogger(__name__)
 
-def check_version():
+# GitHub repository information
+GITHUB_REPO = f"{REPO_OWNER}/{REPO_NAME}"
+# Seconds to wait for the GitHub API before giving up on the check
+REQUEST_TIMEOUT = 10
+
+# The running check; kept referenced so Qt does not delete it early
+_check = None
+
+
+def fetch_latest_version():
     """
-    Check if the current version of the application is up to date.
+    Ask the GitHub API for the latest release
 
-    If a newer version is available, show a dialog and offer to
-    download the latest version.
+    requests is imported here rather than at module level, since it is only
+    needed by this background check and slows down startup.
+
+    Returns:
+        str or None: Tag name of the latest release, or None if it could not be retrieved
     """
-    # GitHub repository information
-    github_repo = f"{REPO_OWNER}/{REPO_NAME}"
-    github_token = None  # Use this for GitHub Personal Access Token if needed
+    import requests
 
-    # Current version of the software
-    current_version = APP_VERSION
+    github_token = None  # Use this for GitHub Personal Access Token if needed
 
     # Construct the API URL
-    api_url = f"https://api.github.com/repos/{github_repo}/releases/latest"
+    api_url = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
 
     # Include GitHub token if specified
     headers = {}
@@ -34,39 +44,97 @@ def check_version():
 
     try:
         # Send GET request to GitHub API
-        response = requests.get(api_url, headers=headers)
+        response = requests.get(api_url, headers=headers, timeout=REQUEST_TIMEOUT)
 
         if response.status_code == 200:
-            latest_release = response.json()
-            latest_version = latest_release["tag_name"]
-
-            if latest_version != f"version{current_version}":
-                # Newer version is available
-                link = f"https://github.com/{github_repo}/releases/tag/{latest_version}"
-
-                # Create update message dialog
-                update_message = QMessageBox()
-                update_message.setWindowTitle("Update Required")
-                update_message.setText(
-                    f"A newer version ({latest_version}) is available.\nYour version: version{current_version}")
-                update_message.setInformativeText("Would you like to download the latest version?")
-                update_message.setIcon(QMessageBox.Icon.Information)
-
-                # Add custom buttons
-                download_button = update_message.addButton("Download", QMessageBox.ButtonRole.AcceptRole)
-                cancel_button = update_message.addButton("Continue Anyway", QMessageBox.ButtonRole.RejectRole)
-
-                # Show dialog and handle response
-                result = update_message.exec()
-
-                if update_message.clickedButton() == download_button:
-                    QDesktopServices.openUrl(QUrl(link))
-                    sys.exit(0)
-            else:
-                print("Application is up to date.")
-        else:
-            print(f"Failed to retrieve release information. Status code: {response.status_code}")
-
+            return response.json()["tag_name"]
+        logger.warning(f"Failed to retrieve release information. Status code: {response.status_code}")
     except Exception as e:
-        print(f"Error checking version: {e}")
-        # Continue execution if version check fails
\ No newline at end of file
+        logger.warning(f"Error checking version: {e}")
+        # Continue execution if version check fails
+    return None
+
+
+class VersionCheckWorker(QObject):
+    """Worker that fetches the latest release in a background thread"""
+    finished = pyqtSignal(object)
+
+    def run(self):
+        """Fetch the latest release and report its tag (or None)"""
+        self.finished.emit(fetch_latest_version())
+
+
+def show_update_dialog(latest_version):
+    """
+    Tell the user about a newer version and offer to download it
+
+    Args:
+        latest_version (str or None): Tag of the latest release
+    """
+    if latest_version is None:
+        return
+
+    # Current version of the software
+    current_version = APP_VERSION
+
+    if latest_version != f"version{current_version}":
+        # Newer version is available
+        link = f"https://github.com/{GITHUB_REPO}/releases/tag/{latest_version}"
+
+        # Create update message dialog
+        update_message = QMessageBox()
+        update_message.setWindowTitle("Update Required")
+        update_message.setText(
+            f"A newer version ({latest_version}) is available.\nYour version: version{current_version}")
+        update_message.setInformativeText("Would you like to download the latest version?")
+        update_message.setIcon(QMessageBox.Icon.Information)
+
+        # Add custom buttons
+        download_button = update_message.addButton("Download", QMessageBox.ButtonRole.AcceptRole)
+        cancel_button = update_message.addButton("Continue Anyway", QMessageBox.ButtonRole.RejectRole)
+
+        # Show dialog and handle response
+        result = update_message.exec()
+
+        if update_message.clickedButton() == download_button:
+            QDesktopServices.openUrl(QUrl(link))
+            sys.exit(0)
+    else:
+        logger.info("Application is up to date.")
+
+
+class UpdateNotifier(QObject):
+    """Receives the check result in the GUI thread, where dialogs can be shown"""
+
+    def show_result(self, latest_version):
+        """Show the update dialog if needed"""
+        show_update_dialog(latest_version)
+
+    def finish(self):
+        """Forget the finished check"""
+        global _check
+        _check = None
+
+
+def check_version():
+    """
+    Check if the current version of the application is up to date.
+
+    The release lookup runs in a background thread so it never delays the
+    first window. If a newer version is available, a dialog is shown from the
+    GUI thread offering to download the latest version.
+    """
+    global _check
+    if _check is not None:
+        return
+
+    thread = QThread()
+    worker = VersionCheckWorker()
+    notifier = UpdateNotifier()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.finished.connect(notifier.show_result, Qt.ConnectionType.QueuedConnection)
+    worker.finished.connect(thread.quit)
+    thread.finished.connect(notifier.finish)
+    _check = (thread, worker, notifier)
+    thread.start()